@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Category, Quiz, Question, Choice, QuizAttempt, Answer, UserProfile
+from . import exports, jobs
+from .admin_tools import EstimatedCountPaginator, quiz_filter
+from .models import (
+    Category, Quiz, Question, Choice, QuizAttempt, Answer, UserProfile, LeaderboardEntry,
+    ActiveAttempt, Job
+)
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'created_at']
+    list_display = ['name', 'description', 'active_quiz_count', 'created_at']
     search_fields = ['name']
     list_per_page = 20
 
@@ -13,13 +18,18 @@ class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 4
     fields = ['choice_text', 'is_correct', 'order']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('question')
 
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ['question_text', 'quiz', 'marks', 'order']
-    list_filter = ['quiz', 'marks']
+    list_filter = [quiz_filter('quiz'), 'marks']
+    list_select_related = ['quiz']
     search_fields = ['question_text']
+    autocomplete_fields = ['quiz']
     inlines = [ChoiceInline]
     list_per_page = 20
 
@@ -28,6 +38,10 @@ class QuestionInline(admin.StackedInline):
     model = Question
     extra = 1
     show_change_link = True
+    exclude = ['external_id']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('quiz')
 
 
 @admin.register(Quiz)
@@ -40,19 +54,25 @@ class QuizAdmin(admin.ModelAdmin):
         'passing_score',
         'is_active',
         'created_by',
-        'total_questions',
+        'question_count',
         'created_at'
     ]
     list_filter = ['difficulty', 'category', 'is_active', 'created_at']
+    list_select_related = ['category', 'created_by']
     search_fields = ['title', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    raw_id_fields = ['created_by']
+    readonly_fields = ['question_count', 'total_marks', 'created_at', 'updated_at']
     fieldsets = (
         ('Basic Information', {
-            'fields': ('title', 'description', 'category', 'created_by')
+            'fields': ('title', 'description', 'category', 'created_by', 'external_id')
         }),
         ('Quiz Settings', {
             'fields': ('difficulty', 'time_limit', 'passing_score', 'max_attempts', 'is_active')
         }),
+        ('Statistics', {
+            'fields': ('question_count', 'total_marks'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -70,8 +90,10 @@ class QuizAdmin(admin.ModelAdmin):
 @admin.register(Choice)
 class ChoiceAdmin(admin.ModelAdmin):
     list_display = ['choice_text', 'question', 'is_correct', 'order']
-    list_filter = ['is_correct', 'question__quiz']
+    list_filter = ['is_correct', quiz_filter('question__quiz')]
+    list_select_related = ['question__quiz']
     search_fields = ['choice_text', 'question__question_text']
+    autocomplete_fields = ['question']
     list_per_page = 50
 
 
@@ -80,6 +102,11 @@ class AnswerInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['question', 'selected_choice', 'is_correct', 'marks_obtained']
     can_delete = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'attempt__user', 'question__quiz', 'selected_choice__question'
+        )
 
 
 @admin.register(QuizAttempt)
@@ -94,8 +121,12 @@ class QuizAttemptAdmin(admin.ModelAdmin):
         'time_taken',
         'completed_at'
     ]
-    list_filter = ['is_passed', 'quiz', 'completed_at']
+    list_filter = ['is_passed', quiz_filter('quiz'), 'completed_at']
+    list_select_related = ['user', 'quiz']
     search_fields = ['user__username', 'quiz__title']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = [
         'user', 
         'quiz', 
@@ -109,9 +140,18 @@ class QuizAttemptAdmin(admin.ModelAdmin):
     ]
     inlines = [AnswerInline]
     list_per_page = 50
+    actions = ['export_attempts_csv', 'export_answers_csv']
     
     def has_add_permission(self, request):
         return False 
+    
+    @admin.action(description='Export selected attempts as CSV')
+    def export_attempts_csv(self, request, queryset):
+        return exports.csv_response(exports.rows_for(queryset), 'attempts')
+    
+    @admin.action(description='Export selected attempts with their answers as CSV')
+    def export_answers_csv(self, request, queryset):
+        return exports.csv_response(exports.rows_for(queryset, with_answers=True), 'answers')
 
 
 @admin.register(Answer)
@@ -123,13 +163,24 @@ class AnswerAdmin(admin.ModelAdmin):
         'is_correct',
         'marks_obtained'
     ]
-    list_filter = ['is_correct', 'attempt__quiz']
+    list_filter = ['is_correct', quiz_filter('attempt__quiz')]
+    list_select_related = [
+        'attempt__user', 'attempt__quiz', 'question__quiz', 'selected_choice__question'
+    ]
     search_fields = ['attempt__user__username', 'question__question_text']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ['attempt', 'question', 'selected_choice', 'is_correct', 'marks_obtained']
     list_per_page = 100
+    actions = ['export_answers_csv']
     
     def has_add_permission(self, request):
         return False
+    
+    @admin.action(description='Export selected answers as CSV')
+    def export_answers_csv(self, request, queryset):
+        return exports.csv_response(exports.answer_rows(queryset), 'answers')
 
 
 @admin.register(UserProfile)
@@ -137,12 +188,87 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = [
         'user',
         'total_quizzes_taken',
+        'total_quizzes_passed',
         'total_score',
+        'average_percentage',
         'created_at'
     ]
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['total_quizzes_taken', 'total_score', 'created_at']
+    raw_id_fields = ['user']
+    readonly_fields = [
+        'total_quizzes_taken',
+        'total_quizzes_passed',
+        'total_score',
+        'average_percentage',
+        'created_at'
+    ]
+    list_per_page = 50
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = [
+        'quiz',
+        'user',
+        'score',
+        'total_marks',
+        'percentage',
+        'time_taken',
+        'completed_at'
+    ]
+    list_select_related = ['quiz', 'user']
+    search_fields = ['user__username', 'quiz__title']
+    readonly_fields = [
+        'quiz',
+        'user',
+        'attempt',
+        'score',
+        'total_marks',
+        'percentage',
+        'time_taken',
+        'completed_at'
+    ]
+    list_per_page = 50
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ActiveAttempt)
+class ActiveAttemptAdmin(admin.ModelAdmin):
+    list_display = ['user', 'quiz', 'started_at', 'deadline', 'answered', 'updated_at']
+    list_select_related = ['quiz', 'user']
+    list_filter = [quiz_filter('quiz'), 'started_at']
+    search_fields = ['user__username']
+    readonly_fields = ['user', 'quiz', 'started_at', 'deadline', 'answers', 'updated_at']
+    list_per_page = 50
+    
+    def answered(self, obj):
+        return len(obj.answers)
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_until', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = [
+        'name', 'payload', 'status', 'attempts', 'max_attempts', 'run_after',
+        'lease', 'locked_until', 'last_error', 'created_at'
+    ]
     list_per_page = 50
+    actions = ['retry_jobs']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected jobs')
+    def retry_jobs(self, request, queryset):
+        count = jobs.retry(queryset)
+        self.message_user(request, f'Queued {count} jobs again.')
 
 
 admin.site.site_header = "Quiz Application Admin"
@@ -0,0 +1,113 @@
+"""
+Per-quiz answer key cache.
+
+Answer keys are kept in a bounded in-process LRU and mirrored in the shared
+Django cache. Every quiz has a version token in the shared cache; bumping it
+(see ``invalidate``) makes all processes reload the key on their next read,
+so the default cache must be shared by every process (``CACHES`` in settings).
+"""
+from collections import OrderedDict, namedtuple
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Question
+
+
+KeyEntry = namedtuple('KeyEntry', ['marks', 'correct_choice_ids', 'choice_ids'])
+
+VERSION_KEY = 'quiz:answer_key:version:{quiz_id}'
+KEY_KEY = 'quiz:answer_key:{quiz_id}:{version}'
+
+
+class AnswerKeyLRU:
+    """Thread-safe LRU of ``quiz_id -> (version, key)``"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, quiz_id, version):
+        with self._lock:
+            entry = self._data.get(quiz_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._data.move_to_end(quiz_id)
+            return entry[1]
+
+    def set(self, quiz_id, version, key):
+        with self._lock:
+            self._data[quiz_id] = (version, key)
+            self._data.move_to_end(quiz_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, quiz_id):
+        with self._lock:
+            self._data.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = AnswerKeyLRU(getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_SIZE', 256))
+SHARED_TIMEOUT = getattr(settings, 'QUIZ_ANSWER_KEY_TIMEOUT', 60 * 60 * 24)
+
+
+def build_answer_key(quiz_id):
+    """
+    Build the answer key for a quiz with a single query.
+
+    Returns a dict mapping question id to a ``KeyEntry`` holding the question's
+    marks, its correct choice ids and all of its choice ids (both in display order).
+    """
+    key = {}
+    rows = Question.objects.filter(quiz_id=quiz_id).order_by(
+        'order', 'id', 'choices__order', 'choices__id'
+    ).values_list('id', 'marks', 'choices__id', 'choices__is_correct')
+    for question_id, marks, choice_id, is_correct in rows:
+        entry = key.setdefault(question_id, (marks, [], []))
+        if choice_id is not None:
+            entry[2].append(choice_id)
+            if is_correct:
+                entry[1].append(choice_id)
+    return {
+        question_id: KeyEntry(marks, tuple(correct), tuple(choices))
+        for question_id, (marks, correct, choices) in key.items()
+    }
+
+
+def current_version(quiz_id):
+    """Version token of the quiz's content, changed by ``invalidate``"""
+    version_key = VERSION_KEY.format(quiz_id=quiz_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_answer_key(quiz_id):
+    """Return the cached answer key for a quiz, loading it on a miss"""
+    version = current_version(quiz_id)
+    key = local_cache.get(quiz_id, version)
+    if key is not None:
+        return key
+
+    shared_key = KEY_KEY.format(quiz_id=quiz_id, version=version)
+    key = cache.get(shared_key)
+    if key is None:
+        key = build_answer_key(quiz_id)
+        cache.set(shared_key, key, SHARED_TIMEOUT)
+    local_cache.set(quiz_id, version, key)
+    return key
+
+
+def invalidate(quiz_id):
+    """Drop the cached answer key of a quiz in every process"""
+    cache.set(VERSION_KEY.format(quiz_id=quiz_id), uuid.uuid4().hex, None)
+    local_cache.discard(quiz_id)
@@ -0,0 +1,201 @@
+"""
+Async versions of the read-heavy quiz pages for the ASGI deployment profile.
+
+``quiz.urls_async`` routes ``home``, ``quiz_list``, ``quiz_detail``,
+``leaderboard`` and ``dashboard`` here and keeps the sync views for every
+other URL. Queries that do not depend on each other go through ``gather``.
+Django 4.2 runs every async ORM call of a request on one shared thread, so
+with ``QUIZ_ASYNC_PARALLEL_QUERIES`` each of them is sent from a pool of
+``QUIZ_ASYNC_QUERY_WORKERS`` threads, each with its own database connection,
+and they overlap.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.core import signing
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from .models import Quiz, QuizAttempt, Category, UserProfile
+from .views import filter_quizzes
+from . import leaderboard as ranking
+from . import site_stats
+
+
+@lru_cache(maxsize=None)
+def _executor():
+    return ThreadPoolExecutor(
+        getattr(settings, 'QUIZ_ASYNC_QUERY_WORKERS', 20), thread_name_prefix='quiz-queries'
+    )
+
+
+def _own_connection(query):
+    def run():
+        try:
+            return query()
+        finally:
+            # Worker threads outlive the request, so close like request_finished would
+            close_old_connections()
+    return run
+
+
+async def gather(*queries):
+    """Run the zero-argument callables ``queries`` and return their results in order"""
+    if not getattr(settings, 'QUIZ_ASYNC_PARALLEL_QUERIES', False):
+        return [await sync_to_async(query)() for query in queries]
+    return await asyncio.gather(*(
+        sync_to_async(_own_connection(query), thread_sensitive=False, executor=_executor())()
+        for query in queries
+    ))
+
+
+def _user(request):
+    # Resolve the lazy request.user once so templates and middleware never query
+    request.user = get_user(request)
+    return request.user
+
+
+def login_required(view):
+    """Async counterpart of ``django.contrib.auth.decorators.login_required``"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await sync_to_async(_user)(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _render(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def home(request):
+    """Homepage with featured quizzes"""
+    featured_quizzes, stats, _ = await gather(
+        lambda: list(Quiz.objects.filter(is_active=True).select_related('category')[:6]),
+        site_stats.get_stats,
+        lambda: _user(request),
+    )
+
+    context = {
+        'categories': stats['categories'],
+        'featured_quizzes': featured_quizzes,
+        'total_quizzes': stats['total_quizzes'],
+        'total_users': stats['total_users'],
+        'total_categories': stats['total_categories'],
+    }
+    return await _render(request, 'quiz/home.html', context)
+
+
+async def quiz_list(request):
+    """List all available quizzes with filtering"""
+    def filtered():
+        quizzes, *filters = filter_quizzes(request.GET)
+        return [list(quizzes), *filters]
+
+    (quizzes, category_id, difficulty, search), categories, _ = await gather(
+        filtered,
+        lambda: list(Category.objects.all()),
+        lambda: _user(request),
+    )
+
+    context = {
+        'quizzes': quizzes,
+        'categories': categories,
+        'selected_category': category_id,
+        'selected_difficulty': difficulty,
+        'search_query': search,
+    }
+    return await _render(request, 'quiz/quiz_list.html', context)
+
+
+async def quiz_detail(request, pk):
+    """Quiz details and preview"""
+    def user_attempts():
+        # Attempts depend on the user, but not on the quiz row
+        if not _user(request).is_authenticated:
+            return None
+        return list(QuizAttempt.objects.filter(
+            user=request.user, quiz_id=pk
+        ).order_by('-completed_at'))
+
+    quiz, attempts = await gather(
+        lambda: Quiz.objects.select_related('category').filter(pk=pk, is_active=True).first(),
+        user_attempts,
+    )
+    if quiz is None:
+        raise Http404('No Quiz matches the given query.')
+
+    attempts_left = quiz.max_attempts
+    if attempts is not None:
+        attempts_left = quiz.max_attempts - len(attempts)
+
+    context = {
+        'quiz': quiz,
+        'questions_count': quiz.question_count,
+        'total_marks': quiz.total_marks,
+        'user_attempts': attempts,
+        'attempts_left': attempts_left,
+    }
+    return await _render(request, 'quiz/quiz_detail.html', context)
+
+
+@login_required
+async def dashboard(request):
+    """User dashboard with statistics"""
+    (profile, created), recent_attempts = await gather(
+        lambda: UserProfile.objects.get_or_create(user=request.user),
+        lambda: list(QuizAttempt.objects.filter(
+            user=request.user
+        ).select_related('quiz__category').order_by('-completed_at')[:10]),
+    )
+
+    # Statistics are kept up to date by the post-submit job
+    total_attempts = profile.total_quizzes_taken
+    passed_attempts = profile.total_quizzes_passed
+
+    context = {
+        'profile': profile,
+        'recent_attempts': recent_attempts,
+        'total_attempts': total_attempts,
+        'passed_attempts': passed_attempts,
+        'failed_attempts': total_attempts - passed_attempts,
+        'avg_score': round(profile.average_percentage, 2),
+    }
+    return await _render(request, 'quiz/dashboard.html', context)
+
+
+async def leaderboard(request, pk):
+    """Quiz leaderboard"""
+    cursor = request.GET.get('cursor')
+    try:
+        quiz, (top_entries, next_cursor), user = await gather(
+            lambda: Quiz.objects.select_related('category').filter(pk=pk, is_active=True).first(),
+            lambda: ranking.page(pk, cursor),
+            lambda: _user(request),
+        )
+    except signing.BadSignature:
+        return redirect('quiz:leaderboard', pk=pk)
+    if quiz is None:
+        raise Http404('No Quiz matches the given query.')
+
+    # Show where the user stands when they are not on this page
+    my_standing = None
+    if user.is_authenticated and not any(entry.user_id == user.id for entry in top_entries):
+        my_standing = await sync_to_async(ranking.standing)(quiz.pk, user)
+
+    context = {
+        'quiz': quiz,
+        'top_entries': top_entries,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
+        'my_standing': my_standing,
+    }
+    return await _render(request, 'quiz/leaderboard.html', context)
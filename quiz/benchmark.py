@@ -0,0 +1,315 @@
+"""
+View benchmarks against a seeded database.
+
+``seed`` fills the current database with synthetic quizzes, users and graded
+attempts, and ``run`` drives the main views through the Django test client and
+reports latency percentiles, queries per request and peak memory.
+``run_concurrent`` serves the read-heavy pages to many clients at once through
+the WSGI and ASGI handlers to compare the deployment profiles. The
+``benchmark`` management command runs them inside a throwaway test database.
+"""
+import asyncio
+import io
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from . import generator
+from .middleware import QueryRecorder
+from .models import Quiz, QuizAttempt, ActiveAttempt
+
+
+VIEWS = [
+    'home', 'quiz_list', 'quiz_detail', 'take_quiz', 'quiz_content', 'autosave_answers',
+    'submit_quiz', 'quiz_review', 'dashboard', 'leaderboard',
+]
+
+# Views that quiz.urls_async serves asynchronously
+CONCURRENT_VIEWS = ['home', 'quiz_list', 'quiz_detail', 'dashboard', 'leaderboard']
+
+# Deployment profiles compared by run_concurrent: handler and settings
+PROFILES = {
+    'wsgi': ('wsgi', {}),
+    'asgi_sync_views': ('asgi', {}),
+    'asgi': ('asgi', {
+        'ROOT_URLCONF': 'quiz_project.urls_asgi', 'QUIZ_ASYNC_PARALLEL_QUERIES': True,
+    }),
+}
+
+
+def seed(quizzes=50, questions=10, users=200, attempts=2000, seed=0):
+    """Fill the current database with synthetic data from ``quiz.generator``"""
+    generator.generate(
+        quizzes=quizzes, questions=questions, users=users, attempts=attempts, seed=seed
+    )
+
+
+def _percentile(cuts, p):
+    return round(cuts[p - 1] * 1000, 3)
+
+
+class Scenario:
+    """Prepares a client and returns the request to time for one view"""
+
+    def __init__(self, user, quiz, attempt):
+        self.user = user
+        self.quiz = quiz
+        self.attempt = attempt
+        self.client = Client()
+        self.client.force_login(user)
+        self.answers = {
+            question.pk: question.choices.all()[0].pk
+            for question in quiz.questions.prefetch_related('choices')
+        }
+
+    def start_attempt(self):
+        ActiveAttempt.start(self.user, self.quiz)
+
+    def prepare(self, view):
+        """Set up state outside the timed region; returns ``(method, url, kwargs)``"""
+        quiz_id = self.quiz.pk
+        if view == 'quiz_list':
+            return 'get', reverse('quiz:quiz_list'), {}
+        if view in ('quiz_detail', 'leaderboard'):
+            return 'get', reverse(f'quiz:{view}', args=[quiz_id]), {}
+        if view in ('take_quiz', 'quiz_content'):
+            self.start_attempt()
+            return 'get', reverse(f'quiz:{view}', args=[quiz_id]), {}
+        if view == 'autosave_answers':
+            self.start_attempt()
+            question_id, choice_id = next(iter(self.answers.items()))
+            return 'post', reverse('quiz:autosave_answers', args=[quiz_id]), {
+                'data': {'answers': {question_id: choice_id}},
+                'content_type': 'application/json',
+            }
+        if view == 'submit_quiz':
+            self.start_attempt()
+            return 'post', reverse('quiz:submit_quiz'), {
+                'data': {'quiz_id': quiz_id, 'answers': self.answers},
+                'content_type': 'application/json',
+            }
+        if view == 'attempt_state':
+            self.start_attempt()
+            return 'get', reverse('quiz:attempt_state', args=[quiz_id]), {}
+        if view in ('quiz_result', 'quiz_review'):
+            return 'get', reverse(f'quiz:{view}', args=[self.attempt.pk]), {}
+        if view in ('leaderboard_api', 'leaderboard_rank'):
+            return 'get', reverse(f'quiz:{view}', args=[quiz_id]), {}
+        if view == 'category_quizzes':
+            return 'get', reverse('quiz:category_quizzes', args=[self.quiz.category_id]), {}
+        if view == 'quiz_search_api':
+            return 'get', reverse('quiz:quiz_search_api'), {'data': {'q': self.quiz.title.split()[0]}}
+        return 'get', reverse(f'quiz:{view}'), {}
+
+    def request(self, view):
+        method, url, kwargs = self.prepare(view)
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{view} returned HTTP {response.status_code}')
+        return elapsed, recorder.count
+
+
+def _scenario():
+    # The busiest quiz and its most active user make the heaviest pages
+    quiz = Quiz.objects.annotate(n=Count('attempts')).order_by('-n', 'pk').first()
+    attempt = QuizAttempt.objects.filter(quiz=quiz).annotate(
+        n=Count('user__quiz_attempts')
+    ).order_by('-n', 'pk').select_related('user').first()
+    if attempt is None:
+        raise RuntimeError('No quiz attempts to benchmark; seed some data first')
+    return Scenario(attempt.user, quiz, attempt)
+
+
+def run(views=VIEWS, requests=50, warmup=5, memory_requests=5):
+    """
+    Benchmark ``views`` and return ``{view: stats}``.
+
+    Latencies are measured without tracing; peak memory comes from a separate
+    ``tracemalloc`` pass of ``memory_requests`` requests.
+    """
+    scenario = _scenario()
+
+    results = {}
+    for view in views:
+        for _ in range(warmup):
+            scenario.request(view)
+
+        timings, queries = [], []
+        for _ in range(requests):
+            elapsed, count = scenario.request(view)
+            timings.append(elapsed)
+            queries.append(count)
+
+        tracemalloc.start()
+        try:
+            for _ in range(memory_requests):
+                tracemalloc.reset_peak()
+                scenario.request(view)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        cuts = statistics.quantiles(timings, n=100, method='inclusive')
+        results[view] = {
+            'requests': requests,
+            'p50_ms': _percentile(cuts, 50),
+            'p95_ms': _percentile(cuts, 95),
+            'p99_ms': _percentile(cuts, 99),
+            'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+    return results
+
+
+@contextmanager
+def db_latency(ms):
+    """Add ``ms`` milliseconds to every query, like the round trip to a database server"""
+    if not ms:
+        yield
+        return
+    active = True
+
+    def delay(execute, sql, params, many, context):
+        if active:
+            time.sleep(ms / 1000)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        # Outermost, since the connection is opened inside QueryRecorder's
+        # wrappers and they are removed from the end of the list
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, delay)
+
+    for connection in connections.all():
+        install(connection)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        active = False
+        connection_created.disconnect(install)
+
+
+def _stats(timings, wall):
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'requests_per_s': round(len(timings) / wall, 1),
+        'p50_ms': _percentile(cuts, 50),
+        'p95_ms': _percentile(cuts, 95),
+    }
+
+
+def _wsgi(path, cookie, requests, concurrency):
+    handler = WSGIHandler()
+
+    def get(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'HTTP_COOKIE': cookie,
+            'SERVER_NAME': 'testserver', 'HTTP_HOST': 'testserver', 'wsgi.input': io.BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        status = []
+        start = time.perf_counter()
+        response = handler(environ, lambda code, headers: status.append(code))
+        b''.join(response)
+        response.close()
+        if not status[0].startswith(('2', '3')):
+            raise RuntimeError(f'{path} returned HTTP {status[0]}')
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        timings = list(pool.map(get, range(requests)))
+        return timings, time.perf_counter() - start
+
+
+async def _asgi(path, cookie, requests, concurrency):
+    handler = ASGIHandler()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def get():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with slots:
+            start = time.perf_counter()
+            await handler(scope, receive, send)
+            if status[0] >= 400:
+                raise RuntimeError(f'{path} returned HTTP {status[0]}')
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(get() for _ in range(requests)))
+    return timings, time.perf_counter() - start
+
+
+def run_concurrent(views=CONCURRENT_VIEWS, requests=200, concurrency=20, warmup=5, latency_ms=0):
+    """
+    Serve ``views`` to ``concurrency`` clients at once under every profile in
+    ``PROFILES`` and return ``{view: {profile: stats}}``.
+
+    Requests go straight to Django's WSGI handler (on a pool of ``concurrency``
+    threads) or ASGI handler (on one event loop), like an application server
+    would call them. ``latency_ms`` is added to every query: against a local
+    SQLite file queries take microseconds, which hides what overlapping them
+    saves against a database server.
+    """
+    scenario = _scenario()
+    cookie = scenario.client.cookies.output(attrs=[], header='', sep=';').strip()
+
+    results = {}
+    with db_latency(latency_ms):
+        for view in views:
+            path = scenario.prepare(view)[1]
+            results[view] = {}
+            for profile, (server, overrides) in PROFILES.items():
+                with override_settings(**overrides):
+                    if server == 'wsgi':
+                        _wsgi(path, cookie, warmup, 1)
+                        timings, wall = _wsgi(path, cookie, requests, concurrency)
+                    else:
+                        asyncio.run(_asgi(path, cookie, warmup, 1))
+                        timings, wall = asyncio.run(_asgi(path, cookie, requests, concurrency))
+                results[view][profile] = _stats(timings, wall)
+    return results
+
+
+def compare(baseline, current, threshold=0.2):
+    """List regressions of ``current`` against a ``baseline`` report"""
+    regressions = []
+    for view, stats in current['views'].items():
+        before = baseline.get('views', {}).get(view)
+        if not before:
+            continue
+        if stats['queries'] > before['queries']:
+            regressions.append(f"{view}: queries {before['queries']} -> {stats['queries']}")
+        if stats['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{view}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+    return regressions
@@ -0,0 +1,61 @@
+"""
+Quiz content payload for the quiz taking page.
+
+The questions and choices of a quiz, in display order and without correctness
+flags, are the same for every candidate, so they are serialized once per
+content version and cached in the shared Django cache next to the answer key
+(``quiz.answer_key`` bumps the version on every change to the quiz, its
+questions or its choices). The strong ETag is a hash of the serialized body,
+so every process hands out the same ETag for the same content.
+"""
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .answer_key import current_version
+from .models import Question, Quiz
+
+
+Payload = namedtuple('Payload', ['etag', 'body'])
+
+CONTENT_KEY = 'quiz:content:{quiz_id}:{version}'
+SHARED_TIMEOUT = getattr(settings, 'QUIZ_ANSWER_KEY_TIMEOUT', 60 * 60 * 24)
+
+
+def build_payload(quiz_id):
+    """Serialize an active quiz's questions and choices; returns ``None`` for other quizzes"""
+    quiz = Quiz.objects.filter(pk=quiz_id, is_active=True).values('id', 'title').first()
+    if quiz is None:
+        return None
+
+    questions = {}
+    rows = Question.objects.filter(quiz_id=quiz_id).order_by(
+        'order', 'id', 'choices__order', 'choices__id'
+    ).values_list('id', 'question_text', 'marks', 'choices__id', 'choices__choice_text')
+    for question_id, text, marks, choice_id, choice_text in rows:
+        question = questions.setdefault(question_id, {
+            'id': question_id, 'text': text, 'marks': marks, 'choices': []
+        })
+        if choice_id is not None:
+            question['choices'].append({'id': choice_id, 'text': choice_text})
+
+    body = json.dumps(
+        {'quiz': quiz, 'questions': list(questions.values())},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    return Payload(f'"{hashlib.sha256(body).hexdigest()[:32]}"', body)
+
+
+def get_payload(quiz_id):
+    """Return the cached content ``Payload`` of an active quiz, or ``None``"""
+    content_key = CONTENT_KEY.format(quiz_id=quiz_id, version=current_version(quiz_id))
+    payload = cache.get(content_key)
+    if payload is None:
+        payload = build_payload(quiz_id)
+        if payload is None:
+            return None
+        cache.set(content_key, payload, SHARED_TIMEOUT)
+    return Payload(*payload)
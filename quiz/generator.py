@@ -0,0 +1,271 @@
+"""
+Deterministic synthetic data for load testing.
+
+``generate`` creates categories, quizzes with questions and choices, users and
+a graded attempt history with ``bulk_create`` in batched transactions. The same
+arguments and seed always produce the same rows. Scores follow a simple item
+response model: every user has an ability, every question a difficulty, and
+the chance of a correct answer grows with the gap between the two, so scores
+spread around a realistic mean instead of being uniform noise. Timestamps are
+counted back from a fixed ``epoch`` rather than the current time, so they are
+reproducible too.
+
+Bulk inserts skip model signals, so the derived tables (quiz counters, profile
+stats, leaderboards and site counters) are rebuilt at the end.
+"""
+import io
+import math
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Category, Quiz, Question, Choice, QuizAttempt, Answer, UserProfile
+
+
+USERNAME_PREFIX = 'sample_user_'
+DEFAULT_PASSWORD = 'password'
+BATCH_SIZE = 5000
+HISTORY_DAYS = 180
+# Generated timestamps fall in the HISTORY_DAYS before this moment
+DEFAULT_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+TOPICS = [
+    ('Python Programming', ['syntax', 'data types', 'functions', 'classes', 'modules']),
+    ('General Knowledge', ['geography', 'history', 'culture', 'landmarks', 'flags']),
+    ('Mathematics', ['algebra', 'geometry', 'fractions', 'probability', 'calculus']),
+    ('Science', ['physics', 'chemistry', 'biology', 'astronomy', 'ecology']),
+    ('Web Development', ['HTML', 'CSS', 'JavaScript', 'HTTP', 'accessibility']),
+    ('Databases', ['SQL', 'indexes', 'transactions', 'normalization', 'joins']),
+    ('Literature', ['novels', 'poetry', 'authors', 'genres', 'characters']),
+    ('Sports', ['football', 'cricket', 'tennis', 'athletics', 'olympics']),
+]
+SUBJECTS = dict(TOPICS)
+LEVELS = {'easy': -1.0, 'medium': 0.0, 'hard': 1.0}
+LEVEL_NAMES = {'easy': 'Basics', 'medium': 'Essentials', 'hard': 'Advanced'}
+DERIVED_COMMANDS = (
+    'repair_quiz_counters', 'reconcile_profiles', 'rebuild_leaderboard', 'rebuild_site_stats',
+)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Generator:
+    """Builds one synthetic dataset; ``log`` receives progress lines"""
+
+    def __init__(self, seed=0, batch_size=BATCH_SIZE, log=None, epoch=DEFAULT_EPOCH):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = epoch
+
+    def _bulk_create(self, model, objs, **kwargs):
+        created = []
+        for batch in _batches(objs, self.batch_size):
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(batch, **kwargs))
+        return created
+
+    def users(self, count):
+        """Create ``count`` users (reusing earlier runs) and return their ids"""
+        password = make_password(DEFAULT_PASSWORD)
+        self._bulk_create(User, [
+            User(username=f'{USERNAME_PREFIX}{n}', email=f'{USERNAME_PREFIX}{n}@example.com',
+                 password=password, date_joined=self.now - timedelta(days=HISTORY_DAYS))
+            for n in range(count)
+        ], ignore_conflicts=True)
+        user_ids = list(User.objects.filter(
+            username__in=[f'{USERNAME_PREFIX}{n}' for n in range(count)]
+        ).order_by('pk').values_list('pk', flat=True))
+        self._bulk_create(UserProfile, [
+            UserProfile(user_id=user_id) for user_id in user_ids
+        ], ignore_conflicts=True)
+        self.log(f'{len(user_ids)} users')
+        return user_ids
+
+    def quizzes(self, count, questions, author_id):
+        """
+        Create quizzes, questions and choices.
+
+        Returns one ``(quiz, items)`` pair per quiz where ``items`` holds
+        ``(question_id, marks, difficulty, correct_choice_id, wrong_choice_ids)``.
+        """
+        rng = self.rng
+        categories = {}
+        for name, _ in TOPICS:
+            categories[name], _ = Category.objects.get_or_create(
+                name=name, defaults={'description': f'Questions about {name.lower()}'}
+            )
+
+        quiz_objs = []
+        for n in range(count):
+            topic, subjects = TOPICS[n % len(TOPICS)]
+            difficulty = rng.choices(list(LEVELS), weights=[3, 5, 2])[0]
+            quiz_objs.append(Quiz(
+                title=f'{topic} {LEVEL_NAMES[difficulty]} #{n + 1}',
+                description=f'{questions} questions on {", ".join(rng.sample(subjects, 3))}.',
+                category=categories[topic],
+                difficulty=difficulty,
+                time_limit=max(1, min(180, questions + rng.randint(0, questions))),
+                passing_score=rng.choice([40, 50, 60, 70]),
+                max_attempts=rng.choice([1, 3, 3, 5]),
+                created_by_id=author_id,
+            ))
+        quiz_objs = self._bulk_create(Quiz, quiz_objs)
+        self.log(f'{len(quiz_objs)} quizzes')
+
+        question_objs = []
+        difficulty = {}
+        for quiz in quiz_objs:
+            subjects = SUBJECTS[quiz.category.name]
+            for order in range(1, questions + 1):
+                question = Question(
+                    quiz=quiz,
+                    question_text=f'{quiz.title}, question {order}: which statement about '
+                                  f'{rng.choice(subjects)} is correct?',
+                    marks=rng.choices([1, 2, 3], weights=[6, 3, 1])[0],
+                    order=order,
+                )
+                difficulty[id(question)] = LEVELS[quiz.difficulty] + rng.gauss(0, 0.8)
+                question_objs.append(question)
+        question_objs = self._bulk_create(Question, question_objs)
+        self.log(f'{len(question_objs)} questions')
+
+        choice_objs = []
+        for question in question_objs:
+            correct = rng.randrange(4)
+            choice_objs.extend(
+                Choice(question=question, choice_text=f'Option {n + 1}',
+                       is_correct=n == correct, order=n + 1)
+                for n in range(4)
+            )
+        choice_objs = self._bulk_create(Choice, choice_objs)
+        self.log(f'{len(choice_objs)} choices')
+
+        choices = {}
+        for choice in choice_objs:
+            choices.setdefault(choice.question_id, []).append(choice)
+        items = {}
+        for question in question_objs:
+            options = choices[question.pk]
+            items.setdefault(question.quiz_id, []).append((
+                question.pk,
+                question.marks,
+                difficulty[id(question)],
+                next(choice.pk for choice in options if choice.is_correct),
+                [choice.pk for choice in options if not choice.is_correct],
+            ))
+        return [(quiz, items.get(quiz.pk, [])) for quiz in quiz_objs]
+
+    def _pick(self, count, skew):
+        """Index in ``range(count)`` where low indices are more popular"""
+        return min(count - 1, int(count * self.rng.random() ** skew))
+
+    def attempts(self, count, user_ids, quizzes):
+        """
+        Create up to ``count`` graded attempts with one answer per question.
+
+        A draw that keeps landing on (user, quiz) pairs without attempts left
+        under ``max_attempts`` is skipped, so fewer attempts may be created.
+        Attempts stored by earlier runs count against ``max_attempts`` too.
+        """
+        rng = self.rng
+        ability = {user_id: rng.gauss(0.5, 1.0) for user_id in user_ids}
+        taken = {
+            (row['user'], row['quiz']): row['n']
+            for row in QuizAttempt.objects.filter(
+                quiz_id__in=[quiz.pk for quiz, _ in quizzes]
+            ).order_by().values('user', 'quiz').annotate(n=Count('pk'))
+        }
+        total_answers = 0
+        drawn = 0
+        created = 0
+
+        while drawn < count:
+            attempts, graded, completed = [], [], []
+            draws = min(self.batch_size, count - drawn)
+            drawn += draws
+            for _ in range(draws):
+                # Respect max_attempts; skip the draw after a few full pairs
+                for _ in range(10):
+                    user_id = user_ids[self._pick(len(user_ids), 1.5)]
+                    quiz, items = quizzes[self._pick(len(quizzes), 2)]
+                    if taken.get((user_id, quiz.pk), 0) < quiz.max_attempts:
+                        break
+                else:
+                    continue
+                taken[(user_id, quiz.pk)] = taken.get((user_id, quiz.pk), 0) + 1
+
+                rows, score, total = [], 0, 0
+                for question_id, marks, difficulty, correct_id, wrong_ids in items:
+                    total += marks
+                    if rng.random() < 0.05:
+                        rows.append((question_id, None, False, 0))
+                        continue
+                    p = 1 / (1 + math.exp(difficulty - ability[user_id]))
+                    if rng.random() < p:
+                        score += marks
+                        rows.append((question_id, correct_id, True, marks))
+                    else:
+                        rows.append((question_id, rng.choice(wrong_ids), False, 0))
+
+                limit = quiz.time_limit * 60
+                completed_at = self.now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+                time_taken = max(5, min(limit, int(rng.gauss(limit * 0.55, limit * 0.2))))
+                attempt = QuizAttempt(
+                    user_id=user_id, quiz=quiz, score=score, total_marks=total,
+                    time_taken=time_taken,
+                    started_at=completed_at - timedelta(seconds=time_taken),
+                    # rebuild_derived counts these instead of attempt_completed jobs
+                    stats_applied=True,
+                )
+                attempt.calculate_percentage()
+                attempt.check_passed()
+                attempts.append(attempt)
+                graded.append(rows)
+                completed.append(completed_at)
+
+            with transaction.atomic():
+                QuizAttempt.objects.bulk_create(attempts)
+                # completed_at is auto_now_add, so backdate it once the rows exist
+                for attempt, completed_at in zip(attempts, completed):
+                    attempt.completed_at = completed_at
+                QuizAttempt.objects.bulk_update(attempts, ['completed_at'], batch_size=self.batch_size)
+                answers = [
+                    Answer(attempt=attempt, question_id=question_id,
+                           selected_choice_id=choice_id, is_correct=is_correct,
+                           marks_obtained=marks)
+                    for attempt, rows in zip(attempts, graded)
+                    for question_id, choice_id, is_correct, marks in rows
+                ]
+                for batch in _batches(answers, self.batch_size):
+                    Answer.objects.bulk_create(batch)
+            created += len(attempts)
+            total_answers += len(answers)
+            self.log(f'{created}/{count} attempts')
+        if created < count:
+            self.log(f'Skipped {count - created} attempts: their users had no attempts left')
+        self.log(f'{total_answers} answers')
+
+    def rebuild_derived(self):
+        for command in DERIVED_COMMANDS:
+            call_command(command, stdout=io.StringIO())
+        self.log('Rebuilt quiz counters, profiles, leaderboards and site statistics')
+
+
+def generate(quizzes, questions, users, attempts, seed=0, batch_size=BATCH_SIZE, log=None,
+             epoch=DEFAULT_EPOCH):
+    """Generate a complete dataset and rebuild everything derived from it"""
+    generator = Generator(seed=seed, batch_size=batch_size, log=log, epoch=epoch)
+    user_ids = generator.users(max(1, users))
+    quiz_items = generator.quizzes(quizzes, questions, author_id=user_ids[0])
+    if attempts and quiz_items:
+        generator.attempts(attempts, user_ids, quiz_items)
+    generator.rebuild_derived()
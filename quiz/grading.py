@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import jobs, site_stats, sqlite
+from .answer_key import get_answer_key
+from .models import QuizAttempt, Answer, UserProfile, LeaderboardEntry, ActiveAttempt
+
+
+class GradingError(Exception):
+    """Raised when a submission references questions or choices outside the quiz"""
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise GradingError(f'Invalid id: {value!r}')
+
+
+def clean_answers(answer_key, answers):
+    """
+    Validate a ``{question_id: choice_id}`` mapping against ``answer_key``.
+
+    Returns the mapping with integer ids; a ``None`` or empty choice marks the
+    question as unanswered and is kept as ``None``. Keys naming the same
+    question twice (e.g. ``"5"`` and ``5``) are rejected.
+    """
+    if not isinstance(answers, dict):
+        raise GradingError('Answers must be an object')
+    cleaned = {}
+    for question_id, choice_id in answers.items():
+        question_id = _to_id(question_id)
+        if question_id in cleaned:
+            raise GradingError(f'Question {question_id} is answered more than once')
+        if question_id not in answer_key:
+            raise GradingError(f'Question {question_id} does not belong to this quiz')
+        if choice_id in (None, ''):
+            cleaned[question_id] = None
+            continue
+        choice_id = _to_id(choice_id)
+        if choice_id not in answer_key[question_id].choice_ids:
+            raise GradingError(f'Choice {choice_id} does not belong to question {question_id}')
+        cleaned[question_id] = choice_id
+    return cleaned
+
+
+def score_answers(answer_key, answers):
+    """
+    Validate and score a submitted ``{question_id: choice_id}`` mapping in memory.
+
+    Returns ``(score, graded)`` where ``graded`` holds one
+    ``(question_id, choice_id, is_correct, marks_obtained)`` tuple per question
+    in the key; unanswered questions get a ``None`` choice and zero marks.
+    """
+    selected = clean_answers(answer_key, answers)
+
+    score = 0
+    graded = []
+    for question_id, entry in answer_key.items():
+        choice_id = selected.get(question_id)
+        is_correct = choice_id in entry.correct_choice_ids
+        marks_obtained = entry.marks if is_correct else 0
+        score += marks_obtained
+        graded.append((question_id, choice_id, is_correct, marks_obtained))
+    return score, graded
+
+
+@sqlite.write_lane
+def grade_submission(user, quiz, answers, started_at, time_taken, active=None):
+    """
+    Grade a submission and persist the attempt with all of its answers.
+
+    The answer key comes from the answer key cache, scoring happens in memory
+    and the attempt and one ``Answer`` row per question are written in a
+    single transaction together with an ``attempt_completed`` job that
+    updates the user's profile stats, leaderboard entry and the site
+    counters in the background. On SQLite the transaction goes through the
+    write lane (``quiz.sqlite``).
+    When ``active`` is given, that ``ActiveAttempt`` is deleted in the same
+    transaction and ``None`` is returned if another request already did.
+    """
+    answer_key = get_answer_key(quiz.pk)
+    score, graded = score_answers(answer_key, answers)
+    total_marks = sum(entry.marks for entry in answer_key.values())
+
+    attempt = QuizAttempt(
+        user=user,
+        quiz=quiz,
+        score=score,
+        total_marks=total_marks,
+        time_taken=time_taken,
+        started_at=started_at
+    )
+    attempt.calculate_percentage()
+    attempt.check_passed()
+
+    with transaction.atomic():
+        if active is not None and not ActiveAttempt.objects.filter(pk=active.pk).delete()[0]:
+            return None
+        attempt.save()
+        Answer.objects.bulk_create([
+            Answer(
+                attempt=attempt,
+                question_id=question_id,
+                selected_choice_id=choice_id,
+                is_correct=is_correct,
+                marks_obtained=marks_obtained
+            )
+            for question_id, choice_id, is_correct, marks_obtained in graded
+        ])
+        jobs.enqueue('attempt_completed', attempt_id=attempt.pk)
+    return attempt
+
+
+@jobs.handler('attempt_completed')
+def attempt_completed(attempt_id):
+    """Fold a stored attempt into profile stats, the leaderboard and site counters"""
+    # Marking the attempt commits with the increments below, so an attempt is
+    # never counted twice, and rebuilds that ran first already counted it
+    if not QuizAttempt.objects.filter(pk=attempt_id, stats_applied=False).update(stats_applied=True):
+        # Deleted before the job ran, or already counted
+        return
+    attempt = QuizAttempt.objects.get(pk=attempt_id)
+    UserProfile.record_attempt(attempt)
+    LeaderboardEntry.record_attempt(attempt)
+    # A participant is a user with at least one counted attempt
+    counted = QuizAttempt.objects.filter(user_id=attempt.user_id, stats_applied=True)
+    if not counted.exclude(pk=attempt.pk).exists():
+        site_stats.increment(site_stats.PARTICIPANTS)
+
+
+def _saved_answers(answer_key, saved):
+    # Saved answers were valid when stored; drop those the quiz no longer has
+    answers = {}
+    for question_id, choice_id in saved.items():
+        try:
+            answers.update(clean_answers(answer_key, {question_id: choice_id}))
+        except GradingError:
+            continue
+    return answers
+
+
+def finalize_attempt(active, answers=None, finished_at=None):
+    """
+    Grade an ``ActiveAttempt`` and remove it in the same transaction.
+
+    ``answers`` are merged over the answers autosaved on the attempt. Returns
+    the new ``QuizAttempt``, or ``None`` when a concurrent request already
+    finalized it.
+    """
+    finished_at = finished_at or timezone.now()
+    answer_key = get_answer_key(active.quiz_id)
+    # Both sides have integer keys, so a submitted answer replaces the saved one
+    saved = _saved_answers(answer_key, active.answers)
+    return grade_submission(
+        active.user, active.quiz, {**saved, **clean_answers(answer_key, answers or {})},
+        started_at=active.started_at,
+        time_taken=max(0, int((finished_at - active.started_at).total_seconds())),
+        active=active
+    )
@@ -0,0 +1,152 @@
+"""
+Database-backed job queue for work that does not need to hold up a response.
+
+``enqueue`` inserts a ``Job`` row in the caller's transaction, so a job exists
+exactly when the data it refers to was committed. Workers (``manage.py
+run_jobs``) claim due jobs with a lease that expires after the visibility
+timeout; a job whose worker died or stalled is claimed again once its lease
+has expired. A handler's writes commit together with the removal of its job,
+so a worker that lost its lease skips the job instead of applying it twice.
+Failed jobs are retried with exponential backoff and dead-lettered after
+``max_attempts``, keeping the last traceback for inspection in the admin.
+
+With ``QUIZ_JOBS_EAGER`` on, each job is also run in the enqueuing process as
+soon as its transaction commits, for development without a worker. It still
+goes through the queue, so a failure is retried by ``run_jobs`` as usual.
+"""
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger('quiz.jobs')
+
+HANDLERS = {}
+
+MAX_ATTEMPTS = getattr(settings, 'QUIZ_JOB_MAX_ATTEMPTS', 5)
+VISIBILITY_TIMEOUT = getattr(settings, 'QUIZ_JOB_VISIBILITY_TIMEOUT', 60)
+RETRY_DELAY = getattr(settings, 'QUIZ_JOB_RETRY_DELAY', 5)
+
+
+class LeaseLost(Exception):
+    """Raised when a job was claimed by another worker while it ran"""
+
+
+def handler(name):
+    """Register the decorated function as the handler of jobs called ``name``"""
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+    """Queue a job; ``payload`` must be JSON serializable and is passed to the handler"""
+    if name not in HANDLERS:
+        raise LookupError(f'No handler registered for job {name!r}')
+    job = Job.objects.create(
+        name=name, payload=payload, max_attempts=MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay)
+    )
+    if getattr(settings, 'QUIZ_JOBS_EAGER', False) and not delay:
+        transaction.on_commit(lambda: _run_eagerly(job.pk))
+    return job
+
+
+def _due(now):
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+def claim(limit=10, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Lease up to ``limit`` due jobs and return them"""
+    now = timezone.now()
+    ids = list(
+        Job.objects.filter(_due(now)).order_by('run_after', 'pk').values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    return _lease(ids, now, visibility_timeout)
+
+
+def _lease(ids, now, visibility_timeout):
+    # The condition is checked again by the UPDATE, so concurrent workers
+    # never lease the same job
+    lease = uuid.uuid4().hex
+    Job.objects.filter(_due(now), pk__in=ids).update(
+        status=Job.RUNNING, lease=lease, attempts=F('attempts') + 1,
+        locked_until=now + timedelta(seconds=visibility_timeout),
+    )
+    return list(Job.objects.filter(lease=lease))
+
+
+def _run_eagerly(pk):
+    # A worker may have claimed it already; then there is nothing to lease
+    for job in _lease([pk], timezone.now(), VISIBILITY_TIMEOUT):
+        run(job)
+
+
+def run(job):
+    """Run a claimed job; returns ``True`` when it succeeded"""
+    try:
+        func = HANDLERS.get(job.name)
+        if func is None:
+            raise LookupError(f'No handler registered for job {job.name!r}')
+        with transaction.atomic():
+            # Removing the job first also makes this a write transaction from
+            # the start, which SQLite needs to wait for its lock
+            if not Job.objects.filter(pk=job.pk, lease=job.lease).delete()[0]:
+                raise LeaseLost(f'Job {job.pk} was claimed again before it finished')
+            func(**job.payload)
+        return True
+    except LeaseLost as e:
+        logger.warning('%s', e)
+        return False
+    except Exception:
+        _failed(job, traceback.format_exc())
+        return False
+
+
+def _failed(job, error):
+    now = timezone.now()
+    dead = job.attempts >= job.max_attempts
+    Job.objects.filter(pk=job.pk, lease=job.lease).update(
+        status=Job.DEAD if dead else Job.QUEUED,
+        lease='',
+        locked_until=None,
+        last_error=error,
+        run_after=now + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1)),
+    )
+    if dead:
+        logger.error('Job %s %s failed %d times, dead-lettered:\n%s', job.pk, job.name, job.attempts, error)
+    else:
+        logger.warning('Job %s %s failed (attempt %d), retrying:\n%s', job.pk, job.name, job.attempts, error)
+
+
+def run_pending(limit=None, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Run due jobs in this thread until none are left; returns ``(succeeded, failed)``"""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        batch = claim(10 if limit is None else min(10, limit - succeeded - failed), visibility_timeout)
+        if not batch:
+            break
+        for job in batch:
+            if run(job):
+                succeeded += 1
+            else:
+                failed += 1
+    return succeeded, failed
+
+
+def retry(jobs):
+    """Put dead or stuck jobs back in the queue with a fresh attempt budget"""
+    return jobs.update(
+        status=Job.QUEUED, attempts=0, lease='', locked_until=None, run_after=timezone.now()
+    )
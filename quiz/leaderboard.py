@@ -0,0 +1,132 @@
+"""
+Ranking and keyset pagination over the materialized leaderboard.
+
+Entries are ordered by ``(-score, time_taken, completed_at, id)``. A user's
+rank is the number of entries ahead of them plus one. Entries with a higher
+score are summed from the per-score ``LeaderboardBucket`` rows, one per
+distinct score, and only the entries sharing the user's score are counted row
+by row, as a range of the ``(quiz, -score, time_taken, completed_at)`` index.
+The cost therefore grows with the number of distinct scores plus the number
+of entries tied on the user's score, not with the size of the leaderboard.
+"""
+from django.core import signing
+from django.db.models import Q, Sum
+from django.utils.dateparse import parse_datetime
+
+from .models import LeaderboardEntry, LeaderboardBucket
+
+
+CURSOR_SALT = 'quiz.leaderboard.cursor'
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _key(entry):
+    return (entry.score, entry.time_taken, entry.completed_at, entry.pk)
+
+
+def _ahead_of(score, time_taken, completed_at, pk):
+    return (
+        Q(score__gt=score)
+        | Q(score=score, time_taken__lt=time_taken)
+        | Q(score=score, time_taken=time_taken, completed_at__lt=completed_at)
+        | Q(score=score, time_taken=time_taken, completed_at=completed_at, pk__lt=pk)
+    )
+
+
+def _behind(score, time_taken, completed_at, pk):
+    return (
+        Q(score__lt=score)
+        | Q(score=score, time_taken__gt=time_taken)
+        | Q(score=score, time_taken=time_taken, completed_at__gt=completed_at)
+        | Q(score=score, time_taken=time_taken, completed_at=completed_at, pk__gt=pk)
+    )
+
+
+def total_entries(quiz_id):
+    """Number of users on the quiz leaderboard"""
+    return LeaderboardBucket.objects.filter(quiz_id=quiz_id).aggregate(
+        n=Sum('entries')
+    )['n'] or 0
+
+
+def rank_of(entry):
+    """Exact 1-based rank of a leaderboard entry"""
+    higher_scores = LeaderboardBucket.objects.filter(
+        quiz_id=entry.quiz_id, score__gt=entry.score
+    ).aggregate(n=Sum('entries'))['n'] or 0
+    same_score_ahead = LeaderboardEntry.objects.filter(
+        quiz_id=entry.quiz_id, score=entry.score
+    ).filter(
+        Q(time_taken__lt=entry.time_taken)
+        | Q(time_taken=entry.time_taken, completed_at__lt=entry.completed_at)
+        | Q(time_taken=entry.time_taken, completed_at=entry.completed_at, pk__lt=entry.pk)
+    ).count()
+    return higher_scores + same_score_ahead + 1
+
+
+def _with_ranks(entries, first_rank, step=1):
+    for offset, entry in enumerate(entries):
+        entry.rank = first_rank + offset * step
+    return entries
+
+
+def standing(quiz_id, user, neighbours=2):
+    """
+    Return the user's entry, rank and surrounding entries, or ``None``.
+
+    The result is a dict with ``entry`` (ranked), ``above`` and ``below`` lists
+    of at most ``neighbours`` ranked entries each, and ``total``.
+    """
+    # get() rather than first(): the default ordering would join quiz_quiz to sort one row
+    try:
+        entry = LeaderboardEntry.objects.select_related('user').get(quiz_id=quiz_id, user=user)
+    except LeaderboardEntry.DoesNotExist:
+        return None
+    entry.rank = rank_of(entry)
+
+    entries = LeaderboardEntry.objects.filter(quiz_id=quiz_id).select_related('user')
+    above = list(entries.filter(_ahead_of(*_key(entry))).order_by(
+        'score', '-time_taken', '-completed_at', '-id'
+    )[:neighbours])
+    below = list(entries.filter(_behind(*_key(entry)))[:neighbours])
+    return {
+        'entry': entry,
+        'above': _with_ranks(above, entry.rank - 1, step=-1)[::-1],
+        'below': _with_ranks(below, entry.rank + 1),
+        'total': total_entries(quiz_id),
+    }
+
+
+def encode_cursor(entry):
+    score, time_taken, completed_at, pk = _key(entry)
+    return signing.dumps(
+        [score, time_taken, completed_at.isoformat(), pk, entry.rank],
+        salt=CURSOR_SALT, compress=True
+    )
+
+
+def decode_cursor(cursor):
+    """Return ``(key, rank)`` for a cursor; raises ``signing.BadSignature`` when invalid"""
+    score, time_taken, completed_at, pk, rank = signing.loads(cursor, salt=CURSOR_SALT)
+    return (score, time_taken, parse_datetime(completed_at), pk), rank
+
+
+def page(quiz_id, cursor=None, size=PAGE_SIZE):
+    """
+    Return one keyset-paginated page of ranked entries.
+
+    Returns ``(entries, next_cursor)``; ``next_cursor`` is ``None`` on the last
+    page. Invalid cursors raise ``signing.BadSignature``.
+    """
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    entries = LeaderboardEntry.objects.filter(quiz_id=quiz_id).select_related('user')
+    first_rank = 1
+    if cursor:
+        key, last_rank = decode_cursor(cursor)
+        entries = entries.filter(_behind(*key))
+        first_rank = last_rank + 1
+
+    rows = _with_ranks(list(entries[:size + 1]), first_rank)
+    next_cursor = encode_cursor(rows[size - 1]) if len(rows) > size else None
+    return rows[:size], next_cursor
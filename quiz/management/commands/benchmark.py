@@ -0,0 +1,123 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from quiz import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and report per-view latency percentiles, '
+        'queries per request and peak memory as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quizzes', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=10, help='Questions per quiz')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--attempts', type=int, default=2000, help='Graded attempts in total')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per view')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view')
+        parser.add_argument('--view', action='append', dest='views', choices=benchmark.VIEWS,
+                            help='Only benchmark the given view (repeatable)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Fail when regressing against this JSON report')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 slowdown against the baseline (0.2 = 20%%)')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also serve the async-capable views to this many clients at once '
+                                 'under WSGI and ASGI')
+        parser.add_argument('--concurrent-requests', type=int, default=200,
+                            help='Requests per view and profile in the concurrent run')
+        parser.add_argument('--db-latency', type=float, default=0,
+                            help='Milliseconds added to every query in the concurrent run')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('--requests must be at least 2')
+        if options['concurrency'] and options['concurrent_requests'] < 2:
+            raise CommandError('--concurrent-requests must be at least 2')
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stderr.write('Seeding benchmark data...')
+            benchmark.seed(
+                quizzes=options['quizzes'],
+                questions=options['questions'],
+                users=options['users'],
+                attempts=options['attempts'],
+                seed=options['seed'],
+            )
+            self.stderr.write('Running views...')
+            views = benchmark.run(
+                views=options['views'] or benchmark.VIEWS,
+                requests=options['requests'],
+                warmup=options['warmup'],
+            )
+            concurrency = None
+            if options['concurrency']:
+                self.stderr.write('Running concurrent clients...')
+                concurrency = benchmark.run_concurrent(
+                    views=[
+                        view for view in benchmark.CONCURRENT_VIEWS
+                        if not options['views'] or view in options['views']
+                    ],
+                    requests=options['concurrent_requests'],
+                    concurrency=options['concurrency'],
+                    warmup=options['warmup'],
+                    latency_ms=options['db_latency'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'commit': self._commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'volumes': {
+                    name: options[name]
+                    for name in ('quizzes', 'questions', 'users', 'attempts', 'seed')
+                },
+            },
+            'views': views,
+        }
+        if concurrency is not None:
+            report['concurrency'] = {
+                'clients': options['concurrency'],
+                'db_latency_ms': options['db_latency'],
+                'views': concurrency,
+            }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = benchmark.compare(json.load(f), report, options['threshold'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+            self.stderr.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
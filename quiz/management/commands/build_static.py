@@ -0,0 +1,49 @@
+import os
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from quiz.staticfiles import CompressedManifestStaticFilesStorage, ENCODINGS
+
+
+class Command(BaseCommand):
+    help = (
+        'Collect static files into STATIC_ROOT with content-hashed names, minified and '
+        'precompressed (gzip, and brotli when installed), and report their sizes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete the previous build from STATIC_ROOT first')
+
+    def handle(self, *args, **options):
+        if not isinstance(staticfiles_storage, CompressedManifestStaticFilesStorage):
+            raise CommandError(
+                'STORAGES["staticfiles"] must use quiz.staticfiles.CompressedManifestStaticFilesStorage'
+            )
+        call_command('collectstatic', interactive=False, clear=options['clear'], verbosity=0)
+
+        # The storage loaded the manifest before the build
+        storage = staticfiles_storage
+        storage.reload_manifest()
+        totals = {'raw': 0, **{encoding: 0 for encoding, _ in ENCODINGS}}
+        encodings = set()
+        for name, hashed_name in sorted(storage.hashed_files.items()):
+            sizes = {'raw': storage.size(hashed_name)}
+            for encoding, suffix in ENCODINGS:
+                if storage.exists(hashed_name + suffix):
+                    sizes[encoding] = storage.size(hashed_name + suffix)
+                    encodings.add(encoding)
+            # Files not worth compressing are sent as they are
+            for key in totals:
+                totals[key] += sizes.get(key, sizes['raw'])
+            self.stdout.write(f'{hashed_name}: ' + ', '.join(
+                f'{key} {size} B' for key, size in sizes.items()
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(storage.hashed_files)} files into {os.fspath(storage.location)}: '
+            + ', '.join(
+                f'{key} {size} B' for key, size in totals.items() if key == 'raw' or key in encodings
+            )
+        ))
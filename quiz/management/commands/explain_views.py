@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from quiz import benchmark, query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, EXPLAIN every query the views send, flag full '
+        'table scans and temporary B-tree sorts, and propose the composite indexes that fix them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quizzes', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=10, help='Questions per quiz')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--attempts', type=int, default=2000, help='Graded attempts in total')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data')
+        parser.add_argument('--view', action='append', dest='views', choices=query_plans.VIEWS,
+                            help='Only explain the given view (repeatable)')
+        parser.add_argument('--check', action='store_true',
+                            help='Exit with an error when an index is proposed, e.g. in CI')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('explain_views reads SQLite query plans; run it with the SQLite settings')
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stderr.write('Seeding data...')
+            benchmark.seed(
+                quizzes=options['quizzes'],
+                questions=options['questions'],
+                users=options['users'],
+                attempts=options['attempts'],
+                seed=options['seed'],
+            )
+            captured = query_plans.capture(options['views'] or query_plans.VIEWS)
+            proposals = query_plans.propose(captured)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        flagged = 0
+        for view, statements in captured.items():
+            problems = [statement for statement in statements if statement.flags]
+            flagged += len(problems)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{view}: {len(statements)} statements, {len(problems)} flagged'
+            ))
+            for statement in statements if options['verbosity'] > 1 else problems:
+                self.stdout.write(f'  {statement.sql}')
+                for line in statement.plan:
+                    self.stdout.write(f'    {line}')
+                for kind, subject in statement.flags:
+                    self.stdout.write(self.style.WARNING(f'    ! {kind}: {subject}'))
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS(f'No index proposals ({flagged} statements flagged)'))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING('Proposed indexes:'))
+        for proposal, views in proposals.items():
+            self.stdout.write(f'  {proposal}')
+            self.stdout.write(f'    fixes {", ".join(views)}')
+        if options['check']:
+            raise CommandError(f'{len(proposals)} index(es) proposed; add them to Meta.indexes')
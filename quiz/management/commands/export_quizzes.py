@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from quiz import quiz_bank
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Export quizzes with their questions and choices as JSON Lines (one quiz per line)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids',
+                            help='Only export the given quiz (repeatable)')
+        parser.add_argument('--category', help='Only export quizzes of this category name')
+        parser.add_argument('--active', action='store_true', help='Only export active quizzes')
+        parser.add_argument('--batch-size', type=int, default=100, help='Quizzes loaded per query')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+        if options['category']:
+            quizzes = quizzes.filter(category__name=options['category'])
+        if options['active']:
+            quizzes = quizzes.filter(is_active=True)
+
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        count = 0
+        try:
+            for line in quiz_bank.export_lines(quizzes, chunk_size=options['batch_size']):
+                output.write(line)
+                count += 1
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} quizzes'))
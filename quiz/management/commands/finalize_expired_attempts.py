@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from quiz.grading import finalize_attempt
+from quiz.models import ActiveAttempt
+
+
+class Command(BaseCommand):
+    help = 'Grade abandoned quiz attempts whose deadline has passed with the answers saved so far'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired attempts')
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help='Seconds past the deadline before an attempt counts as abandoned'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        expired = ActiveAttempt.objects.filter(deadline__lt=cutoff).select_related('user', 'quiz')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Found {expired.count()} expired attempts'))
+            return
+
+        # Finalizing deletes the rows, so walk a fixed list of pks rather than
+        # a cursor over the table being deleted from
+        pks = list(expired.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        finalized = 0
+        for start in range(0, len(pks), batch_size):
+            batch = ActiveAttempt.objects.filter(pk__in=pks[start:start + batch_size]).select_related('user', 'quiz')
+            for active in batch:
+                if finalize_attempt(active, finished_at=active.deadline) is not None:
+                    finalized += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Finalized {finalized} expired attempts'))
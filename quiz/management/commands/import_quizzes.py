@@ -0,0 +1,71 @@
+import json
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from quiz import quiz_bank
+
+
+class Command(BaseCommand):
+    help = (
+        'Import quizzes from a JSON Lines file written by export_quizzes, '
+        'creating or updating rows by external_id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON Lines file, or '-' for stdin")
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate and report what would change, then roll back')
+        parser.add_argument('--author', help='Username that owns newly created quizzes '
+                                             '(default: the first superuser)')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete questions and choices of imported quizzes that are '
+                                 'missing from the file (also deletes their answers)')
+        parser.add_argument('--batch-size', type=int, default=quiz_bank.BATCH_SIZE,
+                            help='Questions written per batch')
+
+    def handle(self, *args, **options):
+        author = self._author(options['author'])
+        importer = quiz_bank.Importer(
+            author, batch_size=options['batch_size'], prune=options['prune']
+        )
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            with transaction.atomic():
+                for line_number, line in enumerate(source, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise CommandError(f'line {line_number}: invalid JSON: {e}')
+                    importer.add(record, line_number)
+                stats = importer.finish(dry_run=options['dry_run'])
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+        except quiz_bank.QuizBankError as e:
+            raise CommandError(str(e))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        for name, value in stats.items():
+            self.stdout.write(f'{name}: {value}')
+        verb = 'Validated (dry run, nothing saved)' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {stats["quizzes_created"] + stats["quizzes_updated"]} quizzes'
+        ))
+
+    @staticmethod
+    def _author(username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        author = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if author is None:
+            raise CommandError('No superuser found; pass --author')
+        return author
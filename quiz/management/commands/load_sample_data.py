@@ -1,12 +1,34 @@
-from django.core.management.base import BaseCommand
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from quiz import generator
 from quiz.models import Category, Quiz, Question, Choice
 
 
 class Command(BaseCommand):
-    help = 'Load sample quiz data'
+    help = (
+        'Load the sample quizzes, or generate a large synthetic dataset '
+        'with --quizzes/--questions/--users/--attempts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quizzes', type=int, help='Generate this many synthetic quizzes')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per generated quiz')
+        parser.add_argument('--users', type=int, default=100, help='Generated users')
+        parser.add_argument('--attempts', type=int, default=0, help='Generated graded attempts')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; equal seeds give equal data')
+        parser.add_argument('--epoch', default=generator.DEFAULT_EPOCH.isoformat(),
+                            help='Generated history ends at this ISO datetime (UTC unless given)')
+        parser.add_argument('--batch-size', type=int, default=generator.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['quizzes'] is not None:
+            return self.generate(options)
 
-    def handle(self, *args, **kwargs):
         self.stdout.write('Loading sample data...')
 
         # Get or create admin user
@@ -104,20 +126,7 @@ class Command(BaseCommand):
             }
         ]
 
-        for idx, q_data in enumerate(questions_data, 1):
-            question = Question.objects.create(
-                quiz=python_quiz,
-                question_text=q_data['text'],
-                marks=q_data['marks'],
-                order=idx
-            )
-            for choice_idx, (choice_text, is_correct) in enumerate(q_data['choices'], 1):
-                Choice.objects.create(
-                    question=question,
-                    choice_text=choice_text,
-                    is_correct=is_correct,
-                    order=choice_idx
-                )
+        self.add_questions(python_quiz, questions_data)
 
         # General Knowledge Quiz
         gk_quiz = Quiz.objects.create(
@@ -184,20 +193,7 @@ class Command(BaseCommand):
             }
         ]
 
-        for idx, q_data in enumerate(gk_questions, 1):
-            question = Question.objects.create(
-                quiz=gk_quiz,
-                question_text=q_data['text'],
-                marks=q_data['marks'],
-                order=idx
-            )
-            for choice_idx, (choice_text, is_correct) in enumerate(q_data['choices'], 1):
-                Choice.objects.create(
-                    question=question,
-                    choice_text=choice_text,
-                    is_correct=is_correct,
-                    order=choice_idx
-                )
+        self.add_questions(gk_quiz, gk_questions)
 
         # Mathematics Quiz
         math_quiz = Quiz.objects.create(
@@ -254,20 +250,7 @@ class Command(BaseCommand):
             }
         ]
 
-        for idx, q_data in enumerate(math_questions, 1):
-            question = Question.objects.create(
-                quiz=math_quiz,
-                question_text=q_data['text'],
-                marks=q_data['marks'],
-                order=idx
-            )
-            for choice_idx, (choice_text, is_correct) in enumerate(q_data['choices'], 1):
-                Choice.objects.create(
-                    question=question,
-                    choice_text=choice_text,
-                    is_correct=is_correct,
-                    order=choice_idx
-                )
+        self.add_questions(math_quiz, math_questions)
 
         # Science Quiz
         science_quiz = Quiz.objects.create(
@@ -324,23 +307,52 @@ class Command(BaseCommand):
             }
         ]
 
-        for idx, q_data in enumerate(science_questions, 1):
-            question = Question.objects.create(
-                quiz=science_quiz,
-                question_text=q_data['text'],
-                marks=q_data['marks'],
-                order=idx
-            )
-            for choice_idx, (choice_text, is_correct) in enumerate(q_data['choices'], 1):
-                Choice.objects.create(
-                    question=question,
-                    choice_text=choice_text,
-                    is_correct=is_correct,
-                    order=choice_idx
-                )
+        self.add_questions(science_quiz, science_questions)
 
         self.stdout.write(self.style.SUCCESS('Successfully loaded sample data!'))
         self.stdout.write(f'Created {Category.objects.count()} categories')
         self.stdout.write(f'Created {Quiz.objects.count()} quizzes')
         self.stdout.write(f'Created {Question.objects.count()} questions')
-        self.stdout.write(f'Created {Choice.objects.count()} choices')
\ No newline at end of file
+        self.stdout.write(f'Created {Choice.objects.count()} choices')
+
+    def add_questions(self, quiz, questions_data):
+        """Bulk insert questions with their choices and refresh the quiz counters"""
+        with transaction.atomic():
+            questions = Question.objects.bulk_create([
+                Question(quiz=quiz, question_text=q_data['text'], marks=q_data['marks'], order=idx)
+                for idx, q_data in enumerate(questions_data, 1)
+            ])
+            Choice.objects.bulk_create([
+                Choice(question=question, choice_text=choice_text,
+                       is_correct=is_correct, order=choice_idx)
+                for question, q_data in zip(questions, questions_data)
+                for choice_idx, (choice_text, is_correct) in enumerate(q_data['choices'], 1)
+            ])
+            # bulk_create skips the signals that keep the counters up to date
+            Quiz.update_counters(quiz.pk)
+
+    def generate(self, options):
+        counts = [options[name] for name in ('quizzes', 'questions', 'users', 'attempts')]
+        if min(counts) < 0 or options['batch_size'] < 1:
+            raise CommandError('Counts cannot be negative and --batch-size must be positive')
+        epoch = parse_datetime(options['epoch'])
+        if epoch is None:
+            raise CommandError(f'--epoch must be an ISO datetime, not {options["epoch"]!r}')
+        if timezone.is_naive(epoch):
+            epoch = timezone.make_aware(epoch, dt_timezone.utc)
+
+        self.stdout.write('Generating synthetic data...')
+        generator.generate(
+            quizzes=options['quizzes'],
+            questions=options['questions'],
+            users=options['users'],
+            attempts=options['attempts'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+            epoch=epoch,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated data for seed {options["seed"]}; '
+            f'users log in with password "{generator.DEFAULT_PASSWORD}"'
+        ))
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from quiz.models import QuizAttempt, LeaderboardEntry, LeaderboardBucket
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the materialized leaderboard from quiz attempts '
+        '(run after importing or deleting attempts)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids',
+                            help='Only rebuild the given quiz (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        attempts = QuizAttempt.objects.order_by(
+            'quiz_id', 'user_id', '-score', 'time_taken', 'completed_at'
+        ).only('pk', 'quiz_id', 'user_id', 'score', 'total_marks',
+               'percentage', 'time_taken', 'completed_at')
+        entries = LeaderboardEntry.objects.all()
+        buckets = LeaderboardBucket.objects.all()
+        if options['quiz_ids']:
+            attempts = attempts.filter(quiz_id__in=options['quiz_ids'])
+            entries = entries.filter(quiz_id__in=options['quiz_ids'])
+            buckets = buckets.filter(quiz_id__in=options['quiz_ids'])
+
+        batch_size = options['batch_size']
+        created = 0
+        with transaction.atomic():
+            buckets.delete()
+            entries.delete()
+            batch = []
+            last = None
+            # Attempts arrive best-first per (quiz, user), so keep the first of each group
+            for attempt in attempts.iterator(chunk_size=batch_size):
+                if (attempt.quiz_id, attempt.user_id) == last:
+                    continue
+                last = (attempt.quiz_id, attempt.user_id)
+                batch.append(LeaderboardEntry(
+                    quiz_id=attempt.quiz_id,
+                    user_id=attempt.user_id,
+                    **LeaderboardEntry.fields_from_attempt(attempt)
+                ))
+                if len(batch) >= batch_size:
+                    LeaderboardEntry.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            LeaderboardEntry.objects.bulk_create(batch)
+            created += len(batch)
+
+            LeaderboardBucket.objects.bulk_create(
+                (
+                    LeaderboardBucket(**row)
+                    for row in entries.order_by().values(
+                        'quiz_id', 'score'
+                    ).annotate(entries=Count('pk')).iterator(chunk_size=batch_size)
+                ),
+                batch_size=batch_size
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} leaderboard entries'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from quiz import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search triggers and reindex all quizzes and questions'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Full-text search requires the SQLite database backend')
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
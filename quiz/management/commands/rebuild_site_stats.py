@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from quiz import site_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the site-wide home page counters and per-category quiz counts'
+
+    def handle(self, *args, **options):
+        values = site_stats.recompute()
+        for name, value in values.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS('Site statistics rebuilt'))
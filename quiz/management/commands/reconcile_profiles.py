@@ -0,0 +1,65 @@
+import math
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from quiz.models import QuizAttempt, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Recompute user profile statistics from quiz attempts and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report profiles that drifted')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        empty = {field: UserProfile._meta.get_field(field).default for field in UserProfile.STATS_FIELDS}
+
+        # One grouped query for the expected stats of every user with attempts.
+        # Attempts whose attempt_completed job has not run yet are left to it
+        expected = {
+            row.pop('user'): row
+            for row in QuizAttempt.objects.filter(stats_applied=True).order_by().values('user').annotate(
+                **UserProfile.stats_aggregates()
+            )
+        }
+
+        drifted = []
+        seen = set()
+        profiles = UserProfile.objects.only('user_id', *UserProfile.STATS_FIELDS)
+        for profile in profiles.iterator(chunk_size=options['batch_size']):
+            seen.add(profile.user_id)
+            stats = expected.get(profile.user_id, empty)
+            if self._drifted(profile, stats):
+                self.stdout.write(f'Profile of user {profile.user_id} drifted')
+                for field, value in stats.items():
+                    setattr(profile, field, value)
+                drifted.append(profile)
+
+        missing = [
+            UserProfile(user_id=user_id, **stats)
+            for user_id, stats in expected.items() if user_id not in seen
+        ]
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                UserProfile.objects.bulk_update(
+                    drifted, UserProfile.STATS_FIELDS, batch_size=options['batch_size']
+                )
+                UserProfile.objects.bulk_create(missing, batch_size=options['batch_size'])
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(drifted)} drifted and {len(missing)} missing profiles'
+        ))
+
+    @staticmethod
+    def _drifted(profile, stats):
+        for field, value in stats.items():
+            current = getattr(profile, field)
+            if isinstance(value, float):
+                if not math.isclose(current, value, abs_tol=1e-6):
+                    return True
+            elif current != value:
+                return True
+        return False
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Backfill or repair the denormalized question_count and total_marks of quizzes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report quizzes that drifted')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.order_by('pk').annotate(
+            actual_count=Count('questions'),
+            actual_marks=Coalesce(Sum('questions__marks'), 0),
+        ).only('pk', 'question_count', 'total_marks')
+
+        drifted = []
+        for quiz in quizzes.iterator(chunk_size=options['batch_size']):
+            if (quiz.question_count, quiz.total_marks) != (quiz.actual_count, quiz.actual_marks):
+                self.stdout.write(
+                    f'Quiz {quiz.pk}: questions {quiz.question_count} -> {quiz.actual_count}, '
+                    f'marks {quiz.total_marks} -> {quiz.actual_marks}'
+                )
+                quiz.question_count = quiz.actual_count
+                quiz.total_marks = quiz.actual_marks
+                drifted.append(quiz)
+
+        if not options['dry_run'] and drifted:
+            # Cached quiz cards and fragments are versioned by updated_at
+            now = timezone.now()
+            for quiz in drifted:
+                quiz.updated_at = now
+            with transaction.atomic():
+                Quiz.objects.bulk_update(
+                    drifted, [*Quiz.COUNTER_FIELDS, 'updated_at'], batch_size=options['batch_size']
+                )
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} quizzes with drifted counters'))
@@ -0,0 +1,61 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from quiz import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue (post-submit stats, leaderboard updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker threads')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs leased per claim')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--visibility-timeout', type=int, default=jobs.VISIBILITY_TIMEOUT,
+                            help='Seconds before a job held by a stalled worker is run again')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no jobs are due instead of polling')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.totals = [0, 0]
+
+        threads = [
+            threading.Thread(target=self.work, name=f'quiz-jobs-{i}', daemon=True)
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            # Let the jobs in hand finish; unfinished leases expire and are retried
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+        succeeded, failed = self.totals
+        self.stdout.write(self.style.SUCCESS(f'Ran {succeeded} jobs, {failed} failed'))
+
+    def work(self):
+        options = self.options
+        try:
+            while not self.stopping.is_set():
+                batch = jobs.claim(options['batch_size'], options['visibility_timeout'])
+                if not batch:
+                    if options['once']:
+                        return
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                for job in batch:
+                    ok = jobs.run(job)
+                    with self.lock:
+                        self.totals[0 if ok else 1] += 1
+        finally:
+            connection.close()
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from quiz import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite primary database into its read replicas; run it periodically '
+        'to keep local replicas from falling behind'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*',
+                            help='Replica database aliases (default: QUIZ_READ_REPLICAS)')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replicas.aliases()
+        if not aliases:
+            raise CommandError('No replicas: list them in QUIZ_READ_REPLICAS or pass their aliases')
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in connections or alias == DEFAULT_DB_ALIAS:
+                raise CommandError(f'{alias!r} is not a replica database alias')
+            replica = connections[alias]
+            if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+                raise CommandError('Only SQLite files can be copied; replicate other databases with their own tools')
+
+            start = time.perf_counter()
+            primary.ensure_connection()
+            # SQLite's online backup copies a consistent snapshot while the
+            # primary keeps taking writes
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(
+                f'Copied {primary.settings_dict["NAME"]} to {alias} '
+                f'in {(time.perf_counter() - start) * 1000:.0f} ms'
+            ))
@@ -0,0 +1,228 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import replicas
+
+
+logger = logging.getLogger('quiz.queries')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a view issues more queries than its budget"""
+
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """Normalize SQL so repeated shapes of the same query compare equal"""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _LITERAL_RE.sub('?', sql)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts queries, SQL time and repeated shapes.
+
+    Use as a context manager to record every connection::
+
+        with QueryRecorder() as recorder:
+            client.get(url)
+        recorder.count, recorder.duplicates
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self._wrappers = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total_time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """``{fingerprint: times}`` for every query shape issued more than once"""
+        return {sql: times for sql, times in self.fingerprints.items() if times > 1}
+
+    def __enter__(self):
+        for connection in connections.all():
+            wrapper = connection.execute_wrapper(self)
+            wrapper.__enter__()
+            self._wrappers.append(wrapper)
+        return self
+
+    def __exit__(self, *exc_info):
+        while self._wrappers:
+            self._wrappers.pop().__exit__(*exc_info)
+
+
+class QueryBudgetMiddleware:
+    """
+    Record the queries of every request and check them against per-view budgets.
+
+    Budgets come from ``QUIZ_QUERY_BUDGETS`` keyed by URL name (``'quiz:home'``).
+    Counts are logged to the ``quiz.queries`` logger and, with
+    ``QUIZ_QUERY_HEADERS``, returned as ``X-Query-*`` response headers. With
+    ``QUIZ_QUERY_BUDGET_STRICT`` an exceeded budget raises instead of logging.
+    Under ASGI only the request's own connection is recorded, so queries that
+    ``quiz.async_views.gather`` sends from worker connections are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'QUIZ_QUERY_INSTRUMENTATION', True):
+            return self.get_response(request)
+
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.check(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'QUIZ_QUERY_INSTRUMENTATION', True):
+            return await self.get_response(request)
+
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.check(request, response, recorder)
+
+    def check(self, request, response, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        duplicates = recorder.duplicates
+        duplicate_count = sum(times - 1 for times in duplicates.values())
+
+        logger.info(
+            '%s %s view=%s queries=%d sql_ms=%.1f duplicates=%d',
+            request.method, request.path, view_name,
+            recorder.count, recorder.total_time * 1000, duplicate_count
+        )
+        for sql, times in duplicates.items():
+            logger.debug('duplicate x%d: %s', times, sql)
+
+        if getattr(settings, 'QUIZ_QUERY_HEADERS', settings.DEBUG):
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = f'{recorder.total_time * 1000:.1f}'
+            response['X-Query-Duplicates'] = str(duplicate_count)
+
+        budget = getattr(settings, 'QUIZ_QUERY_BUDGETS', {}).get(view_name)
+        if budget is not None and recorder.count > budget:
+            message = f'{view_name} issued {recorder.count} queries (budget {budget})'
+            if getattr(settings, 'QUIZ_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class SessionRefreshMiddleware:
+    """
+    Keep signed-in sessions alive without rewriting them on every request.
+
+    Replaces ``SESSION_SAVE_EVERY_REQUEST``: a signed-in user's session is
+    saved, extending its expiry, at most once per
+    ``QUIZ_SESSION_REFRESH_INTERVAL`` seconds. Must come after
+    ``AuthenticationMiddleware``.
+    """
+
+    KEY = '_refreshed_at'
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.refresh(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # request.user may still be lazy, and loading it queries the database
+        await sync_to_async(self.refresh)(request)
+        return response
+
+    def refresh(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            session = request.session
+            interval = getattr(settings, 'QUIZ_SESSION_REFRESH_INTERVAL', settings.SESSION_COOKIE_AGE // 4)
+            if time.time() - session.get(self.KEY, 0) >= interval:
+                self.mark_refreshed(session)
+
+    @classmethod
+    def mark_refreshed(cls, session):
+        session[cls.KEY] = int(time.time())
+
+
+class ReplicaMiddleware:
+    """
+    Send the reads of the views in ``QUIZ_REPLICA_VIEWS`` to a read replica.
+
+    Only GET and HEAD requests are routed. After any other request the client
+    gets a cookie that keeps its reads on the primary for
+    ``QUIZ_REPLICA_PIN_SECONDS``, so it sees what it just wrote. Does nothing
+    without ``QUIZ_READ_REPLICAS``. See ``quiz.replicas``.
+    """
+
+    COOKIE = 'quiz_primary'
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replicas.reading(replica=False) as request.replica_reads:
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        with replicas.reading(replica=False) as request.replica_reads:
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD') and self.COOKIE not in request.COOKIES
+                and request.resolver_match.view_name in getattr(settings, 'QUIZ_REPLICA_VIEWS', ())):
+            request.replica_reads.replica = True
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and replicas.aliases():
+            response.set_cookie(
+                self.COOKIE, '1', max_age=getattr(settings, 'QUIZ_REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Quiz = apps.get_model("quiz", "Quiz")
+    Question = apps.get_model("quiz", "Question")
+    questions = Question.objects.using(db_alias).filter(quiz=OuterRef("pk")).order_by().values("quiz")
+    Quiz.objects.using(db_alias).update(
+        question_count=Coalesce(Subquery(questions.annotate(n=Count("pk")).values("n")), 0),
+        total_marks=Coalesce(Subquery(questions.annotate(m=Sum("marks")).values("m")), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0002_alter_category_options_alter_category_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quiz",
+            name="question_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quiz",
+            name="total_marks",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:17
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_stats(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    UserProfile = apps.get_model("quiz", "UserProfile")
+    QuizAttempt = apps.get_model("quiz", "QuizAttempt")
+    attempts = QuizAttempt.objects.using(db_alias).filter(user=OuterRef("user")).order_by().values("user")
+    UserProfile.objects.using(db_alias).update(
+        total_quizzes_passed=Coalesce(
+            Subquery(attempts.annotate(n=Count("pk", filter=Q(is_passed=True))).values("n")), 0
+        ),
+        average_percentage=Coalesce(
+            Subquery(attempts.annotate(a=Avg("percentage")).values("a")), 0.0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0003_quiz_question_count_total_marks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="average_percentage",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="total_quizzes_passed",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
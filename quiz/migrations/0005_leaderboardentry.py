@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_leaderboard(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    QuizAttempt = apps.get_model("quiz", "QuizAttempt")
+    LeaderboardEntry = apps.get_model("quiz", "LeaderboardEntry")
+    attempts = QuizAttempt.objects.using(db_alias).order_by(
+        "quiz_id", "user_id", "-score", "time_taken", "completed_at"
+    )
+    entries = []
+    last = None
+    for attempt in attempts.iterator(chunk_size=1000):
+        if (attempt.quiz_id, attempt.user_id) == last:
+            continue
+        last = (attempt.quiz_id, attempt.user_id)
+        entries.append(LeaderboardEntry(
+            quiz_id=attempt.quiz_id,
+            user_id=attempt.user_id,
+            attempt_id=attempt.pk,
+            score=attempt.score,
+            total_marks=attempt.total_marks,
+            percentage=attempt.percentage,
+            time_taken=attempt.time_taken,
+            completed_at=attempt.completed_at,
+        ))
+    LeaderboardEntry.objects.using(db_alias).bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("quiz", "0004_userprofile_incremental_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("score", models.IntegerField()),
+                ("total_marks", models.IntegerField()),
+                ("percentage", models.FloatField()),
+                ("time_taken", models.IntegerField(help_text="Time taken in seconds")),
+                ("completed_at", models.DateTimeField()),
+                ("attempt", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="quiz.quizattempt")),
+                ("quiz", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="leaderboard_entries", to="quiz.quiz")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="leaderboard_entries", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name_plural": "Leaderboard entries",
+                "ordering": ["quiz", "-score", "time_taken", "completed_at"],
+                "indexes": [models.Index(fields=["quiz", "-score", "time_taken", "completed_at"], name="quiz_leaderboard_rank_idx")],
+                "unique_together": {("quiz", "user")},
+            },
+        ),
+        migrations.RunPython(build_leaderboard, migrations.RunPython.noop),
+    ]
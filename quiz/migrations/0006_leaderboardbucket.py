@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_buckets(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    LeaderboardEntry = apps.get_model("quiz", "LeaderboardEntry")
+    LeaderboardBucket = apps.get_model("quiz", "LeaderboardBucket")
+    rows = LeaderboardEntry.objects.using(db_alias).order_by().values(
+        "quiz_id", "score", "time_taken"
+    ).annotate(entries=models.Count("pk"))
+    LeaderboardBucket.objects.using(db_alias).bulk_create(
+        [LeaderboardBucket(**row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0005_leaderboardentry"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="leaderboardentry",
+            options={
+                "ordering": ["quiz", "-score", "time_taken", "completed_at", "id"],
+                "verbose_name_plural": "Leaderboard entries",
+            },
+        ),
+        migrations.CreateModel(
+            name="LeaderboardBucket",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("score", models.IntegerField()),
+                ("time_taken", models.IntegerField()),
+                ("entries", models.IntegerField(default=0)),
+                ("quiz", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="leaderboard_buckets", to="quiz.quiz")),
+            ],
+            options={
+                "unique_together": {("quiz", "score", "time_taken")},
+            },
+        ),
+        migrations.RunPython(build_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:24
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    SiteCounter = apps.get_model("quiz", "SiteCounter")
+    Category = apps.get_model("quiz", "Category")
+    Quiz = apps.get_model("quiz", "Quiz")
+    QuizAttempt = apps.get_model("quiz", "QuizAttempt")
+    SiteCounter.objects.using(db_alias).bulk_create([
+        SiteCounter(
+            name="active_quizzes",
+            value=Quiz.objects.using(db_alias).filter(is_active=True).count(),
+        ),
+        SiteCounter(
+            name="participants",
+            value=QuizAttempt.objects.using(db_alias).order_by().values("user").distinct().count(),
+        ),
+        SiteCounter(name="categories", value=Category.objects.using(db_alias).count()),
+    ])
+    active = Quiz.objects.using(db_alias).filter(
+        category=OuterRef("pk"), is_active=True
+    ).order_by().values("category")
+    Category.objects.using(db_alias).update(
+        active_quiz_count=Coalesce(Subquery(active.annotate(n=Count("pk")).values("n")), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0007_quiz_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SiteCounter",
+            fields=[
+                ("name", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="active_quiz_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:02
+
+from django.db import migrations, models
+import quiz.models
+import uuid
+
+
+MODELS = ("quiz", "question", "choice")
+
+
+def backfill_external_ids(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    for model_name in MODELS:
+        Model = apps.get_model("quiz", model_name)
+        rows = list(Model.objects.using(db_alias).filter(external_id__isnull=True).only("pk"))
+        for row in rows:
+            row.external_id = uuid.uuid4().hex
+        Model.objects.using(db_alias).bulk_update(rows, ["external_id"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0008_site_counters"),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name="external_id",
+                field=models.CharField(max_length=64, null=True),
+            )
+            for model_name in MODELS
+        ],
+        migrations.RunPython(backfill_external_ids, migrations.RunPython.noop),
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name="external_id",
+                field=models.CharField(
+                    default=quiz.models.new_external_id, max_length=64, unique=True
+                ),
+            )
+            for model_name in MODELS
+        ],
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("quiz", "0009_external_ids"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ActiveAttempt",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("deadline", models.DateTimeField(db_index=True)),
+                ("answers", models.JSONField(blank=True, default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("quiz", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="active_attempts", to="quiz.quiz")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="active_attempts", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "ordering": ["deadline"],
+                "unique_together": {("user", "quiz")},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0010_activeattempt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=100)),
+                ("payload", models.JSONField(blank=True, default=dict)),
+                ("status", models.CharField(choices=[("queued", "Queued"), ("running", "Running"), ("dead", "Dead")], default="queued", max_length=10)),
+                ("attempts", models.IntegerField(default=0)),
+                ("max_attempts", models.IntegerField(default=5)),
+                ("run_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("lease", models.CharField(blank=True, db_index=True, max_length=32)),
+                ("locked_until", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["run_after", "id"],
+                "indexes": [models.Index(fields=["status", "run_after"], name="quiz_job_due_idx")],
+            },
+        ),
+    ]
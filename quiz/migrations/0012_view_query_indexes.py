@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0011_job"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="quiz",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["-created_at"], name="quiz_quiz_active_recent_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quiz",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["category", "-created_at"], name="quiz_quiz_active_category_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quizattempt",
+            index=models.Index(fields=["user", "-completed_at"], name="quiz_attempt_user_recent_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quizattempt",
+            index=models.Index(fields=["quiz", "user", "-completed_at"], name="quiz_attempt_quiz_user_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+def rebuild_buckets(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    LeaderboardEntry = apps.get_model("quiz", "LeaderboardEntry")
+    LeaderboardBucket = apps.get_model("quiz", "LeaderboardBucket")
+    LeaderboardBucket.objects.using(db_alias).all().delete()
+    rows = LeaderboardEntry.objects.using(db_alias).order_by().values(
+        "quiz_id", "score"
+    ).annotate(entries=models.Count("pk"))
+    LeaderboardBucket.objects.using(db_alias).bulk_create(
+        [LeaderboardBucket(**row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0012_view_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="leaderboardbucket",
+            unique_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name="leaderboardbucket",
+            name="time_taken",
+        ),
+        migrations.RunPython(rebuild_buckets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="leaderboardbucket",
+            unique_together={("quiz", "score")},
+        ),
+    ]
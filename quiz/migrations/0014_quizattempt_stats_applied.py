@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+def mark_counted_attempts(apps, schema_editor):
+    # Every attempt is in the stats already, except those whose
+    # attempt_completed job has not run yet (or is dead-lettered)
+    db_alias = schema_editor.connection.alias
+    QuizAttempt = apps.get_model("quiz", "QuizAttempt")
+    Job = apps.get_model("quiz", "Job")
+    pending = {
+        payload.get("attempt_id")
+        for payload in Job.objects.using(db_alias).filter(name="attempt_completed").values_list(
+            "payload", flat=True
+        )
+    }
+    QuizAttempt.objects.using(db_alias).exclude(pk__in=pending - {None}).update(stats_applied=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0013_leaderboardbucket_per_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quizattempt",
+            name="stats_applied",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_counted_attempts, migrations.RunPython.noop),
+    ]
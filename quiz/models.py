@@ -1,15 +1,46 @@
-from django.db import models
+import uuid
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
-class Category(models.Model):
+def new_external_id():
+    return uuid.uuid4().hex
+
+
+class CounterFieldsMixin:
+    """
+    Leaves the denormalized ``COUNTER_FIELDS`` out of saves of existing rows.
+
+    Counters are maintained with F() updates, so an instance loaded earlier
+    (e.g. by an admin form) would otherwise write back a stale count.
+    """
+    COUNTER_FIELDS = ()
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Category(CounterFieldsMixin, models.Model):
     """Quiz categories like Math, Science, History, etc."""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Denormalized number of active quizzes, maintained by quiz.site_stats
+    active_quiz_count = models.IntegerField(default=0, editable=False)
+    
+    COUNTER_FIELDS = ('active_quiz_count',)
+    
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
@@ -18,7 +49,7 @@ class Category(models.Model):
         return self.name
 
 
-class Quiz(models.Model):
+class Quiz(CounterFieldsMixin, models.Model):
     """Main Quiz model"""
     DIFFICULTY_CHOICES = [
         ('easy', 'Easy'),
@@ -46,21 +77,48 @@ class Quiz(models.Model):
         help_text="Maximum number of attempts allowed"
     )
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_quizzes')
+    # Stable key shared across environments by export_quizzes/import_quizzes
+    external_id = models.CharField(max_length=64, unique=True, default=new_external_id)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Denormalized from Question, maintained by quiz.signals
+    question_count = models.IntegerField(default=0, editable=False)
+    total_marks = models.IntegerField(default=0, editable=False)
+    
+    COUNTER_FIELDS = ('question_count', 'total_marks')
+    
     class Meta:
         verbose_name_plural = 'Quizzes'
         ordering = ['-created_at']
+        # Proposed by `manage.py explain_views`. Partial, because SQLite cannot
+        # seek past a boolean column to the ordering
+        indexes = [
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_active=True),
+                name='quiz_quiz_active_recent_idx'
+            ),
+            models.Index(
+                fields=['category', '-created_at'], condition=models.Q(is_active=True),
+                name='quiz_quiz_active_category_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.title
     
     def total_questions(self):
-        return self.questions.count()
+        return self.question_count
     
-    def total_marks(self):
-        return sum(question.marks for question in self.questions.all())
+    @classmethod
+    def update_counters(cls, *quiz_ids):
+        """Recompute question_count and total_marks with one UPDATE, bumping updated_at"""
+        questions = Question.objects.filter(quiz=models.OuterRef('pk')).order_by().values('quiz')
+        cls.objects.filter(pk__in=quiz_ids).update(
+            updated_at=timezone.now(),
+            question_count=Coalesce(models.Subquery(questions.annotate(n=models.Count('pk')).values('n')), 0),
+            total_marks=Coalesce(models.Subquery(questions.annotate(m=models.Sum('marks')).values('m')), 0),
+        )
 
 
 class Question(models.Model):
@@ -73,6 +131,7 @@ class Question(models.Model):
     )
     order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    external_id = models.CharField(max_length=64, unique=True, default=new_external_id)
     
     class Meta:
         ordering = ['order', 'id']
@@ -80,8 +139,17 @@ class Question(models.Model):
     def __str__(self):
         return f"{self.quiz.title} - Q{self.order}: {self.question_text[:50]}"
     
+    def save(self, *args, **kwargs):
+        # Keep the quiz counters updated by post_save in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     def get_correct_answer(self):
-        return self.choices.filter(is_correct=True).first()
+        from .answer_key import get_answer_key
+        entry = get_answer_key(self.quiz_id).get(self.pk)
+        if entry is None or not entry.correct_choice_ids:
+            return None
+        return Choice.objects.filter(pk=entry.correct_choice_ids[0]).first()
 
 
 class Choice(models.Model):
@@ -90,6 +158,7 @@ class Choice(models.Model):
     choice_text = models.CharField(max_length=500)
     is_correct = models.BooleanField(default=False)
     order = models.IntegerField(default=0)
+    external_id = models.CharField(max_length=64, unique=True, default=new_external_id)
     
     class Meta:
         ordering = ['order', 'id']
@@ -109,9 +178,18 @@ class QuizAttempt(models.Model):
     is_passed = models.BooleanField(default=False)
     started_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(auto_now_add=True)
+    # Set by the attempt_completed job in the transaction that adds the attempt
+    # to profile stats and site counters; rebuilds only count marked attempts
+    stats_applied = models.BooleanField(default=False, editable=False)
     
     class Meta:
         ordering = ['-completed_at']
+        # Proposed by `manage.py explain_views`: a user's latest attempts
+        # (dashboard) and their attempts on one quiz (quiz detail)
+        indexes = [
+            models.Index(fields=['user', '-completed_at'], name='quiz_attempt_user_recent_idx'),
+            models.Index(fields=['quiz', 'user', '-completed_at'], name='quiz_attempt_quiz_user_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title} - {self.score}/{self.total_marks}"
@@ -143,6 +221,74 @@ class Answer(models.Model):
         return f"{self.attempt.user.username} - {self.question.question_text[:30]}"
 
 
+class JSONPatch(models.Func):
+    """Merge-patch a JSON column in SQL (RFC 7396); ``null`` values remove keys"""
+    function = 'JSON_PATCH'
+    output_field = models.JSONField()
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='JSON_MERGE_PATCH', **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template='jsonb_strip_nulls(%(expressions)s)', arg_joiner=' || ',
+            **extra_context
+        )
+
+
+class ActiveAttempt(models.Model):
+    """Quiz attempt in progress; the row is removed when the attempt is graded"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='active_attempts')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='active_attempts')
+    started_at = models.DateTimeField(default=timezone.now)
+    deadline = models.DateTimeField(db_index=True)
+    # Partial answers as {question_id: choice_id}
+    answers = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'quiz')
+        ordering = ['deadline']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title}"
+
+    @classmethod
+    def start(cls, user, quiz):
+        """Get the user's attempt at ``quiz`` or start one; returns ``(attempt, created)``"""
+        now = timezone.now()
+        return cls.objects.get_or_create(
+            user=user, quiz=quiz,
+            defaults={'started_at': now, 'deadline': now + timedelta(minutes=quiz.time_limit)}
+        )
+
+    @classmethod
+    def current(cls, user, quiz):
+        """The user's attempt at ``quiz`` in progress, or ``None``"""
+        active = cls.objects.filter(user=user, quiz=quiz).first()
+        if active is not None:
+            active.user, active.quiz = user, quiz
+        return active
+
+    @classmethod
+    def save_answers(cls, user, quiz_id, answers):
+        """
+        Merge ``{question_id: choice_id}`` into the attempt in progress with one UPDATE.
+
+        A ``None`` choice clears the answer. Returns ``False`` when the user
+        has no attempt at the quiz or its deadline has passed.
+        """
+        now = timezone.now()
+        patch = {str(question_id): choice_id for question_id, choice_id in answers.items()}
+        return cls.objects.filter(user=user, quiz_id=quiz_id, deadline__gt=now).update(
+            answers=JSONPatch('answers', models.Value(patch, output_field=models.JSONField())),
+            updated_at=now,
+        ) > 0
+
+    def remaining_seconds(self, now=None):
+        return max(0, int((self.deadline - (now or timezone.now())).total_seconds()))
+
+
 class UserProfile(models.Model):
     """Extended user profile"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -154,13 +300,168 @@ class UserProfile(models.Model):
     )
     total_quizzes_taken = models.IntegerField(default=0)
     total_score = models.IntegerField(default=0)
+    total_quizzes_passed = models.IntegerField(default=0)
+    average_percentage = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    STATS_FIELDS = ('total_quizzes_taken', 'total_score', 'total_quizzes_passed', 'average_percentage')
+    
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    @staticmethod
+    def stats_aggregates():
+        """Aggregates over QuizAttempt matching STATS_FIELDS"""
+        return {
+            'total_quizzes_taken': models.Count('pk'),
+            'total_score': Coalesce(models.Sum('score'), 0),
+            'total_quizzes_passed': models.Count('pk', filter=models.Q(is_passed=True)),
+            'average_percentage': Coalesce(models.Avg('percentage'), 0.0),
+        }
+    
     def update_stats(self):
-        attempts = QuizAttempt.objects.filter(user=self.user)
-        self.total_quizzes_taken = attempts.count()
-        self.total_score = sum(attempt.score for attempt in attempts)
-        self.save()
\ No newline at end of file
+        """Recompute the stats from scratch; submissions use record_attempt instead"""
+        stats = QuizAttempt.objects.filter(user=self.user, stats_applied=True).aggregate(
+            **self.stats_aggregates()
+        )
+        for field, value in stats.items():
+            setattr(self, field, value)
+        self.save(update_fields=self.STATS_FIELDS)
+    
+    @classmethod
+    def record_attempt(cls, attempt):
+        """Fold a new attempt into the user's stats with a single atomic UPDATE"""
+        taken = models.F('total_quizzes_taken')
+        updates = {
+            'total_quizzes_taken': taken + 1,
+            'total_score': models.F('total_score') + attempt.score,
+            'total_quizzes_passed': models.F('total_quizzes_passed') + int(attempt.is_passed),
+            'average_percentage': (
+                models.F('average_percentage') * taken + attempt.percentage
+            ) / (taken + 1.0),
+        }
+        if not cls.objects.filter(user_id=attempt.user_id).update(**updates):
+            cls.objects.get_or_create(user_id=attempt.user_id)
+            cls.objects.filter(user_id=attempt.user_id).update(**updates)
+
+
+class LeaderboardEntry(models.Model):
+    """Best attempt of each user per quiz, maintained on submission"""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE, related_name='+')
+    score = models.IntegerField()
+    total_marks = models.IntegerField()
+    percentage = models.FloatField()
+    time_taken = models.IntegerField(help_text="Time taken in seconds")
+    completed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = 'Leaderboard entries'
+        ordering = ['quiz', '-score', 'time_taken', 'completed_at', 'id']
+        unique_together = ('quiz', 'user')
+        indexes = [
+            models.Index(
+                fields=['quiz', '-score', 'time_taken', 'completed_at'],
+                name='quiz_leaderboard_rank_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title} - {self.score}/{self.total_marks}"
+    
+    def beaten_by(self, attempt):
+        return (attempt.score, -attempt.time_taken) > (self.score, -self.time_taken)
+    
+    @staticmethod
+    def fields_from_attempt(attempt):
+        return {
+            'attempt_id': attempt.pk,
+            'score': attempt.score,
+            'total_marks': attempt.total_marks,
+            'percentage': attempt.percentage,
+            'time_taken': attempt.time_taken,
+            'completed_at': attempt.completed_at,
+        }
+    
+    @classmethod
+    def record_attempt(cls, attempt):
+        """Upsert the user's entry if the attempt beats their current best"""
+        fields = cls.fields_from_attempt(attempt)
+        entry, created = cls.objects.select_for_update().get_or_create(
+            quiz_id=attempt.quiz_id, user_id=attempt.user_id, defaults=fields
+        )
+        if created:
+            LeaderboardBucket.adjust(attempt.quiz_id, attempt.score, 1)
+        elif entry.beaten_by(attempt):
+            if attempt.score != entry.score:
+                LeaderboardBucket.adjust(attempt.quiz_id, entry.score, -1)
+                LeaderboardBucket.adjust(attempt.quiz_id, attempt.score, 1)
+            for field, value in fields.items():
+                setattr(entry, field, value)
+            entry.save(update_fields=list(fields))
+
+
+class LeaderboardBucket(models.Model):
+    """Number of leaderboard entries per (quiz, score), used for ranking"""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='leaderboard_buckets')
+    score = models.IntegerField()
+    entries = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('quiz', 'score')
+    
+    def __str__(self):
+        return f"{self.quiz_id} - {self.score}: {self.entries}"
+    
+    @classmethod
+    def adjust(cls, quiz_id, score, delta):
+        buckets = cls.objects.filter(quiz_id=quiz_id, score=score)
+        if not buckets.update(entries=models.F('entries') + delta):
+            bucket, created = cls.objects.get_or_create(
+                quiz_id=quiz_id, score=score, defaults={'entries': delta}
+            )
+            if not created:
+                buckets.update(entries=models.F('entries') + delta)
+
+
+class SiteCounter(models.Model):
+    """Named site-wide counters, maintained by quiz.site_stats"""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class Job(models.Model):
+    """Background job run by ``manage.py run_jobs``; see quiz.jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DEAD, 'Dead'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Lease of the worker running the job; expires at locked_until
+    lease = models.CharField(max_length=32, blank=True, db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='quiz_job_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,260 @@
+"""
+Query plans of the views, and the indexes that would fix the slow ones.
+
+``capture`` requests views the way ``quiz.benchmark`` does and records every
+statement they send. ``explain`` asks SQLite for each statement's plan
+(``EXPLAIN QUERY PLAN``) and flags full table scans and temporary B-trees
+built to sort, group or deduplicate rows.
+
+For a flagged statement, ``propose`` builds a composite index from the SQL
+itself: the table's columns compared with ``=`` or ``IN``, then its
+``ORDER BY`` columns, or else a range-compared column. Boolean columns
+filtered on (``WHERE "is_active"``) are not ``=`` comparisons and SQLite
+cannot seek past them in an index, so they become the condition of a partial
+index instead. A proposal is only kept when creating it in the database
+being analysed removes the flag from the plan, so it never recommends an
+index SQLite would not use. ``manage.py explain_views`` runs all of this against a seeded
+throwaway database.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.db import connection, models
+from django.db.models import Q
+
+from .benchmark import _scenario
+from .middleware import QueryRecorder, fingerprint
+
+
+VIEWS = [
+    'home', 'quiz_list', 'quiz_search_api', 'quiz_detail', 'take_quiz', 'quiz_content',
+    'attempt_state', 'autosave_answers', 'submit_quiz', 'quiz_result', 'quiz_review',
+    'dashboard', 'leaderboard', 'leaderboard_api', 'leaderboard_rank', 'category_quizzes',
+]
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+_COLUMN = r'"(\w+)"\."(\w+)"'
+_FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+_TEMP_BTREE_RE = re.compile(r'^USE TEMP B-TREE FOR (.+)$')
+_EQUALITY_RE = re.compile(rf'{_COLUMN}(?: = | IN \()')
+_BOOLEAN_RE = re.compile(rf'(?<!= )(NOT )?{_COLUMN}(?=\)| AND | OR |$)')
+_RANGE_RE = re.compile(rf'{_COLUMN} (?:<|>|<=|>=|BETWEEN) ')
+_ORDER_RE = re.compile(rf'^{_COLUMN}(?: (ASC|DESC))?$')
+_CLAUSE_END_RE = re.compile(r' (?:GROUP BY|ORDER BY|LIMIT|HAVING) ')
+
+
+@dataclass
+class Statement:
+    """One distinct statement a view sent, with its plan and flags"""
+    sql: str
+    params: tuple
+    plan: list = field(default_factory=list)
+    flags: list = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Proposal:
+    """
+    A composite index on ``model`` over ``fields`` (``'-name'`` sorts descending).
+
+    ``condition`` holds ``(field, value)`` pairs that make it a partial index.
+    """
+    model: type
+    fields: tuple
+    condition: tuple = ()
+
+    def index(self):
+        # Partial indexes must be named up front; take the name Django would generate
+        unnamed = models.Index(fields=list(self.fields))
+        unnamed.set_name_with_model(self.model)
+        condition = Q(*self.condition) if self.condition else None
+        return models.Index(fields=list(self.fields), name=unnamed.name, condition=condition)
+
+    def __str__(self):
+        fields = ', '.join(repr(name) for name in self.fields)
+        condition = ''
+        if self.condition:
+            condition = ', condition=Q({})'.format(
+                ', '.join(f'{name}={value!r}' for name, value in self.condition)
+            )
+        return (
+            f'{self.model.__name__}: models.Index(fields=[{fields}]{condition}, '
+            f'name={self.index().name!r})'
+        )
+
+
+class StatementRecorder(QueryRecorder):
+    """``QueryRecorder`` that also keeps one example of every statement shape"""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(EXPLAINABLE):
+            self.statements.setdefault(fingerprint(sql), Statement(sql, tuple(params or ())))
+        return super().__call__(execute, sql, params, many, context)
+
+
+def capture(views=VIEWS):
+    """``{view: [Statement]}`` of the statements each view sends"""
+    scenario = _scenario()
+    captured = {}
+    for view in views:
+        method, url, kwargs = scenario.prepare(view)
+        with StatementRecorder() as recorder:
+            response = getattr(scenario.client, method)(url, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{view} returned HTTP {response.status_code}')
+        captured[view] = list(recorder.statements.values())
+    return captured
+
+
+def plan(sql, params):
+    """SQLite's plan of a statement as a list of detail lines, indented by depth"""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        rows = cursor.fetchall()
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def flags(lines):
+    """``[(kind, table or purpose)]`` of the full scans and temp B-trees in a plan"""
+    found = []
+    for line in lines:
+        detail = line.strip()
+        match = _FULL_SCAN_RE.match(detail)
+        if match:
+            found.append(('full scan', match.group(1)))
+        match = _TEMP_BTREE_RE.match(detail)
+        if match:
+            found.append(('temp b-tree', match.group(1)))
+    return found
+
+
+def explain(statement):
+    statement.plan = plan(statement.sql, statement.params)
+    statement.flags = flags(statement.plan)
+    return statement
+
+
+def _where(sql):
+    _, _, where = sql.partition(' WHERE ')
+    end = _CLAUSE_END_RE.search(where)
+    return where[:end.start()] if end else where
+
+
+def _order_by(sql):
+    _, _, order = sql.rpartition(' ORDER BY ')
+    order = order.split(' LIMIT ')[0]
+    terms = [_ORDER_RE.match(term.strip()) for term in order.split(', ')] if order else []
+    return [term.groups() for term in terms] if all(terms) else None
+
+
+def _field_name(model, column):
+    for model_field in model._meta.concrete_fields:
+        if model_field.column == column:
+            return model_field.name
+    return None
+
+
+def candidate(sql, flag):
+    """The index that could remove ``flag`` from the plan of ``sql``, or ``None``"""
+    kind, subject = flag
+    order = _order_by(sql)
+    if kind == 'full scan':
+        table = subject
+    elif subject.startswith(('ORDER BY', 'RIGHT PART OF ORDER BY')) and order:
+        table = order[0][0]
+        if any(term[0] != table for term in order):
+            return None
+    else:
+        return None
+
+    model = next((m for m in apps.get_models() if m._meta.db_table == table), None)
+    if model is None:
+        return None
+    where = _where(sql)
+    columns = []
+    for found_table, column in _EQUALITY_RE.findall(where):
+        if found_table == table and column not in columns:
+            columns.append(column)
+    condition = []
+    for negated, found_table, column in _BOOLEAN_RE.findall(where):
+        name = _field_name(model, column) if found_table == table else None
+        if name and model._meta.get_field(name).get_internal_type() == 'BooleanField':
+            condition.append((name, not negated))
+    sort = [
+        ('-' if direction == 'DESC' else '') + column
+        for found_table, column, direction in (order or []) if found_table == table
+    ]
+    if sort:
+        columns += [term for term in sort if term.lstrip('-') not in columns]
+    else:
+        ranges = [column for found_table, column in _RANGE_RE.findall(where) if found_table == table]
+        columns += [column for column in ranges[:1] if column not in columns]
+    if not columns:
+        return None
+
+    fields = []
+    for column in columns:
+        name = _field_name(model, column.lstrip('-'))
+        if name is None:
+            return None
+        fields.append(('-' if column[0] == '-' else '') + name)
+    if fields == [model._meta.pk.name]:
+        return None
+    return Proposal(model, tuple(fields), tuple(condition))
+
+
+def fixes(proposal, statement, flag):
+    """Whether creating ``proposal`` removes ``flag`` from the statement's plan"""
+    index = proposal.index()
+    # Only the SQL is needed; entering the editor would fail inside a transaction
+    editor = connection.schema_editor()
+    with connection.cursor() as cursor:
+        cursor.execute(str(index.create_sql(proposal.model, editor)))
+        try:
+            return flag not in flags(plan(statement.sql, statement.params))
+        finally:
+            cursor.execute(str(index.remove_sql(proposal.model, editor)))
+
+
+def propose(captured):
+    """
+    Explain the ``capture``d statements and return ``{Proposal: [view]}``.
+
+    Proposals whose fields start another proposal's on the same model, with
+    the same condition, are dropped in favour of the longer one, which serves
+    both.
+    """
+    proposals = {}
+    for view, statements in captured.items():
+        for statement in statements:
+            explain(statement)
+            for flag in statement.flags:
+                proposal = candidate(statement.sql, flag)
+                if proposal is not None and fixes(proposal, statement, flag):
+                    proposals.setdefault(proposal, [])
+                    if view not in proposals[proposal]:
+                        proposals[proposal].append(view)
+
+    kept = {}
+    for proposal, views in sorted(proposals.items(), key=lambda item: -len(item[0].fields)):
+        longer = next((
+            other for other in kept
+            if other.model is proposal.model and other.condition == proposal.condition
+            and other.fields[:len(proposal.fields)] == proposal.fields
+        ), None)
+        if longer is None:
+            kept[proposal] = views
+        else:
+            kept[longer] += [view for view in views if view not in kept[longer]]
+    return kept
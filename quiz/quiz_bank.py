@@ -0,0 +1,244 @@
+"""
+JSON Lines import and export of whole quizzes.
+
+Each line holds one quiz with its category, settings, questions and choices.
+Quizzes, questions and choices are matched by ``external_id``, so importing
+the same file twice updates rows in place instead of duplicating them.
+Export streams with ``iterator()`` and import works in batches, so memory use
+does not grow with the size of the bank.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from . import site_stats
+from .models import Category, Quiz, Question, Choice
+from .signals import invalidate_answer_key
+
+
+QUIZ_FIELDS = ('title', 'description', 'difficulty', 'time_limit', 'passing_score',
+               'max_attempts', 'is_active')
+QUESTION_FIELDS = ('question_text', 'marks', 'order')
+CHOICE_FIELDS = ('choice_text', 'is_correct', 'order')
+BATCH_SIZE = 2000
+
+
+class QuizBankError(Exception):
+    """Raised when an import file contains invalid records"""
+
+
+def quiz_record(quiz):
+    """Serialize a quiz with prefetched questions and choices to a dict"""
+    record = {'external_id': quiz.external_id}
+    record.update({field: getattr(quiz, field) for field in QUIZ_FIELDS})
+    record['category'] = {'name': quiz.category.name, 'description': quiz.category.description}
+    record['questions'] = [
+        {
+            'external_id': question.external_id,
+            **{field: getattr(question, field) for field in QUESTION_FIELDS},
+            'choices': [
+                {
+                    'external_id': choice.external_id,
+                    **{field: getattr(choice, field) for field in CHOICE_FIELDS},
+                }
+                for choice in question.choices.all()
+            ],
+        }
+        for question in quiz.questions.all()
+    ]
+    return record
+
+
+def export_lines(quizzes, chunk_size=100):
+    """Yield one JSON line per quiz of ``quizzes``"""
+    quizzes = quizzes.select_related('category').prefetch_related(
+        Prefetch('questions', queryset=Question.objects.prefetch_related('choices'))
+    ).order_by('pk')
+    for quiz in quizzes.iterator(chunk_size=chunk_size):
+        yield json.dumps(quiz_record(quiz), ensure_ascii=False) + '\n'
+
+
+def _validate(obj, line, label, exclude):
+    try:
+        obj.full_clean(exclude=exclude, validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        errors = '; '.join(
+            f'{field}: {" ".join(messages)}' for field, messages in e.message_dict.items()
+        )
+        raise QuizBankError(f'line {line}: {label}: {errors}')
+
+
+def _fields(data, fields, line, label):
+    if not isinstance(data, dict):
+        raise QuizBankError(f'line {line}: {label} must be an object')
+    if not data.get('external_id'):
+        raise QuizBankError(f'line {line}: {label} needs an external_id')
+    return {field: data[field] for field in fields if field in data}
+
+
+class Importer:
+    """
+    Validate and upsert quiz records in batches.
+
+    Feed parsed records with ``add()`` and call ``finish()`` once at the end;
+    run both inside one transaction so a bad line rolls back the whole import.
+    ``stats`` counts created and updated quizzes, questions and choices.
+    """
+
+    def __init__(self, author, batch_size=BATCH_SIZE, prune=False):
+        self.author = author
+        self.batch_size = batch_size
+        self.prune = prune
+        self.categories = {}
+        self.touched = set()
+        self.stats = dict.fromkeys([
+            'quizzes_created', 'quizzes_updated', 'questions_created', 'questions_updated',
+            'choices_created', 'choices_updated', 'questions_pruned', 'choices_pruned',
+        ], 0)
+        self._reset()
+
+    def _reset(self):
+        self.quizzes = []
+        self.questions = []
+        self.choices = []
+        self.size = 0
+
+    def add(self, record, line):
+        """Validate one quiz record and queue it for the next batch"""
+        if not isinstance(record, dict):
+            raise QuizBankError(f'line {line}: expected a JSON object')
+        category = record.get('category')
+        if not isinstance(category, dict) or not category.get('name'):
+            raise QuizBankError(f'line {line}: quiz needs a category with a name')
+
+        quiz = Quiz(
+            external_id=record.get('external_id'), created_by=self.author,
+            **_fields(record, QUIZ_FIELDS, line, 'quiz')
+        )
+        _validate(quiz, line, 'quiz', exclude=['category', 'created_by'])
+        quiz.category_data = (category['name'], category.get('description', ''))
+
+        questions = record.get('questions')
+        if not isinstance(questions, list):
+            raise QuizBankError(f'line {line}: questions must be a list')
+        for number, data in enumerate(questions, 1):
+            label = f'question {number}'
+            question = Question(
+                external_id=data.get('external_id') if isinstance(data, dict) else None,
+                **_fields(data, QUESTION_FIELDS, line, label)
+            )
+            _validate(question, line, label, exclude=['quiz'])
+            choices = data.get('choices')
+            if not isinstance(choices, list) or len(choices) < 2:
+                raise QuizBankError(f'line {line}: {label} needs at least two choices')
+            if not any(isinstance(c, dict) and c.get('is_correct') for c in choices):
+                raise QuizBankError(f'line {line}: {label} has no correct choice')
+            for choice_number, choice_data in enumerate(choices, 1):
+                choice_label = f'{label} choice {choice_number}'
+                choice = Choice(
+                    external_id=choice_data.get('external_id') if isinstance(choice_data, dict) else None,
+                    **_fields(choice_data, CHOICE_FIELDS, line, choice_label)
+                )
+                _validate(choice, line, choice_label, exclude=['question'])
+                choice.question_key = question.external_id
+                self.choices.append(choice)
+            question.quiz_key = quiz.external_id
+            self.questions.append(question)
+        self.quizzes.append(quiz)
+
+        self.size += len(questions) + 1
+        if self.size >= self.batch_size:
+            self.flush()
+
+    def _category_ids(self, quizzes):
+        descriptions = dict(quiz.category_data for quiz in quizzes)
+        missing = descriptions.keys() - self.categories.keys()
+        if missing:
+            Category.objects.bulk_create([
+                Category(name=name, description=descriptions[name]) for name in missing
+            ], ignore_conflicts=True)
+            self.categories.update(
+                Category.objects.filter(name__in=missing).values_list('name', 'pk')
+            )
+        return self.categories
+
+    @staticmethod
+    def _upsert(model, objs, update_fields):
+        """Insert or update ``objs`` by external_id; returns ``(pks, created)``"""
+        keys = [obj.external_id for obj in objs]
+        if len(set(keys)) != len(keys):
+            raise QuizBankError(f'Duplicate {model._meta.verbose_name} external_id in one batch')
+        existing = set(model.objects.filter(external_id__in=keys).values_list('external_id', flat=True))
+        model.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=['external_id'], update_fields=update_fields
+        )
+        pks = dict(model.objects.filter(external_id__in=keys).values_list('external_id', 'pk'))
+        return pks, len(keys) - len(existing)
+
+    def flush(self):
+        """Write the queued records"""
+        if not self.quizzes:
+            return
+        categories = self._category_ids(self.quizzes)
+        now = timezone.now()
+        for quiz in self.quizzes:
+            quiz.category_id = categories[quiz.category_data[0]]
+            quiz.updated_at = now
+
+        quiz_pks, created = self._upsert(
+            Quiz, self.quizzes, list(QUIZ_FIELDS) + ['category', 'updated_at']
+        )
+        self.stats['quizzes_created'] += created
+        self.stats['quizzes_updated'] += len(self.quizzes) - created
+
+        for question in self.questions:
+            question.quiz_id = quiz_pks[question.quiz_key]
+        question_pks, created = self._upsert(
+            Question, self.questions, ['quiz'] + list(QUESTION_FIELDS)
+        )
+        self.stats['questions_created'] += created
+        self.stats['questions_updated'] += len(self.questions) - created
+
+        for choice in self.choices:
+            choice.question_id = question_pks[choice.question_key]
+        choice_pks, created = self._upsert(
+            Choice, self.choices, ['question'] + list(CHOICE_FIELDS)
+        )
+        self.stats['choices_created'] += created
+        self.stats['choices_updated'] += len(self.choices) - created
+
+        if self.prune:
+            self._prune(quiz_pks.values(), question_pks, choice_pks)
+        self.touched.update(quiz_pks.values())
+        self._reset()
+
+    def _prune(self, quiz_ids, question_pks, choice_pks):
+        # Deleting also removes answers that reference the pruned rows
+        stale_choices = Choice.objects.filter(question_id__in=question_pks.values()).exclude(
+            pk__in=choice_pks.values()
+        )
+        self.stats['choices_pruned'] += stale_choices.delete()[1].get('quiz.Choice', 0)
+        stale_questions = Question.objects.filter(quiz_id__in=quiz_ids).exclude(
+            pk__in=question_pks.values()
+        )
+        self.stats['questions_pruned'] += stale_questions.delete()[1].get('quiz.Question', 0)
+
+    def finish(self, dry_run=False):
+        """
+        Flush the last batch and refresh everything derived from the imported rows.
+
+        A ``dry_run`` is rolled back by the caller, so it only flushes: the
+        answer key versions and site counters must not see rows that never commit.
+        """
+        self.flush()
+        if dry_run:
+            return self.stats
+        touched = sorted(self.touched)
+        for start in range(0, len(touched), 500):
+            Quiz.update_counters(*touched[start:start + 500])
+        for quiz_id in touched:
+            invalidate_answer_key(quiz_id)
+        site_stats.recompute()
+        return self.stats
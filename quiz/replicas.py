@@ -0,0 +1,116 @@
+"""
+Read replicas for the pages and reports that only read.
+
+``ReplicaRouter`` sends reads to one of the ``QUIZ_READ_REPLICAS`` aliases
+inside a ``reading()`` block and everything else, every write included, to
+the primary. ``quiz.middleware.ReplicaMiddleware`` opens such a block for GET
+requests to the views in ``QUIZ_REPLICA_VIEWS``. A replica trails the primary,
+so a client that has just written (any unsafe request) is pinned to the
+primary for ``QUIZ_REPLICA_PIN_SECONDS`` and sees its own writes, e.g. the
+result page and dashboard right after a submission. Sessions are always read
+from the primary.
+
+Each process checks a replica at most every
+``QUIZ_REPLICA_HEALTH_CHECK_INTERVAL`` seconds; while it fails the check, its
+reads go to the other replicas or, with none left, to the primary.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger('quiz.replicas')
+
+# Apps whose rows must be fresh on every read
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_reads = ContextVar('quiz_replica_reads', default=None)
+_checked = {}
+
+
+class Reads:
+    """Where the reads of the current ``reading()`` block go"""
+
+    def __init__(self, replica=True):
+        self.replica = replica
+
+
+def aliases():
+    return list(getattr(settings, 'QUIZ_READ_REPLICAS', []))
+
+
+@contextmanager
+def reading(replica=True):
+    """
+    Send the reads of the block to a replica.
+
+    Yields the block's ``Reads``; setting its ``replica`` switches the reads
+    that follow.
+    """
+    reads = Reads(replica)
+    token = _reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _reads.reset(token)
+
+
+def ping(alias):
+    """Whether ``alias`` answers a query on its migrated schema"""
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+        # On the raw connection, so health checks do not count against query budgets
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute('SELECT COUNT(*) FROM django_migrations')
+        finally:
+            cursor.close()
+    except (DatabaseError, connection.Database.Error) as e:
+        logger.warning('Read replica %s is unavailable: %s', alias, e)
+        return False
+    return True
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    interval = getattr(settings, 'QUIZ_REPLICA_HEALTH_CHECK_INTERVAL', 10)
+    healthy, checked_at = _checked.get(alias, (None, None))
+    if checked_at is None or now - checked_at >= interval:
+        healthy = ping(alias)
+        _checked[alias] = (healthy, now)
+    return healthy
+
+
+def read_db():
+    """A healthy replica's alias, or the primary's when there is none"""
+    healthy = [alias for alias in aliases() if is_healthy(alias)]
+    return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Database router for ``DATABASE_ROUTERS``; see the module docstring"""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        reads = _reads.get()
+        if reads is None or not reads.replica or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return read_db()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
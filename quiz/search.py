@@ -0,0 +1,229 @@
+"""
+Full-text quiz search backed by SQLite FTS5.
+
+``quiz_quiz_fts`` indexes quiz titles and descriptions and
+``quiz_question_fts`` indexes question texts. Both are external-content
+tables kept in sync by SQL triggers, so bulk writes are indexed too. Searches
+join ``quiz_quiz`` and apply the active, category and difficulty filters in
+the same query, so a limit counts matching quizzes only. On other database
+backends ``search`` returns ``None`` and callers fall back to LIKE filtering.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+# Private-use markers survive HTML escaping and are swapped for <mark> tags
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+# Question matches count for less than title/description matches
+QUESTION_WEIGHT = 0.5
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+TABLES = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS quiz_quiz_fts USING fts5(
+        title, description,
+        content='quiz_quiz', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS quiz_question_fts USING fts5(
+        question_text, quiz_id UNINDEXED,
+        content='quiz_question', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+]
+
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS quiz_quiz_fts_insert AFTER INSERT ON quiz_quiz BEGIN
+        INSERT INTO quiz_quiz_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quiz_quiz_fts_delete AFTER DELETE ON quiz_quiz BEGIN
+        INSERT INTO quiz_quiz_fts(quiz_quiz_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quiz_quiz_fts_update
+    AFTER UPDATE OF title, description ON quiz_quiz BEGIN
+        INSERT INTO quiz_quiz_fts(quiz_quiz_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO quiz_quiz_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quiz_question_fts_insert AFTER INSERT ON quiz_question BEGIN
+        INSERT INTO quiz_question_fts(rowid, question_text, quiz_id)
+        VALUES (new.id, new.question_text, new.quiz_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quiz_question_fts_delete AFTER DELETE ON quiz_question BEGIN
+        INSERT INTO quiz_question_fts(quiz_question_fts, rowid, question_text, quiz_id)
+        VALUES ('delete', old.id, old.question_text, old.quiz_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quiz_question_fts_update
+    AFTER UPDATE OF question_text, quiz_id ON quiz_question BEGIN
+        INSERT INTO quiz_question_fts(quiz_question_fts, rowid, question_text, quiz_id)
+        VALUES ('delete', old.id, old.question_text, old.quiz_id);
+        INSERT INTO quiz_question_fts(rowid, question_text, quiz_id)
+        VALUES (new.id, new.question_text, new.quiz_id);
+    END
+    """,
+]
+
+TRIGGER_NAMES = [
+    'quiz_quiz_fts_insert', 'quiz_quiz_fts_delete', 'quiz_quiz_fts_update',
+    'quiz_question_fts_insert', 'quiz_question_fts_delete', 'quiz_question_fts_update',
+]
+
+
+def is_supported(conn=connection):
+    return conn.vendor == 'sqlite'
+
+
+_installed = set()
+
+
+def is_installed(conn=connection):
+    """Whether the FTS tables exist; positive answers are remembered per database"""
+    if conn.alias in _installed:
+        return True
+    if is_supported(conn) and 'quiz_quiz_fts' in conn.introspection.table_names():
+        _installed.add(conn.alias)
+        return True
+    return False
+
+
+def install(conn=connection):
+    """Create the FTS tables and triggers if they are missing"""
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        for statement in TABLES + TRIGGERS:
+            cursor.execute(statement)
+
+
+def uninstall(conn=connection):
+    if not is_supported(conn):
+        return
+    _installed.discard(conn.alias)
+    with conn.cursor() as cursor:
+        for trigger in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS quiz_quiz_fts')
+        cursor.execute('DROP TABLE IF EXISTS quiz_question_fts')
+
+
+def rebuild(conn=connection):
+    """Recreate the triggers and reindex every quiz and question"""
+    if not is_supported(conn):
+        return
+    install(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO quiz_quiz_fts(quiz_quiz_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO quiz_question_fts(quiz_question_fts) VALUES ('rebuild')")
+
+
+def build_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    tokens = TOKEN_RE.findall(text or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def render_marks(text):
+    """Escape FTS output and turn the match markers into <mark> tags"""
+    return mark_safe(
+        escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    )
+
+
+def _filters(category_id, difficulty):
+    """SQL conditions on ``quiz_quiz AS q`` and their parameters"""
+    conditions = ['q.is_active']
+    params = []
+    if category_id is not None:
+        conditions.append('q.category_id = %s')
+        params.append(category_id)
+    if difficulty is not None:
+        conditions.append('q.difficulty = %s')
+        params.append(difficulty)
+    return ' AND '.join(conditions), params
+
+
+def search(text, limit=None, category_id=None, difficulty=None):
+    """
+    Rank active quizzes matching ``text``, optionally in one category and difficulty.
+
+    Returns an ordered list of at most ``limit`` ``(quiz_id, title_html,
+    snippet_html)`` tuples, best match first, or ``None`` when full-text search
+    is not available. The HTML fragments are escaped and highlight the matched
+    terms.
+    """
+    if not is_installed():
+        return None
+    query = build_query(text)
+    if not query:
+        return []
+
+    where, params = _filters(category_id, difficulty)
+    limit_sql = 'LIMIT %s' if limit is not None else ''
+    limit_params = [limit] if limit is not None else []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT quiz_quiz_fts.rowid, bm25(quiz_quiz_fts, 10.0, 2.0),
+                   highlight(quiz_quiz_fts, 0, %s, %s),
+                   snippet(quiz_quiz_fts, 1, %s, %s, '…', 24)
+            FROM quiz_quiz_fts JOIN quiz_quiz q ON q.id = quiz_quiz_fts.rowid
+            WHERE quiz_quiz_fts MATCH %s AND {where}
+            ORDER BY bm25(quiz_quiz_fts, 10.0, 2.0) {limit_sql}
+            """,
+            [MARK_START, MARK_END, MARK_START, MARK_END, query, *params, *limit_params]
+        )
+        quiz_hits = cursor.fetchall()
+        # Several questions of one quiz may match; keep the best one per quiz.
+        # The inner LIMIT stops SQLite from flattening the subquery, which
+        # would call bm25() and snippet() inside the aggregate.
+        cursor.execute(
+            f"""
+            SELECT quiz_id, MIN(rank), snippet FROM (
+                SELECT quiz_question_fts.quiz_id AS quiz_id, bm25(quiz_question_fts) AS rank,
+                       snippet(quiz_question_fts, 0, %s, %s, '…', 24) AS snippet
+                FROM quiz_question_fts JOIN quiz_quiz q ON q.id = quiz_question_fts.quiz_id
+                WHERE quiz_question_fts MATCH %s AND {where}
+                LIMIT -1
+            )
+            GROUP BY quiz_id ORDER BY MIN(rank) {limit_sql}
+            """,
+            [MARK_START, MARK_END, query, *params, *limit_params]
+        )
+        question_hits = cursor.fetchall()
+
+    # bm25 scores are negative: lower is a better match
+    results = {}
+    for quiz_id, rank, title, snippet in quiz_hits:
+        results[quiz_id] = [rank, render_marks(title), render_marks(snippet)]
+    for quiz_id, rank, snippet in question_hits:
+        rank *= QUESTION_WEIGHT
+        if quiz_id in results:
+            results[quiz_id][0] += rank
+        else:
+            results[quiz_id] = [rank, None, render_marks(snippet)]
+
+    ranked = sorted(results.items(), key=lambda item: item[1][0])[:limit]
+    return [(quiz_id, title, snippet) for quiz_id, (rank, title, snippet) in ranked]
@@ -0,0 +1,177 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import answer_key, jobs, search, site_stats, sqlite, thumbnails
+from .middleware import SessionRefreshMiddleware
+from .models import (
+    Category, Quiz, Question, Choice, QuizAttempt, UserProfile, LeaderboardEntry, LeaderboardBucket
+)
+
+
+def invalidate_answer_key(quiz_id):
+    # Invalidate again on commit so readers cannot cache pre-commit rows
+    answer_key.invalidate(quiz_id)
+    transaction.on_commit(lambda: answer_key.invalidate(quiz_id))
+
+
+@receiver(pre_save, sender=Quiz)
+def quiz_saving(sender, instance, **kwargs):
+    # Remember the stored state so the site counters can apply the difference
+    instance._previous_state = None
+    if not instance._state.adding:
+        instance._previous_state = Quiz.objects.filter(
+            pk=instance.pk
+        ).values_list('is_active', 'category_id').first()
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, **kwargs):
+    invalidate_answer_key(instance.pk)
+    site_stats.quiz_changed(
+        getattr(instance, '_previous_state', None),
+        (instance.is_active, instance.category_id)
+    )
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    invalidate_answer_key(instance.pk)
+    site_stats.quiz_changed((instance.is_active, instance.category_id), None)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if created:
+        site_stats.increment(site_stats.CATEGORIES)
+    else:
+        site_stats.invalidate()
+        # Cached quiz cards show the category name and are versioned by updated_at
+        Quiz.objects.filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    site_stats.increment(site_stats.CATEGORIES, -1)
+
+
+@receiver(pre_save, sender=Question)
+def question_moving(sender, instance, **kwargs):
+    # Remember the previous quiz so both quizzes get their counters fixed
+    instance._previous_quiz_id = None
+    if not instance._state.adding:
+        instance._previous_quiz_id = Question.objects.filter(
+            pk=instance.pk
+        ).values_list('quiz_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    quiz_ids = {instance.quiz_id, getattr(instance, '_previous_quiz_id', None)}
+    quiz_ids.discard(None)
+    for quiz_id in quiz_ids:
+        Quiz.update_counters(quiz_id)
+        invalidate_answer_key(quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    if Choice.question.is_cached(instance):
+        quiz_id = instance.question.quiz_id
+    else:
+        quiz_id = Question.objects.filter(
+            pk=instance.question_id
+        ).values_list('quiz_id', flat=True).first()
+    # A missing question means it is being deleted and invalidates on its own
+    if quiz_id is not None:
+        invalidate_answer_key(quiz_id)
+
+
+@receiver(pre_save, sender=UserProfile)
+def profile_saving(sender, instance, **kwargs):
+    # A picture that is not committed yet was just uploaded
+    picture = instance.profile_picture
+    instance._new_picture = bool(picture) and not picture._committed
+    if instance._new_picture:
+        thumbnails.normalize(picture)
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, **kwargs):
+    if getattr(instance, '_new_picture', False):
+        jobs.enqueue('profile_thumbnails', source_name=instance.profile_picture.name)
+
+
+def _deleting_attempts_only(origin):
+    # Deleting a quiz, its category or a user takes their whole leaderboard rows along
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is QuizAttempt
+
+
+@receiver(pre_delete, sender=QuizAttempt)
+def attempt_deleting(sender, instance, origin=None, **kwargs):
+    if origin is instance:
+        # A stale instance may predate its attempt_completed job
+        instance.stats_applied = QuizAttempt.objects.filter(
+            pk=instance.pk
+        ).values_list('stats_applied', flat=True).first() or False
+    # The entry is deleted by the cascade before post_delete; remember its score
+    instance._leaderboard_score = None
+    if _deleting_attempts_only(origin):
+        instance._leaderboard_score = LeaderboardEntry.objects.filter(
+            attempt_id=instance.pk
+        ).values_list('score', flat=True).first()
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def attempt_deleted(sender, instance, origin=None, **kwargs):
+    if instance.stats_applied:
+        participant_left(instance.user_id, origin)
+
+    score = getattr(instance, '_leaderboard_score', None)
+    if score is None:
+        return
+    LeaderboardBucket.objects.filter(quiz_id=instance.quiz_id, score=score).update(
+        entries=F('entries') - 1
+    )
+    # Promote the user's next-best attempt, if any is left
+    best = QuizAttempt.objects.filter(quiz_id=instance.quiz_id, user_id=instance.user_id).order_by(
+        '-score', 'time_taken', 'completed_at', 'pk'
+    ).first()
+    if best is not None:
+        LeaderboardEntry.record_attempt(best)
+
+
+def participant_left(user_id, origin):
+    """Drop the user from the participant count once their last counted attempt is gone"""
+    # One delete() sends a signal per attempt, all after the rows are gone
+    # (e.g. deleting a user), so count each user once per deletion
+    left = origin.__dict__.setdefault('_participants_left', set()) if origin is not None else set()
+    if user_id in left:
+        return
+    if not QuizAttempt.objects.filter(user_id=user_id, stats_applied=True).exists():
+        left.add(user_id)
+        site_stats.increment(site_stats.PARTICIPANTS, -1)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    sqlite.configure(connection)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # SQLite drops triggers whenever a migration rebuilds quiz_quiz or quiz_question
+    if sender.name == 'quiz' and search.is_installed(connections[using]):
+        search.install(connections[using])
+
+
+@receiver(user_logged_in)
+def session_started(sender, request, user, **kwargs):
+    # Login already saves the session; start the refresh interval from here
+    if hasattr(request, 'session'):
+        SessionRefreshMiddleware.mark_refreshed(request.session)
@@ -0,0 +1,113 @@
+"""
+Site-wide counters shown on the home page.
+
+The counters are stored in ``SiteCounter`` rows and ``Category.active_quiz_count``
+and adjusted with F-expressions whenever quizzes or categories are written, a
+user's first attempt is counted or their last counted attempt is deleted. Readers get one cached bundle; the cache entry is dropped on every
+counter change and otherwise expires after ``QUIZ_SITE_STATS_TIMEOUT`` seconds.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Category, Quiz, QuizAttempt, SiteCounter
+
+
+ACTIVE_QUIZZES = 'active_quizzes'
+PARTICIPANTS = 'participants'
+CATEGORIES = 'categories'
+COUNTERS = (ACTIVE_QUIZZES, PARTICIPANTS, CATEGORIES)
+
+CACHE_KEY = 'quiz:site_stats'
+CACHE_TIMEOUT = getattr(settings, 'QUIZ_SITE_STATS_TIMEOUT', 60)
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+def increment(name, delta=1):
+    """Atomically add ``delta`` to a named counter"""
+    if not delta:
+        return
+    counters = SiteCounter.objects.filter(name=name)
+    if not counters.update(value=F('value') + delta):
+        counter, created = SiteCounter.objects.get_or_create(name=name, defaults={'value': delta})
+        if not created:
+            counters.update(value=F('value') + delta)
+    invalidate()
+
+
+def adjust_category(category_id, delta):
+    if category_id is not None and delta:
+        Category.objects.filter(pk=category_id).update(
+            active_quiz_count=F('active_quiz_count') + delta
+        )
+        invalidate()
+
+
+def quiz_changed(old, new):
+    """
+    Apply the counter changes of a quiz write.
+
+    ``old`` and ``new`` are ``(is_active, category_id)`` tuples, or ``None``
+    when the quiz did not exist before or does not exist anymore.
+    """
+    if old == new:
+        return
+    old_active = bool(old and old[0])
+    new_active = bool(new and new[0])
+    increment(ACTIVE_QUIZZES, int(new_active) - int(old_active))
+    if old_active:
+        adjust_category(old[1], -1)
+    if new_active:
+        adjust_category(new[1], 1)
+
+
+def get_stats():
+    """
+    Return the cached home page statistics.
+
+    The bundle holds ``total_quizzes``, ``total_users``, ``total_categories``
+    and ``categories``, a list of ``{'id', 'name', 'quiz_count'}`` dicts.
+    """
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        counters = dict(SiteCounter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+        stats = {
+            'total_quizzes': counters.get(ACTIVE_QUIZZES, 0),
+            'total_users': counters.get(PARTICIPANTS, 0),
+            'total_categories': counters.get(CATEGORIES, 0),
+            'categories': [
+                {'id': pk, 'name': name, 'quiz_count': quiz_count}
+                for pk, name, quiz_count in Category.objects.values_list(
+                    'pk', 'name', 'active_quiz_count'
+                )
+            ],
+        }
+        cache.set(CACHE_KEY, stats, CACHE_TIMEOUT)
+    return stats
+
+
+def recompute():
+    """Recompute every counter from scratch; returns the new counter values"""
+    # Attempts still waiting for their attempt_completed job are counted by it
+    counted = QuizAttempt.objects.filter(stats_applied=True)
+    values = {
+        ACTIVE_QUIZZES: Quiz.objects.filter(is_active=True).count(),
+        PARTICIPANTS: counted.order_by().values('user').distinct().count(),
+        CATEGORIES: Category.objects.count(),
+    }
+    with transaction.atomic():
+        for name, value in values.items():
+            SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+        categories = list(Category.objects.annotate(
+            actual=Count('quizzes', filter=Q(quizzes__is_active=True))
+        ))
+        for category in categories:
+            category.active_quiz_count = category.actual
+        Category.objects.bulk_update(categories, Category.COUNTER_FIELDS, batch_size=500)
+    invalidate()
+    return values
@@ -0,0 +1,73 @@
+"""
+Running on a single SQLite database file under concurrent requests.
+
+``configure`` applies ``QUIZ_SQLITE_PRAGMAS`` to every new connection: WAL
+journaling lets readers go on while a transaction writes, ``busy_timeout``
+makes writers wait for the write lock instead of failing, and the cache and
+memory-map sizes keep hot pages out of the filesystem.
+
+SQLite allows one writer at a time, and a transaction that has already read
+cannot wait for the write lock; it fails with "database is locked" straight
+away. ``write_lane`` therefore queues the write transactions of this process
+one after another, and retries one that still hits a lock held by another
+process with exponential backoff.
+"""
+import logging
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+
+logger = logging.getLogger('quiz.sqlite')
+
+PRAGMAS = getattr(settings, 'QUIZ_SQLITE_PRAGMAS', {})
+ENABLED = getattr(settings, 'QUIZ_WRITE_LANE', True)
+RETRIES = getattr(settings, 'QUIZ_WRITE_LANE_RETRIES', 5)
+RETRY_DELAY = getattr(settings, 'QUIZ_WRITE_LANE_RETRY_DELAY', 0.05)
+
+_lane = threading.RLock()
+
+
+def configure(connection):
+    """Apply ``QUIZ_SQLITE_PRAGMAS`` to a new file-backed SQLite connection"""
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    # On the raw connection, so the pragmas do not count against query budgets
+    for name, value in PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def write_lane(func):
+    """
+    Run the decorated write transaction in this process's SQLite write lane.
+
+    Retries need a transaction of their own to roll back, so a call inside an
+    outer ``atomic`` block is queued but not retried. Other databases run the
+    function directly.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if not ENABLED or connection.vendor != 'sqlite':
+            return func(*args, **kwargs)
+        retries = 0 if connection.in_atomic_block else RETRIES
+        for attempt in range(retries + 1):
+            try:
+                with _lane:
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_lock_error(e):
+                    raise
+                delay = RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1)
+                logger.warning('%s hit a locked database, retrying in %.0f ms', func.__name__, delay * 1000)
+                time.sleep(delay)
+    return wrapper
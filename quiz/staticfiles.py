@@ -0,0 +1,177 @@
+"""
+Static asset pipeline: content-hashed, minified and precompressed files.
+
+``CompressedManifestStaticFilesStorage`` is the ``staticfiles`` storage. On
+``collectstatic`` (or ``manage.py build_static``) it minifies CSS, and JS when
+``rjsmin`` is installed, as the files are written; names are hashed from the
+source files and minifying is deterministic, so a name still pins its content.
+It then writes a ``.gz`` and, when ``brotli`` is installed, a ``.br`` copy of
+every hashed text asset next to it. ``serve`` hands the files out of ``STATIC_ROOT``
+in the best encoding the browser accepts. Hashed names never change content,
+so they are sent with far-future ``immutable`` caching and returning users
+do not even revalidate them.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from functools import cached_property
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+COMPRESSIBLE = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml')
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_MAX_AGE = getattr(settings, 'QUIZ_STATIC_MAX_AGE', 60)
+
+_CSS_TOKENS_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/''', re.S)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCTUATION_RE = re.compile(r' ?([{};,>]) ?')
+# A space before a colon can matter in selectors (``div :hover``), never after
+_CSS_COLON_RE = re.compile(r': ')
+
+
+def minify_css(css):
+    """Drop comments and insignificant whitespace, leaving strings untouched"""
+    parts = []
+    code = []
+    position = 0
+    for match in _CSS_TOKENS_RE.finditer(css):
+        code.append(css[position:match.start()])
+        position = match.end()
+        # Comments are dropped; strings are kept as they are
+        if match.group(1):
+            parts.extend([_minify_css_code(''.join(code)), match.group(1)])
+            code = []
+    code.append(css[position:])
+    parts.append(_minify_css_code(''.join(code)))
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def _minify_css_code(code):
+    code = _CSS_SPACE_RE.sub(' ', code)
+    return _CSS_COLON_RE.sub(':', _CSS_PUNCTUATION_RE.sub(r'\1', code))
+
+
+def minify(name, content):
+    """Minified text of a CSS or JS file, or ``None`` for other files"""
+    if name.endswith('.css'):
+        return minify_css(content)
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(content)
+    return None
+
+
+def compress(content):
+    """``{suffix: bytes}`` of the precompressed copies worth keeping"""
+    compressed = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['.br'] = brotli.compress(content, quality=11)
+    return {suffix: data for suffix, data in compressed.items() if len(data) < len(content)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that minifies CSS/JS and precompresses text assets.
+
+    Until ``collectstatic`` has run, URLs fall back to the unhashed names
+    instead of failing, so development and tests work without a build.
+    """
+
+    def _save(self, name, content):
+        if name.endswith(('.css', '.js')):
+            content.seek(0)
+            minified = minify(name, content.read().decode())
+            if minified is not None:
+                content = ContentFile(minified.encode())
+            else:
+                content.seek(0)
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if isinstance(hashed_name, str):
+                hashed_names[name] = hashed_name
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name, hashed_name in hashed_names.items():
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            with self.open(hashed_name) as f:
+                content = f.read()
+            for suffix, data in compress(content).items():
+                if self.exists(hashed_name + suffix):
+                    self.delete(hashed_name + suffix)
+                # Bypass _save so the compressed bytes are not minified again
+                super()._save(hashed_name + suffix, ContentFile(data))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def reload_manifest(self):
+        """Pick up the manifest of a build that ran after this instance was created"""
+        self.hashed_files, self.manifest_hash = self.load_manifest()
+        self.__dict__.pop('_hashed_names', None)
+
+    @cached_property
+    def _hashed_names(self):
+        return set(self.hashed_files.values())
+
+    def is_hashed(self, path):
+        """Whether ``path`` is a content-hashed name from the manifest"""
+        return path in self._hashed_names
+
+
+@require_GET
+def serve(request, path):
+    """Serve a file from ``STATIC_ROOT``, precompressed when possible"""
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    if not os.path.isfile(fullpath) or path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+        raise Http404('File not found')
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = {
+        token.split(';')[0].strip() for token in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(fullpath + suffix):
+            encoding, fullpath = name, fullpath + suffix
+            break
+
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if getattr(staticfiles_storage, 'is_hashed', lambda path: False)(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE)
+    return response
@@ -0,0 +1,12 @@
+from django import template
+
+from quiz import thumbnails
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(picture, size, ext='jpg'):
+    """URL of the ``size`` pixel square thumbnail of an image field (``jpg`` or ``webp``)"""
+    return thumbnails.thumbnail_url(getattr(picture, 'name', picture), int(size), ext)
@@ -1,3 +1,1499 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.db import connection
+from django.db.models import Count, F
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from unittest import mock, skipUnless
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    async_views, benchmark, exports, generator, jobs, leaderboard, query_plans, replicas, search, site_stats, thumbnails,
+    urls as quiz_urls
+)
+from .admin import CategoryAdmin, QuizAdmin
+from .admin_tools import EstimatedCountPaginator
+from .answer_key import current_version, get_answer_key, local_cache
+from .grading import (
+    GradingError, attempt_completed, clean_answers, finalize_attempt, grade_submission, score_answers
+)
+from .middleware import QueryRecorder, ReplicaMiddleware, fingerprint
+from .staticfiles import minify_css
+from .models import (
+    Category, Quiz, Question, Choice, QuizAttempt, Answer, LeaderboardEntry, LeaderboardBucket,
+    ActiveAttempt, Job, SiteCounter, UserProfile
+)
+
+
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+# Keep the tests out of the shared file cache of the development server
+isolated_cache = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+
+
+def setUpModule():
+    isolated_cache.enable()
+
+
+def tearDownModule():
+    isolated_cache.disable()
+
+
+class QueryBudgetMixin:
+    """Assertions that fail when a request issues more queries than allowed"""
+
+    def assertQueryBudget(self, budget, url, method='get', **kwargs):
+        """Request ``url`` and fail if it issues more than ``budget`` queries"""
+        with QueryRecorder() as recorder:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                # Streaming responses run their queries while being consumed
+                response.content_bytes = b''.join(response.streaming_content)
+        if recorder.count > budget:
+            duplicates = '\n'.join(
+                f'  x{times}: {sql}' for sql, times in recorder.duplicates.items()
+            )
+            self.fail(
+                f'{method.upper()} {url} issued {recorder.count} queries '
+                f'(budget {budget})' + (f'\nDuplicates:\n{duplicates}' if duplicates else '')
+            )
+        return response
+
+
+def seed_quiz_data(quizzes=6, questions=5, users=4):
+    """Create categories, quizzes with questions and graded attempts"""
+    author = User.objects.create_user('author', password='password')
+    categories = [
+        Category.objects.create(name=f'Category {i}', description='Seeded category')
+        for i in range(2)
+    ]
+    for i in range(quizzes):
+        quiz = Quiz.objects.create(
+            title=f'Seeded quiz {i}',
+            description='Questions about seeded data',
+            category=categories[i % len(categories)],
+            time_limit=10,
+            created_by=author
+        )
+        for j in range(questions):
+            question = Question.objects.create(
+                quiz=quiz, question_text=f'Seeded question {j}', marks=2, order=j
+            )
+            for k in range(3):
+                Choice.objects.create(
+                    question=question, choice_text=f'Choice {k}', is_correct=k == 0
+                )
+
+    takers = [User.objects.create_user(f'user{i}', password='password') for i in range(users)]
+    started_at = timezone.now()
+    for quiz in Quiz.objects.all():
+        choices = {
+            question.pk: [choice.pk for choice in question.choices.all()]
+            for question in quiz.questions.prefetch_related('choices')
+        }
+        for offset, user in enumerate(takers):
+            answers = {
+                question_id: options[(offset + n) % len(options)]
+                for n, (question_id, options) in enumerate(choices.items())
+            }
+            grade_submission(user, quiz, answers, started_at=started_at, time_taken=60 + offset)
+    # Apply the post-submit jobs a worker would run
+    jobs.run_pending()
+    return takers
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every quiz URL stays within its budget in ``QUIZ_QUERY_BUDGETS``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_quiz_data()
+        cls.user = cls.users[0]
+        cls.quiz = Quiz.objects.order_by('pk').first()
+        cls.attempt = QuizAttempt.objects.filter(user=cls.user, quiz=cls.quiz).get()
+
+    def setUp(self):
+        # Measure cold caches: the budget must hold for the first request too
+        cache.clear()
+        local_cache.clear()
+        self.client.force_login(self.user)
+
+    def budget(self, name):
+        return settings.QUIZ_QUERY_BUDGETS[f'quiz:{name}']
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in quiz_urls.urlpatterns}
+        missing = {name for name in names if f'quiz:{name}' not in settings.QUIZ_QUERY_BUDGETS}
+        self.assertFalse(missing, f'URLs without a query budget: {sorted(missing)}')
+
+    def test_home(self):
+        self.assertQueryBudget(self.budget('home'), reverse('quiz:home'))
+
+    def test_quiz_list(self):
+        self.assertQueryBudget(self.budget('quiz_list'), reverse('quiz:quiz_list'))
+        self.assertQueryBudget(
+            self.budget('quiz_list'), reverse('quiz:quiz_list'), data={'search': 'seeded'}
+        )
+
+    def test_quiz_search_api(self):
+        self.assertQueryBudget(
+            self.budget('quiz_search_api'), reverse('quiz:quiz_search_api'), data={'q': 'seed'}
+        )
+
+    def test_quiz_detail(self):
+        self.assertQueryBudget(self.budget('quiz_detail'), reverse('quiz:quiz_detail', args=[self.quiz.pk]))
+
+    def test_start_quiz(self):
+        self.assertQueryBudget(self.budget('start_quiz'), reverse('quiz:start_quiz', args=[self.quiz.pk]))
+
+    def test_take_quiz(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        self.assertQueryBudget(self.budget('take_quiz'), reverse('quiz:take_quiz', args=[self.quiz.pk]))
+
+    def test_finish_quiz(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        ActiveAttempt.objects.update(deadline=timezone.now() - timedelta(seconds=1))
+        self.assertQueryBudget(self.budget('take_quiz'), reverse('quiz:take_quiz', args=[self.quiz.pk]))
+        self.assertQueryBudget(self.budget('finish_quiz'), reverse('quiz:finish_quiz', args=[self.quiz.pk]))
+        self.assertFalse(ActiveAttempt.objects.exists())
+
+    def test_quiz_content(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        url = reverse('quiz:quiz_content', args=[self.quiz.pk])
+        response = self.assertQueryBudget(self.budget('quiz_content'), url)
+        self.assertEqual(len(response.json()['questions']), self.quiz.question_count)
+
+    def test_attempt_state(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        response = self.assertQueryBudget(
+            self.budget('attempt_state'), reverse('quiz:attempt_state', args=[self.quiz.pk])
+        )
+        self.assertGreater(response.json()['remaining_time'], 0)
+
+    def test_autosave_answers(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        question = self.quiz.questions.first()
+        response = self.assertQueryBudget(
+            self.budget('autosave_answers'), reverse('quiz:autosave_answers', args=[self.quiz.pk]),
+            method='post', data=json.dumps({'answers': {question.pk: question.choices.first().pk}}),
+            content_type='application/json'
+        )
+        self.assertTrue(response.json()['success'])
+
+    def test_submit_quiz(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        question = self.quiz.questions.first()
+        answers = {question.pk: question.choices.get(is_correct=True).pk}
+        response = self.assertQueryBudget(
+            self.budget('submit_quiz'), reverse('quiz:submit_quiz'), method='post',
+            data=json.dumps({'quiz_id': self.quiz.pk, 'answers': answers}),
+            content_type='application/json'
+        )
+        self.assertTrue(response.json()['success'])
+
+    def test_quiz_result(self):
+        self.assertQueryBudget(self.budget('quiz_result'), reverse('quiz:quiz_result', args=[self.attempt.pk]))
+
+    def test_quiz_review(self):
+        self.assertQueryBudget(self.budget('quiz_review'), reverse('quiz:quiz_review', args=[self.attempt.pk]))
+
+    def test_dashboard(self):
+        self.assertQueryBudget(self.budget('dashboard'), reverse('quiz:dashboard'))
+
+    def test_leaderboard(self):
+        self.assertQueryBudget(self.budget('leaderboard'), reverse('quiz:leaderboard', args=[self.quiz.pk]))
+        # Users missing from the page shown also get their standing
+        self.client.force_login(LeaderboardEntry.objects.filter(quiz=self.quiz).first().user)
+        self.assertQueryBudget(
+            self.budget('leaderboard'), reverse('quiz:leaderboard', args=[self.quiz.pk]),
+            data={'cursor': self.client.get(
+                reverse('quiz:leaderboard_api', args=[self.quiz.pk]), {'limit': 1}
+            ).json()['next_cursor']}
+        )
+
+    def test_leaderboard_api(self):
+        self.assertQueryBudget(
+            self.budget('leaderboard_api'), reverse('quiz:leaderboard_api', args=[self.quiz.pk])
+        )
+
+    def test_leaderboard_rank(self):
+        self.assertQueryBudget(
+            self.budget('leaderboard_rank'), reverse('quiz:leaderboard_rank', args=[self.quiz.pk])
+        )
+
+    def test_export_attempts(self):
+        self.user.is_staff = True
+        self.user.save()
+        for params in ({}, {'answers': '1', 'quiz': self.quiz.pk}):
+            response = self.assertQueryBudget(
+                self.budget('export_attempts'), reverse('quiz:export_attempts'), data=params
+            )
+            if params:
+                expected = Answer.objects.filter(attempt__quiz=self.quiz).count()
+            else:
+                expected = QuizAttempt.objects.count()
+            lines = response.content_bytes.decode().splitlines()
+            self.assertEqual(len(lines), expected + 1)
+
+    def test_category_quizzes(self):
+        self.assertQueryBudget(
+            self.budget('category_quizzes'), reverse('quiz:category_quizzes', args=[self.quiz.category_id])
+        )
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_quiz_data(quizzes=1, questions=2, users=1)
+
+    def test_headers(self):
+        with self.settings(QUIZ_QUERY_HEADERS=True):
+            response = self.client.get(reverse('quiz:quiz_list'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertIn('X-Query-Time-Ms', response)
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+
+    def test_headers_disabled(self):
+        with self.settings(QUIZ_QUERY_HEADERS=False):
+            response = self.client.get(reverse('quiz:quiz_list'))
+        self.assertNotIn('X-Query-Count', response)
+
+    def test_over_budget_is_logged(self):
+        with self.settings(QUIZ_QUERY_BUDGETS={'quiz:quiz_list': 0}):
+            with self.assertLogs('quiz.queries', 'WARNING') as logs:
+                self.client.get(reverse('quiz:quiz_list'))
+        self.assertIn('quiz:quiz_list issued', logs.output[0])
+
+    def test_fingerprint_ignores_literals_and_in_list_length(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM quiz_quiz WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM quiz_quiz WHERE id IN (%s) LIMIT 5')
+        )
+
+
+class ActiveAttemptTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=1, questions=2, users=1)[0]
+        cls.quiz = Quiz.objects.get()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def submit(self, answers=None):
+        return self.client.post(
+            reverse('quiz:submit_quiz'),
+            data=json.dumps({'quiz_id': self.quiz.pk, 'answers': answers or {}}),
+            content_type='application/json'
+        )
+
+    def test_start_resumes_the_attempt_in_progress(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        started = ActiveAttempt.objects.get(user=self.user, quiz=self.quiz)
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        self.assertEqual(ActiveAttempt.objects.get().pk, started.pk)
+        self.assertAlmostEqual(
+            (started.deadline - started.started_at).total_seconds(), self.quiz.time_limit * 60
+        )
+
+    def test_submit_grades_once(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        self.assertTrue(self.submit().json()['success'])
+        self.assertFalse(ActiveAttempt.objects.exists())
+        self.assertEqual(self.submit().status_code, 400)
+
+    def test_expired_attempt_is_graded_with_saved_answers(self):
+        question = self.quiz.questions.first()
+        correct = question.choices.get(is_correct=True)
+        ActiveAttempt.objects.create(
+            user=self.user, quiz=self.quiz,
+            started_at=timezone.now() - timedelta(minutes=self.quiz.time_limit + 1),
+            deadline=timezone.now() - timedelta(minutes=1),
+            answers={str(question.pk): correct.pk}
+        )
+        response = self.client.get(reverse('quiz:take_quiz', args=[self.quiz.pk]))
+        finish_url = reverse('quiz:finish_quiz', args=[self.quiz.pk])
+        self.assertRedirects(response, finish_url, fetch_redirect_response=False)
+        response = self.client.get(finish_url)
+        attempt = QuizAttempt.objects.filter(user=self.user).latest('pk')
+        self.assertRedirects(response, reverse('quiz:quiz_result', args=[attempt.pk]))
+        self.assertEqual(attempt.score, question.marks)
+        self.assertEqual(attempt.time_taken, self.quiz.time_limit * 60)
+
+    def test_finish_waits_for_the_deadline(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        response = self.client.get(reverse('quiz:finish_quiz', args=[self.quiz.pk]))
+        self.assertRedirects(response, reverse('quiz:take_quiz', args=[self.quiz.pk]))
+        self.assertTrue(ActiveAttempt.objects.exists())
+
+    def test_finalize_expired_attempts_in_batches(self):
+        past = timezone.now() - timedelta(hours=1)
+        for user in User.objects.all():
+            ActiveAttempt.objects.create(
+                user=user, quiz=self.quiz, started_at=past - timedelta(minutes=5), deadline=past
+            )
+        ActiveAttempt.objects.create(
+            user=User.objects.create_user('late'), quiz=self.quiz,
+            started_at=timezone.now(), deadline=timezone.now() + timedelta(minutes=5)
+        )
+
+        out = StringIO()
+        call_command('finalize_expired_attempts', batch_size=1, stdout=out)
+        self.assertIn('Finalized 2 expired attempts', out.getvalue())
+        self.assertEqual(list(ActiveAttempt.objects.values_list('user__username', flat=True)), ['late'])
+
+    def autosave(self, answers):
+        return self.client.post(
+            reverse('quiz:autosave_answers', args=[self.quiz.pk]),
+            data=json.dumps({'answers': answers}), content_type='application/json'
+        )
+
+    def test_autosave_merges_batches_and_submit_grades_them(self):
+        first, second = self.quiz.questions.all()
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        self.autosave({first.pk: first.choices.exclude(is_correct=True).first().pk})
+        self.autosave({first.pk: first.choices.get(is_correct=True).pk})
+        self.autosave({second.pk: second.choices.get(is_correct=True).pk})
+        self.autosave({second.pk: None})
+        self.assertEqual(
+            ActiveAttempt.objects.get().answers,
+            {str(first.pk): first.choices.get(is_correct=True).pk}
+        )
+
+        response = self.client.get(reverse('quiz:attempt_state', args=[self.quiz.pk]))
+        self.assertEqual(response.json()['answers'], ActiveAttempt.objects.get().answers)
+
+        attempt = QuizAttempt.objects.get(pk=self.submit().json()['attempt_id'])
+        self.assertEqual(attempt.score, first.marks)
+
+    def test_autosave_rejects_foreign_choices_and_missing_attempts(self):
+        question = self.quiz.questions.first()
+        self.assertEqual(self.autosave({question.pk: question.choices.first().pk}).status_code, 400)
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        self.assertEqual(self.autosave({question.pk: 999999}).status_code, 400)
+        self.assertEqual(ActiveAttempt.objects.get().answers, {})
+
+    def test_quiz_pages_do_not_write_the_session(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        with QueryRecorder() as recorder:
+            self.client.get(reverse('quiz:take_quiz', args=[self.quiz.pk]))
+        self.assertFalse([sql for sql in recorder.fingerprints if 'django_session' in sql and 'UPDATE' in sql])
+
+
+
+class CounterFieldsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_quiz_data(quizzes=1, questions=3, users=0)
+        cls.quiz = Quiz.objects.get()
+        cls.admin = User.objects.create_superuser('admin', password='password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def concurrently(self, admin_class, model, field):
+        """Patch ``save_model`` to increment ``field`` after the form loaded the row"""
+        original = admin_class.save_model
+
+        def save_model(admin, request, obj, form, change):
+            model.objects.filter(pk=obj.pk).update(**{field: F(field) + 1})
+            original(admin, request, obj, form, change)
+        return mock.patch.object(admin_class, 'save_model', save_model)
+
+    def test_admin_save_keeps_concurrent_quiz_counter_increment(self):
+        quiz = self.quiz
+        with self.concurrently(QuizAdmin, Quiz, 'question_count'):
+            response = self.client.post(reverse('admin:quiz_quiz_change', args=[quiz.pk]), {
+                'title': 'Renamed quiz', 'description': quiz.description,
+                'category': quiz.category_id, 'created_by': quiz.created_by_id,
+                'external_id': quiz.external_id, 'difficulty': quiz.difficulty,
+                'time_limit': quiz.time_limit, 'passing_score': quiz.passing_score,
+                'max_attempts': quiz.max_attempts, 'is_active': 'on',
+                'questions-TOTAL_FORMS': '0', 'questions-INITIAL_FORMS': '0',
+            })
+        self.assertEqual(response.status_code, 302)
+        quiz = Quiz.objects.get(pk=quiz.pk)
+        self.assertEqual((quiz.title, quiz.question_count), ('Renamed quiz', 4))
+
+    def test_admin_save_keeps_concurrent_category_counter_increment(self):
+        category = self.quiz.category
+        with self.concurrently(CategoryAdmin, Category, 'active_quiz_count'):
+            response = self.client.post(reverse('admin:quiz_category_change', args=[category.pk]), {
+                'name': 'Renamed category', 'description': category.description,
+            })
+        self.assertEqual(response.status_code, 302)
+        category = Category.objects.get(pk=category.pk)
+        self.assertEqual((category.name, category.active_quiz_count), ('Renamed category', 2))
+
+
+class AdminChangelistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_quiz_data(quizzes=2, questions=2, users=3)
+        cls.quiz = Quiz.objects.order_by('pk').first()
+        cls.admin = User.objects.create_superuser('admin', password='password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def run_action(self, model, action, objects):
+        response = self.client.post(reverse(f'admin:quiz_{model}_changelist'), {
+            'action': action, '_selected_action': [obj.pk for obj in objects],
+        })
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_export_actions_stream_the_selected_rows(self):
+        attempts = list(QuizAttempt.objects.filter(quiz=self.quiz).order_by('pk'))
+        rows = self.run_action('quizattempt', 'export_attempts_csv', attempts)
+        self.assertEqual(rows[0], exports.ATTEMPT_HEADER)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [attempt.pk for attempt in attempts])
+        self.assertEqual([row[1] for row in rows[1:]], ['user0', 'user1', 'user2'])
+
+        rows = self.run_action('quizattempt', 'export_answers_csv', attempts[:1])
+        self.assertEqual(rows[0], exports.ANSWER_HEADER)
+        self.assertEqual(len(rows) - 1, self.quiz.question_count)
+        self.assertEqual({int(row[0]) for row in rows[1:]}, {attempts[0].pk})
+
+        answers = Answer.objects.filter(attempt=attempts[1]).order_by('pk')
+        rows = self.run_action('answer', 'export_answers_csv', answers)
+        self.assertEqual(rows[0], exports.ANSWER_HEADER)
+        self.assertEqual([row[-3] for row in rows[1:]], ['False'] * self.quiz.question_count)
+
+
+    def changelist(self, model, **params):
+        response = self.client.get(reverse(f'admin:quiz_{model}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_paginator_estimates_unfiltered_counts_and_caps_filtered_ones(self):
+        attempts = QuizAttempt.objects.order_by('pk')
+        first, last = attempts.first().pk, attempts.last().pk
+        QuizAttempt.objects.filter(pk=first + 1).delete()
+        # Tables below MAX_COUNT are counted exactly
+        self.assertEqual(EstimatedCountPaginator(attempts, 50).count, attempts.count())
+
+        # Above it, SQLite estimates from the pk range, gaps included
+        with mock.patch.object(EstimatedCountPaginator, 'MAX_COUNT', 2):
+            self.assertEqual(EstimatedCountPaginator(attempts, 50).count, last - first + 1)
+            self.assertEqual(EstimatedCountPaginator(attempts.filter(quiz=self.quiz), 50).count, 2)
+            self.assertEqual(self.changelist('quizattempt').context['cl'].result_count, last - first + 1)
+            self.assertEqual(self.changelist('quizattempt', quiz=self.quiz.pk).context['cl'].result_count, 2)
+
+    def test_quiz_search_filter(self):
+        other = Quiz.objects.exclude(pk=self.quiz.pk).get()
+        for value, expected in [
+            (self.quiz.pk, 3), (other.title.upper(), 3), ('seeded quiz', 6), ('no such quiz', 0),
+        ]:
+            with self.subTest(value=value):
+                response = self.changelist('quizattempt', quiz=value)
+                self.assertEqual(response.context['cl'].result_count, expected)
+        self.assertEqual(self.changelist('answer', quiz=other.pk).context['cl'].result_count, 6)
+        self.assertEqual(self.changelist('choice', quiz=other.pk).context['cl'].result_count, 6)
+
+        # The search box keeps the other active filters
+        response = self.changelist('quizattempt', quiz=other.title, is_passed__exact='1')
+        self.assertContains(response, '<input type="hidden" name="is_passed__exact" value="1">', html=True)
+        self.assertContains(response, f'value="{other.title}"')
+
+
+class QuizBankTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_quiz_data(quizzes=2, questions=3, users=0)
+
+    def export(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.jsonl', encoding='utf-8') as output:
+            call_command('export_quizzes', '--output', output.name, stderr=StringIO())
+            return [json.loads(line) for line in output]
+
+    def import_records(self, records, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8') as source:
+            source.writelines(json.dumps(record) + '\n' for record in records)
+            source.flush()
+            output = StringIO()
+            call_command('import_quizzes', source.name, '--author', 'author', *args, stdout=output)
+        return output.getvalue()
+
+    def test_export_then_import_round_trips(self):
+        records = self.export()
+        self.assertEqual(len(records), 2)
+        Quiz.objects.all().delete()
+
+        self.assertIn('quizzes_created: 2', self.import_records(records))
+        self.assertEqual(self.export(), records)
+        quiz = Quiz.objects.get(external_id=records[0]['external_id'])
+        self.assertEqual((quiz.question_count, quiz.total_marks), (3, 6))
+
+    def test_import_updates_existing_quiz_by_external_id(self):
+        record = self.export()[0]
+        quiz = Quiz.objects.get(external_id=record['external_id'])
+        record['title'] = 'Updated title'
+        record['questions'][0]['question_text'] = 'Updated question'
+        record['questions'].append({
+            'external_id': 'new-question', 'question_text': 'Added question', 'marks': 4, 'order': 9,
+            'choices': [
+                {'external_id': 'new-right', 'choice_text': 'Right', 'is_correct': True, 'order': 1},
+                {'external_id': 'new-wrong', 'choice_text': 'Wrong', 'is_correct': False, 'order': 2},
+            ],
+        })
+
+        output = self.import_records([record])
+        self.assertIn('quizzes_updated: 1', output)
+        self.assertIn('questions_created: 1', output)
+        self.assertEqual(Quiz.objects.count(), 2)
+        updated = Quiz.objects.get(pk=quiz.pk)
+        self.assertEqual(updated.title, 'Updated title')
+        self.assertEqual((updated.question_count, updated.total_marks), (4, 10))
+        self.assertEqual(
+            Question.objects.get(external_id=record['questions'][0]['external_id']).question_text,
+            'Updated question'
+        )
+
+    def test_dry_run_saves_and_invalidates_nothing(self):
+        record = self.export()[0]
+        quiz = Quiz.objects.get(external_id=record['external_id'])
+        record['title'] = 'Updated title'
+        version = current_version(quiz.pk)
+
+        with mock.patch.object(site_stats, 'recompute') as recompute:
+            output = self.import_records([record], '--dry-run')
+        self.assertIn('quizzes_updated: 1', output)
+        self.assertIn('dry run, nothing saved', output)
+        recompute.assert_not_called()
+        self.assertEqual(current_version(quiz.pk), version)
+        self.assertNotEqual(Quiz.objects.get(pk=quiz.pk).title, 'Updated title')
+
+    def test_prune_deletes_questions_and_choices_missing_from_the_file(self):
+        record = self.export()[0]
+        dropped_question = record['questions'].pop()
+        kept = record['questions'][0]
+        dropped_choice = next(choice for choice in kept['choices'] if not choice['is_correct'])
+        kept['choices'].remove(dropped_choice)
+
+        self.import_records([record])
+        self.assertTrue(Question.objects.filter(external_id=dropped_question['external_id']).exists())
+        self.assertTrue(Choice.objects.filter(external_id=dropped_choice['external_id']).exists())
+
+        output = self.import_records([record], '--prune')
+        self.assertIn('questions_pruned: 1', output)
+        self.assertIn('choices_pruned: 1', output)
+        self.assertFalse(Question.objects.filter(external_id=dropped_question['external_id']).exists())
+        self.assertFalse(Choice.objects.filter(external_id=dropped_choice['external_id']).exists())
+        self.assertEqual(Quiz.objects.get(external_id=record['external_id']).question_count, 2)
+        self.assertEqual(self.export()[0], record)
+
+
+class RepairQuizCountersTests(TestCase):
+
+    def test_repair_bumps_updated_at(self):
+        seed_quiz_data(quizzes=2, questions=3, users=0)
+        drifted, intact = Quiz.objects.order_by('pk')
+        Quiz.objects.filter(pk=drifted.pk).update(question_count=0, total_marks=0)
+
+        call_command('repair_quiz_counters', stdout=StringIO())
+        repaired = Quiz.objects.get(pk=drifted.pk)
+        self.assertEqual((repaired.question_count, repaired.total_marks), (3, 6))
+        self.assertGreater(repaired.updated_at, drifted.updated_at)
+        self.assertEqual(Quiz.objects.get(pk=intact.pk).updated_at, intact.updated_at)
+
+
+class ReconcileProfilesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.drifted, cls.missing = seed_quiz_data(quizzes=1, questions=2, users=2)
+
+    def stats(self):
+        return {
+            profile['user']: profile
+            for profile in UserProfile.objects.values('user', *UserProfile.STATS_FIELDS)
+        }
+
+    def test_repairs_drifted_and_missing_profiles(self):
+        expected = self.stats()
+        UserProfile.objects.filter(user=self.drifted).update(
+            total_quizzes_taken=7, total_score=F('total_score') + 3, average_percentage=12.5
+        )
+        UserProfile.objects.filter(user=self.missing).delete()
+        corrupted = self.stats()
+
+        out = StringIO()
+        call_command('reconcile_profiles', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted and 1 missing profiles', out.getvalue())
+        self.assertEqual(self.stats(), corrupted)
+
+        out = StringIO()
+        call_command('reconcile_profiles', stdout=out)
+        self.assertIn('Repaired 1 drifted and 1 missing profiles', out.getvalue())
+        self.assertEqual(self.stats(), expected)
+
+
+class GeneratorTests(TestCase):
+
+    def test_history_is_reproducible_and_respects_max_attempts(self):
+        # Far more attempts than 3 users can take on 2 quizzes
+        generator.generate(quizzes=2, questions=3, users=3, attempts=100, seed=1)
+        attempts = QuizAttempt.objects.select_related('quiz')
+        self.assertLess(attempts.count(), 100)
+        per_pair = {}
+        for attempt in attempts:
+            key = (attempt.user_id, attempt.quiz)
+            per_pair[key] = per_pair.get(key, 0) + 1
+        for (user_id, quiz), taken in per_pair.items():
+            self.assertLessEqual(taken, quiz.max_attempts)
+
+        epoch = generator.DEFAULT_EPOCH
+        history = timedelta(days=generator.HISTORY_DAYS)
+        for completed_at in attempts.values_list('completed_at', flat=True):
+            self.assertTrue(epoch - history <= completed_at <= epoch)
+
+    def test_reruns_count_earlier_attempts_against_max_attempts(self):
+        first = generator.Generator(seed=1)
+        user_ids = first.users(2)
+        quizzes = first.quizzes(2, 2, author_id=user_ids[0])
+        first.attempts(50, user_ids, quizzes)
+        generator.Generator(seed=2).attempts(50, user_ids, quizzes)
+
+        limits = {quiz.pk: quiz.max_attempts for quiz, _ in quizzes}
+        for row in QuizAttempt.objects.order_by().values('user', 'quiz').annotate(n=Count('pk')):
+            self.assertLessEqual(row['n'], limits[row['quiz']])
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='password')
+        cls.science = Category.objects.create(name='Science')
+        cls.history = Category.objects.create(name='History')
+
+        def make(title, description, category, difficulty='easy', is_active=True):
+            return Quiz.objects.create(
+                title=title, description=description, category=category,
+                difficulty=difficulty, is_active=is_active, time_limit=10, created_by=author
+            )
+
+        cls.title_match = make('Photosynthesis basics', 'Plants and light', cls.science)
+        cls.description_match = make('Biology', 'Cells and photosynthesis', cls.science, 'hard')
+        cls.question_match = make('Old farming', 'Fields and tools', cls.history)
+        Question.objects.create(quiz=cls.question_match, question_text='Why did photosynthesis matter?')
+        cls.inactive = make('Photosynthesis draft', 'Unpublished', cls.science, is_active=False)
+
+    def ids(self, *args, **kwargs):
+        return [quiz_id for quiz_id, _, _ in search.search(*args, **kwargs)]
+
+    def test_matches_are_ranked_and_highlighted(self):
+        hits = search.search('photo')
+        self.assertEqual(hits[0][0], self.title_match.pk)
+        self.assertIn('<mark>Photosynthesis</mark>', hits[0][1])
+        self.assertCountEqual(
+            [quiz_id for quiz_id, _, _ in hits],
+            [self.title_match.pk, self.description_match.pk, self.question_match.pk]
+        )
+        self.assertEqual(self.ids('photo', limit=1), [self.title_match.pk])
+
+    def test_filters_apply_before_the_limit(self):
+        self.assertEqual(self.ids('photosynthesis', limit=1, category_id=self.history.pk),
+                         [self.question_match.pk])
+        self.assertEqual(self.ids('photosynthesis', category_id=self.science.pk, difficulty='hard'),
+                         [self.description_match.pk])
+
+        response = self.client.get(reverse('quiz:quiz_list'), {
+            'search': 'photosynthesis', 'category': self.science.pk, 'difficulty': 'easy'
+        })
+        self.assertEqual([quiz.pk for quiz in response.context['quizzes']], [self.title_match.pk])
+
+    def test_triggers_keep_the_index_current(self):
+        self.title_match.title = 'Chlorophyll basics'
+        self.title_match.save()
+        Quiz.objects.filter(pk=self.inactive.pk).update(is_active=True)
+        self.assertNotIn(self.title_match.pk, self.ids('photosynthesis'))
+        self.assertEqual(self.ids('chlorophyll'), [self.title_match.pk])
+        self.assertIn(self.inactive.pk, self.ids('photosynthesis'))
+
+        question = Question.objects.create(quiz=self.description_match, question_text='Name a stomata function')
+        self.assertEqual(self.ids('stomata'), [self.description_match.pk])
+        question.delete()
+        self.assertEqual(self.ids('stomata'), [])
+        self.question_match.questions.update(question_text='Why did irrigation matter?')
+        self.assertNotIn(self.question_match.pk, self.ids('photosynthesis'))
+
+
+class QuizContentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=1, questions=2, users=1)[0]
+        cls.quiz = Quiz.objects.get()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        self.url = reverse('quiz:quiz_content', args=[self.quiz.pk])
+
+    def test_content_is_revalidated_with_its_etag(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('is_correct', response.content.decode())
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Editing a choice publishes a new version
+        choice = Choice.objects.filter(question__quiz=self.quiz).first()
+        choice.choice_text = 'Edited choice'
+        choice.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Edited choice', response.content.decode())
+
+    def test_content_and_state_require_an_active_attempt(self):
+        state = self.client.get(reverse('quiz:attempt_state', args=[self.quiz.pk]))
+        self.assertIn('no-cache', state['Cache-Control'])
+        self.assertEqual(state.json()['answers'], {})
+
+        ActiveAttempt.objects.all().delete()
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('quiz:attempt_state', args=[self.quiz.pk])).status_code, 400
+        )
+
+
+class QuizCardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=1, questions=2, users=1)[0]
+        cls.quiz = Quiz.objects.get()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.pages = {
+            reverse('quiz:home'): '{} Questions',
+            reverse('quiz:category_quizzes', args=[self.quiz.category_id]): '{} Questions',
+            reverse('quiz:quiz_list'): '<strong>{}</strong>',
+        }
+
+    def assertCardsShow(self, title, question_count):
+        for url, count in self.pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, title)
+                self.assertContains(response, count.format(question_count))
+
+    def test_editing_a_quiz_refreshes_its_cached_cards(self):
+        self.assertCardsShow('Seeded quiz 0', 2)
+        # The cards really come from the cache: a write that keeps updated_at is not seen
+        Quiz.objects.filter(pk=self.quiz.pk).update(title='Silently renamed')
+        self.assertCardsShow('Seeded quiz 0', 2)
+
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        quiz.title = 'Renamed quiz'
+        quiz.save()
+        self.assertCardsShow('Renamed quiz', 2)
+
+        Question.objects.create(quiz=quiz, question_text='Added question', marks=1, order=9)
+        self.assertCardsShow('Renamed quiz', 3)
+
+
+class GradingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=2, questions=2, users=1)[0]
+        cls.quiz, cls.other_quiz = Quiz.objects.order_by('pk')
+        cls.questions = list(cls.quiz.questions.order_by('pk'))
+        cls.foreign_question = cls.other_quiz.questions.first()
+
+    def setUp(self):
+        self.key = get_answer_key(self.quiz.pk)
+
+    def correct(self, question):
+        return question.choices.get(is_correct=True).pk
+
+    def test_unknown_and_foreign_ids_are_rejected(self):
+        first, second = self.questions
+        for answers in [
+            'not a mapping',
+            {0: self.correct(first)},
+            {'abc': self.correct(first)},
+            {self.foreign_question.pk: self.correct(self.foreign_question)},
+            {first.pk: self.correct(second)},
+            {first.pk: self.correct(self.foreign_question)},
+            {first.pk: 'abc'},
+        ]:
+            with self.subTest(answers=answers):
+                with self.assertRaises(GradingError):
+                    clean_answers(self.key, answers)
+                with self.assertRaises(GradingError):
+                    score_answers(self.key, answers)
+
+    def test_duplicate_answers_are_rejected(self):
+        first = self.questions[0]
+        wrong = first.choices.filter(is_correct=False).first().pk
+        with self.assertRaisesMessage(GradingError, 'answered more than once'):
+            clean_answers(self.key, {str(first.pk): wrong, first.pk: self.correct(first)})
+
+    def test_score_answers_grades_every_question_in_the_key(self):
+        first, second = self.questions
+        score, graded = score_answers(self.key, {str(first.pk): str(self.correct(first)), second.pk: ''})
+        self.assertEqual(score, 2)
+        self.assertEqual(graded, [
+            (first.pk, self.correct(first), True, 2),
+            (second.pk, None, False, 0),
+        ])
+
+    def test_grade_submission_removes_active_attempt_and_enqueues_job_atomically(self):
+        Job.objects.all().delete()
+        active, _ = ActiveAttempt.start(self.user, self.quiz)
+        first = self.questions[0]
+        answers = {first.pk: self.correct(first)}
+
+        with mock.patch.object(jobs, 'enqueue', side_effect=RuntimeError('queue down')):
+            with self.assertRaises(RuntimeError):
+                grade_submission(self.user, self.quiz, answers, timezone.now(), 30, active=active)
+        self.assertTrue(ActiveAttempt.objects.filter(pk=active.pk).exists())
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz).count(), 1)
+
+        attempt = grade_submission(self.user, self.quiz, answers, timezone.now(), 30, active=active)
+        self.assertFalse(ActiveAttempt.objects.filter(pk=active.pk).exists())
+        self.assertEqual(attempt.answers.count(), 2)
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.payload), ('attempt_completed', {'attempt_id': attempt.pk}))
+
+        # A second request finalizing the same attempt is turned away
+        self.assertIsNone(grade_submission(self.user, self.quiz, answers, timezone.now(), 30, active=active))
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz).count(), 2)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_submitted_answers_replace_autosaved_ones(self):
+        first, second = self.questions
+        wrong = first.choices.filter(is_correct=False).first().pk
+        active, _ = ActiveAttempt.start(self.user, self.quiz)
+        ActiveAttempt.save_answers(self.user, self.quiz.pk, {first.pk: wrong, second.pk: self.correct(second)})
+
+        attempt = finalize_attempt(ActiveAttempt.objects.get(pk=active.pk), {first.pk: self.correct(first)})
+        self.assertEqual(attempt.score, 4)
+
+
+class AnswerKeyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=1, questions=2, users=1)[0]
+        cls.quiz = Quiz.objects.get()
+
+    def assertBumpsVersion(self, change):
+        before = current_version(self.quiz.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertNotEqual(current_version(self.quiz.pk), before)
+
+    def test_saving_or_deleting_content_bumps_the_version(self):
+        question = self.quiz.questions.first()
+        choice = question.choices.first()
+        self.assertBumpsVersion(lambda: Quiz.objects.get(pk=self.quiz.pk).save())
+        self.assertBumpsVersion(lambda: Question.objects.filter(pk=question.pk).get().save())
+        self.assertBumpsVersion(lambda: Choice.objects.filter(pk=choice.pk).get().save())
+        self.assertBumpsVersion(lambda: Choice.objects.filter(pk=choice.pk).get().delete())
+        self.assertBumpsVersion(lambda: Question.objects.filter(pk=question.pk).get().delete())
+        self.assertBumpsVersion(lambda: Quiz.objects.get(pk=self.quiz.pk).delete())
+
+    def test_grade_submission_uses_the_new_key(self):
+        question = self.quiz.questions.order_by('pk').first()
+        old = question.choices.get(is_correct=True)
+        new = question.choices.filter(is_correct=False).first()
+        # Warm both cache levels with the old key
+        get_answer_key(self.quiz.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            old.is_correct, new.is_correct = False, True
+            old.save()
+            new.save()
+            question.marks = 5
+            question.save()
+
+        attempt = grade_submission(self.user, self.quiz, {question.pk: new.pk}, timezone.now(), 30)
+        self.assertEqual(attempt.score, 5)
+        self.assertEqual(attempt.total_marks, 5 + 2)
+        self.assertFalse(grade_submission(self.user, self.quiz, {question.pk: old.pk}, timezone.now(), 30).score)
+
+
+class SiteStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_quiz_data(quizzes=1, questions=2, users=2)
+        cls.quiz = Quiz.objects.get()
+
+    def participants(self):
+        return SiteCounter.objects.get(name=site_stats.PARTICIPANTS).value
+
+    def attempt(self, user):
+        attempt = grade_submission(user, self.quiz, {}, started_at=timezone.now(), time_taken=30)
+        jobs.run_pending()
+        return attempt
+
+    def assertMatchesRebuild(self):
+        counted = self.participants()
+        self.assertEqual(site_stats.recompute()[site_stats.PARTICIPANTS], counted)
+
+    def test_first_counted_attempt_increments(self):
+        self.assertEqual(self.participants(), 2)
+        newcomer = User.objects.create_user('newcomer', password='password')
+        self.attempt(newcomer)
+        self.attempt(newcomer)
+        self.assertEqual(self.participants(), 3)
+        self.assertMatchesRebuild()
+
+    def test_deleting_last_counted_attempt_decrements(self):
+        user = self.users[0]
+        # Loaded before its job ran, so the instance is stale
+        stale = self.attempt(user)
+        QuizAttempt.objects.filter(user=user).exclude(pk=stale.pk).delete()
+        self.assertEqual(self.participants(), 2)
+        stale.delete()
+        self.assertEqual(self.participants(), 1)
+        self.assertMatchesRebuild()
+
+        # Coming back after the deletes counts them again, once
+        self.attempt(user)
+        self.assertEqual(self.participants(), 2)
+        self.assertMatchesRebuild()
+
+    def test_deleting_users_and_quizzes_decrements_once_per_user(self):
+        self.attempt(self.users[0])
+        self.users[0].delete()
+        self.assertEqual(self.participants(), 1)
+        self.assertMatchesRebuild()
+
+        self.quiz.delete()
+        self.assertEqual(self.participants(), 0)
+        self.assertMatchesRebuild()
+
+    def test_deleting_an_uncounted_attempt_changes_nothing(self):
+        newcomer = User.objects.create_user('newcomer', password='password')
+        grade_submission(newcomer, self.quiz, {}, started_at=timezone.now(), time_taken=30).delete()
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(self.participants(), 2)
+
+    def test_rebuild_repairs_drift(self):
+        SiteCounter.objects.filter(name=site_stats.PARTICIPANTS).update(value=40)
+        output = StringIO()
+        call_command('rebuild_site_stats', stdout=output)
+        self.assertIn('participants: 2', output.getvalue())
+        self.assertEqual(self.participants(), 2)
+
+
+class JobQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=1, questions=2, users=1)[0]
+        cls.quiz = Quiz.objects.get()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def submit(self):
+        self.client.get(reverse('quiz:start_quiz', args=[self.quiz.pk]))
+        question = self.quiz.questions.first()
+        return self.client.post(
+            reverse('quiz:submit_quiz'),
+            data=json.dumps({
+                'quiz_id': self.quiz.pk,
+                'answers': {question.pk: question.choices.get(is_correct=True).pk}
+            }),
+            content_type='application/json'
+        )
+
+    def test_submit_defers_stats_to_a_job(self):
+        self.submit()
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 1)
+        self.assertEqual(Job.objects.get().name, 'attempt_completed')
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 2)
+        self.assertFalse(Job.objects.exists())
+
+    def test_attempt_is_counted_once(self):
+        self.submit()
+        attempt_id = Job.objects.get().payload['attempt_id']
+        attempt_completed(attempt_id)
+        attempt_completed(attempt_id)
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 2)
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 2)
+
+    def test_rebuilds_leave_pending_attempts_to_their_job(self):
+        self.submit()
+        call_command('reconcile_profiles', stdout=StringIO())
+        self.assertEqual(site_stats.recompute()[site_stats.PARTICIPANTS], 1)
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 1)
+
+        jobs.run_pending()
+        output = StringIO()
+        call_command('reconcile_profiles', '--dry-run', stdout=output)
+        self.assertIn('Found 0 drifted and 0 missing profiles', output.getvalue())
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 2)
+        self.assertEqual(SiteCounter.objects.get(name=site_stats.PARTICIPANTS).value, 1)
+
+    @override_settings(QUIZ_JOBS_EAGER=True)
+    def test_eager_jobs_run_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit()
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 2)
+
+    def test_failures_back_off_then_dead_letter(self):
+        self.submit()
+        job = Job.objects.get()
+        failing = mock.Mock(side_effect=ValueError('boom'))
+        with mock.patch.dict(jobs.HANDLERS, {'attempt_completed': failing}), \
+                self.assertLogs('quiz.jobs', 'WARNING') as logs:
+            for attempt in range(1, job.max_attempts + 1):
+                Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+                self.assertEqual(jobs.run_pending(), (0, 1))
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+        self.assertIn('dead-lettered', logs.output[-1])
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertEqual(jobs.run_pending(), (0, 0))
+
+        jobs.retry(Job.objects.filter(pk=job.pk))
+        self.assertEqual(jobs.run_pending(), (1, 0))
+
+    def test_expired_lease_is_claimed_again_and_the_stale_run_rolls_back(self):
+        self.submit()
+        stale = jobs.claim(visibility_timeout=60)[0]
+        self.assertEqual(jobs.claim(), [])
+        Job.objects.filter(pk=stale.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        fresh = jobs.claim()[0]
+        self.assertEqual(fresh.attempts, 2)
+
+        with self.assertLogs('quiz.jobs', 'WARNING'):
+            self.assertFalse(jobs.run(stale))
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 1)
+        self.assertTrue(jobs.run(fresh))
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_quizzes_taken, 2)
+
+
+class LeaderboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Scores: user0 2 in 60s, user1 0 in 61s, user2 2 in 62s
+        cls.users = seed_quiz_data(quizzes=1, questions=2, users=3)
+        cls.quiz = Quiz.objects.get()
+
+    def submit_wrong(self, user, time_taken):
+        answers = {
+            question.pk: question.choices.filter(is_correct=False).first().pk
+            for question in self.quiz.questions.all()
+        }
+        grade_submission(user, self.quiz, answers, started_at=timezone.now(), time_taken=time_taken)
+        jobs.run_pending()
+
+    def ranks(self):
+        return {
+            entry.user.username: leaderboard.rank_of(entry)
+            for entry in LeaderboardEntry.objects.filter(quiz=self.quiz).select_related('user')
+        }
+
+    def assertBucketsMatchEntries(self):
+        buckets = {
+            bucket.score: bucket.entries
+            for bucket in LeaderboardBucket.objects.filter(quiz=self.quiz) if bucket.entries
+        }
+        entries = {}
+        for score in LeaderboardEntry.objects.filter(quiz=self.quiz).values_list('score', flat=True):
+            entries[score] = entries.get(score, 0) + 1
+        self.assertEqual(buckets, entries)
+
+    def test_ties_on_score_rank_by_time(self):
+        self.submit_wrong(User.objects.create_user('newcomer', password='password'), time_taken=30)
+        self.assertEqual(self.ranks(), {'user0': 1, 'user2': 2, 'newcomer': 3, 'user1': 4})
+        self.assertEqual(leaderboard.total_entries(self.quiz.pk), 4)
+        self.assertBucketsMatchEntries()
+
+    def test_deleting_best_attempt_promotes_next_best(self):
+        best = QuizAttempt.objects.get(quiz=self.quiz, user=self.users[0])
+        self.submit_wrong(self.users[0], time_taken=30)
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.users[0]).attempt, best)
+
+        best.delete()
+        entry = LeaderboardEntry.objects.get(user=self.users[0])
+        self.assertEqual((entry.score, entry.time_taken), (0, 30))
+        self.assertEqual(self.ranks(), {'user2': 1, 'user0': 2, 'user1': 3})
+        self.assertBucketsMatchEntries()
+
+        QuizAttempt.objects.filter(user=self.users[0]).delete()
+        self.assertFalse(LeaderboardEntry.objects.filter(user=self.users[0]).exists())
+        self.assertEqual(leaderboard.total_entries(self.quiz.pk), 2)
+        self.assertBucketsMatchEntries()
+
+    def test_rebuild_matches_incremental_state(self):
+        newcomer = User.objects.create_user('newcomer', password='password')
+        # Ties with user1 on score, then on score and time; user1's retry is no better
+        self.submit_wrong(newcomer, time_taken=61)
+        self.submit_wrong(newcomer, time_taken=40)
+        self.submit_wrong(User.objects.create_user('late', password='password'), time_taken=40)
+        self.submit_wrong(self.users[1], time_taken=90)
+
+        def snapshot():
+            entries = {
+                entry.user.username: (entry.attempt_id, entry.score, entry.percentage, entry.time_taken)
+                for entry in LeaderboardEntry.objects.filter(quiz=self.quiz).select_related('user')
+            }
+            buckets = dict(
+                LeaderboardBucket.objects.filter(quiz=self.quiz, entries__gt=0).values_list('score', 'entries')
+            )
+            return entries, buckets, self.ranks()
+
+        incremental = snapshot()
+        self.assertEqual(incremental[1], {2: 2, 0: 3})
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+        self.assertBucketsMatchEntries()
+
+
+@override_settings(ROOT_URLCONF='quiz_project.urls_asgi')
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_quiz_data(quizzes=2, questions=2, users=2)[0]
+        cls.quiz = Quiz.objects.order_by('pk').first()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    async def test_pages_match_the_sync_views(self):
+        urls = [
+            reverse('quiz:home'),
+            reverse('quiz:quiz_list') + '?difficulty=medium',
+            reverse('quiz:quiz_detail', args=[self.quiz.pk]),
+            reverse('quiz:dashboard'),
+            reverse('quiz:leaderboard', args=[self.quiz.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                with override_settings(ROOT_URLCONF='quiz_project.urls'):
+                    expected = await sync_to_async(self.client.get)(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [t.name for t in response.templates], [t.name for t in expected.templates]
+                )
+                for key in ('quizzes', 'user_attempts', 'recent_attempts', 'top_entries'):
+                    if key in expected.context:
+                        self.assertEqual(list(response.context[key]), list(expected.context[key]))
+
+    async def test_missing_quiz_and_anonymous_dashboard(self):
+        response = await self.async_client.get(reverse('quiz:quiz_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('quiz:dashboard'))
+        self.assertRedirects(
+            response, f"{reverse('login')}?next={reverse('quiz:dashboard')}",
+            fetch_redirect_response=False
+        )
+
+
+@override_settings(QUIZ_ASYNC_PARALLEL_QUERIES=True)
+class ParallelQueryTests(TransactionTestCase):
+    # Parallel queries use their own connections, which only see committed data
+
+    async def test_gather_runs_queries_concurrently(self):
+        both_running = threading.Barrier(2, timeout=5)
+
+        def query(n):
+            both_running.wait()
+            return Category.objects.count() + n
+
+        await sync_to_async(Category.objects.create)(name='Parallel')
+        self.assertEqual(await async_views.gather(lambda: query(1), lambda: query(2)), [2, 3])
+
+
+class ConcurrentSubmitTests(TransactionTestCase):
+    """Submissions racing at the end of an exam all succeed on SQLite"""
+
+    submitters = 12
+
+    def test_parallel_submitters_never_see_a_locked_database(self):
+        users = seed_quiz_data(quizzes=1, questions=5, users=self.submitters)
+        quiz = Quiz.objects.get()
+        answers = {
+            question.pk: question.choices.get(is_correct=True).pk
+            for question in quiz.questions.prefetch_related('choices')
+        }
+        clients = []
+        for user in users:
+            ActiveAttempt.start(user, quiz)
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+        all_ready = threading.Barrier(len(clients), timeout=10)
+
+        def submit(client):
+            try:
+                all_ready.wait()
+                return client.post(
+                    reverse('quiz:submit_quiz'), content_type='application/json',
+                    data=json.dumps({'quiz_id': quiz.pk, 'answers': answers})
+                ).status_code
+            finally:
+                connection.close()
+
+        with self.assertNoLogs('quiz.sqlite', 'WARNING'), ThreadPoolExecutor(len(clients)) as pool:
+            statuses = list(pool.map(submit, clients))
+
+        self.assertEqual(statuses, [200] * len(clients))
+        self.assertEqual(QuizAttempt.objects.filter(quiz=quiz).count(), len(users) * 2)
+        self.assertFalse(ActiveAttempt.objects.exists())
+
+
+@override_settings(QUIZ_READ_REPLICAS=['replica'], QUIZ_REPLICA_HEALTH_CHECK_INTERVAL=0)
+@skipUnless(HAS_REPLICA, 'the replica database is configured by quiz_project.settings_test')
+class ReadReplicaTests(TestCase):
+    """Listed views read from the replica, which trails the primary"""
+
+    # The runner collects these even from skipped classes
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        SiteCounter.objects.update_or_create(name=site_stats.ACTIVE_QUIZZES, defaults={'value': 5})
+        SiteCounter.objects.using('replica').update_or_create(
+            name=site_stats.ACTIVE_QUIZZES, defaults={'value': 3}
+        )
+
+    def total_quizzes(self):
+        cache.delete(site_stats.CACHE_KEY)
+        return self.client.get(reverse('quiz:home')).context['total_quizzes']
+
+    def test_listed_views_read_from_the_replica(self):
+        self.assertTrue(replicas.ping('replica'))
+        self.assertEqual(self.total_quizzes(), 3)
+        with override_settings(QUIZ_REPLICA_VIEWS=[]):
+            self.assertEqual(self.total_quizzes(), 5)
+
+    @override_settings(ROOT_URLCONF='quiz_project.urls_asgi')
+    async def test_async_views_read_from_the_replica(self):
+        await sync_to_async(cache.delete)(site_stats.CACHE_KEY)
+        response = await self.async_client.get(reverse('quiz:home'))
+        self.assertEqual(response.context['total_quizzes'], 3)
+
+    def test_client_reads_from_the_primary_after_writing(self):
+        response = self.client.post(reverse('logout'))
+        self.assertIn(ReplicaMiddleware.COOKIE, response.cookies)
+        self.assertEqual(self.total_quizzes(), 5)
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(replicas, 'ping', return_value=False):
+            self.assertEqual(self.total_quizzes(), 5)
+
+    @override_settings(QUIZ_READ_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        self.assertEqual(self.total_quizzes(), 5)
+        self.assertNotIn(ReplicaMiddleware.COOKIE, self.client.post(reverse('logout')).cookies)
+
+
+@skipUnless(HAS_REPLICA, 'the replica database is configured by quiz_project.settings_test')
+class SyncReplicaTests(TransactionTestCase):
+    # The runner collects these even from skipped classes
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def test_sync_copies_the_primary_into_the_replica(self):
+        Category.objects.create(name='Written after the last sync')
+        replica = Category.objects.using('replica')
+        self.assertFalse(replica.exists())
+
+        call_command('sync_replica', 'replica', stdout=StringIO())
+        self.assertEqual(list(replica.values_list('name', flat=True)), ['Written after the last sync'])
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def setUp(self):
+        # Earlier tests cached answer keys under the quiz ids seeded here
+        cache.clear()
+        local_cache.clear()
+
+    def test_smoke(self):
+        # The command brings its own test database; run it in this test's instead
+        command = 'quiz.management.commands.benchmark'
+        with mock.patch(f'{command}.setup_test_environment'), \
+                mock.patch(f'{command}.teardown_test_environment'), \
+                mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'):
+            out = StringIO()
+            call_command(
+                'benchmark', quizzes=2, users=2, attempts=4, requests=2, warmup=0,
+                stdout=out, stderr=StringIO()
+            )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['volumes']['attempts'], 4)
+        self.assertEqual(set(report['views']), set(benchmark.VIEWS))
+        for view, stats in report['views'].items():
+            with self.subTest(view=view):
+                self.assertEqual(stats['requests'], 2)
+                self.assertGreater(stats['queries'], 0)
+
+
+class QueryPlanTests(TestCase):
+    """The views' statements use indexes; see ``manage.py explain_views``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed(quizzes=4, questions=3, users=6, attempts=40)
+
+    def test_views_need_no_new_indexes(self):
+        proposals = query_plans.propose(query_plans.capture())
+        self.assertEqual({str(proposal): views for proposal, views in proposals.items()}, {})
+
+    def test_proposes_the_index_that_removes_a_sort(self):
+        sql, params = QuizAttempt.objects.filter(
+            quiz_id=1, is_passed=True
+        ).order_by('-score').query.sql_with_params()
+        statement = query_plans.explain(query_plans.Statement(sql, params))
+        flag = ('temp b-tree', 'ORDER BY')
+        self.assertIn(flag, statement.flags)
+
+        proposal = query_plans.candidate(sql, flag)
+        self.assertEqual(proposal.fields, ('quiz', '-score'))
+        self.assertEqual(proposal.condition, (('is_passed', True),))
+        self.assertTrue(query_plans.fixes(proposal, statement, flag))
+        self.assertIsNone(query_plans.candidate('SELECT 1 FROM "quiz_category"', ('full scan', 'quiz_category')))
+
+
+class StaticAssetTests(TestCase):
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        settings_override = self.settings(STATIC_ROOT=static_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_built_assets_are_hashed_precompressed_and_immutable(self):
+        self.assertEqual(static('css/style.css'), '/static/css/style.css')
+        call_command('build_static', stdout=StringIO())
+        url = static('css/style.css')
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        css = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertNotIn('/*', css)
+
+        response = self.client.get('/static/css/style.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_minify_css_keeps_strings_and_descendant_selectors(self):
+        self.assertEqual(
+            minify_css('a :hover , b > c {\n  content: "a ;  b" ; /* note */\n}'),
+            'a :hover,b>c{content:"a ;  b"}'
+        )
+
+
+class ProfilePictureTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('pictured', password='password')
+        self.client.force_login(self.user)
+        upload = io.BytesIO()
+        Image.new('RGBA', (2400, 1600), (200, 40, 40, 255)).save(upload, 'PNG')
+        self.profile = UserProfile.objects.create(
+            user=self.user, profile_picture=SimpleUploadedFile('me.png', upload.getvalue())
+        )
+
+    def test_upload_is_normalized_and_thumbnailed_by_a_job(self):
+        name = self.profile.profile_picture.name
+        self.assertRegex(name, r'^profile_pics/me.*\.jpg$')
+        with Image.open(default_storage.open(name)) as image:
+            self.assertEqual((image.format, max(image.size)), ('JPEG', thumbnails.MAX_SIZE))
+
+        self.assertEqual(Job.objects.get().name, 'profile_thumbnails')
+        jobs.run_pending()
+        for size in thumbnails.SIZES:
+            with Image.open(default_storage.open(thumbnails.thumbnail_name(name, size, 'webp'))) as image:
+                self.assertEqual(image.size, (size, size))
+
+        response = self.client.get(reverse('quiz:dashboard'))
+        self.assertContains(response, thumbnails.thumbnail_url(name, 96, 'webp'))
+        self.assertNotContains(response, self.profile.profile_picture.url + '"')
+
+    def test_missing_thumbnail_is_rendered_on_request(self):
+        name = self.profile.profile_picture.name
+        url = thumbnails.thumbnail_url(name, 40, 'jpg')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (40, 40))
+        self.assertTrue(default_storage.exists(thumbnails.thumbnail_name(name, 40, 'jpg')))
+
+        self.assertEqual(self.client.get(url.replace('/40.', '/41.')).status_code, 404)
+
+    def test_rerendering_replaces_the_thumbnail_in_place(self):
+        name = self.profile.profile_picture.name
+        thumbnail = thumbnails.thumbnail_name(name, 96, 'webp')
+        with mock.patch.object(default_storage, 'delete', side_effect=AssertionError('deleted')), \
+                ThreadPoolExecutor(4) as pool:
+            rendered = list(pool.map(lambda _: thumbnails.render(name, 96, 'webp'), range(8)))
+        self.assertEqual(set(rendered), {thumbnail})
+        # No suffixed copies or leftover temporary files next to it
+        _, files = default_storage.listdir(f'{thumbnails.THUMBNAIL_DIR}/{name}')
+        self.assertEqual(files, ['96.webp'])
+        with Image.open(default_storage.open(thumbnail)) as image:
+            self.assertEqual(image.size, (96, 96))
@@ -0,0 +1,154 @@
+"""
+Profile picture normalization and thumbnails.
+
+Uploads are normalized when a profile is saved: rotated upright from their
+EXIF orientation, converted to RGB, downscaled to ``QUIZ_PROFILE_PICTURE_MAX_SIZE``
+and re-encoded as JPEG without metadata. Every size in ``QUIZ_THUMBNAIL_SIZES``
+is then rendered as a square WebP and JPEG by a background job.
+
+Thumbnails live under a path derived from the source name
+(``thumbs/profile_pics/me.jpg/96.webp``). A new upload gets a new source name,
+so a thumbnail never changes once written and is served with far-future
+caching. A thumbnail that is missing (an older upload, a new size, a lost
+job) is rendered on first request by ``serve`` on a small thread pool, which
+renders each file once however many requests ask for it at the same time.
+Rendering replaces the file in one step, so a reader or a second renderer
+(the job and a request, or two processes) never sees it missing or partial.
+"""
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import jobs
+from .models import UserProfile
+
+
+SIZES = tuple(getattr(settings, 'QUIZ_THUMBNAIL_SIZES', (40, 96, 192)))
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+MAX_SIZE = getattr(settings, 'QUIZ_PROFILE_PICTURE_MAX_SIZE', 1024)
+QUALITY = 82
+THUMBNAIL_DIR = 'thumbs'
+SOURCE_DIR = UserProfile._meta.get_field('profile_picture').upload_to
+CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+_pool = ThreadPoolExecutor(
+    getattr(settings, 'QUIZ_THUMBNAIL_WORKERS', 2), thread_name_prefix='quiz-thumbnails'
+)
+_rendering = {}
+_lock = threading.Lock()
+
+
+def thumbnail_name(source_name, size, ext):
+    """Storage name of the ``size`` pixel thumbnail of ``source_name``"""
+    return f'{THUMBNAIL_DIR}/{source_name}/{size}.{ext}'
+
+
+def thumbnail_url(source_name, size, ext='jpg'):
+    """URL of a thumbnail; ``size`` is rounded up to the next size in ``SIZES``"""
+    size = next((s for s in SIZES if s >= size), SIZES[-1])
+    return default_storage.url(thumbnail_name(source_name, size, ext))
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def normalize(field_file):
+    """Replace a freshly uploaded picture with an upright, downscaled JPEG"""
+    field_file.open('rb')
+    try:
+        with Image.open(field_file) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail((MAX_SIZE, MAX_SIZE))
+            content = _encode(image, 'JPEG')
+    finally:
+        field_file.close()
+    name = os.path.splitext(os.path.basename(field_file.name))[0] + '.jpg'
+    # save=False: the field is being saved with its instance already
+    field_file.save(name, ContentFile(content), save=False)
+
+
+def _replace(name, content):
+    """Write ``content`` to ``name`` in storage, overwriting it atomically"""
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        # Remote storages replace an object in a single upload
+        with default_storage.open(name, 'wb') as f:
+            f.write(content)
+        return
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write next to the target and rename over it
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(temp_path, default_storage.file_permissions_mode or 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def render(source_name, size, ext):
+    """Write one thumbnail of ``source_name`` to storage and return its name"""
+    name = thumbnail_name(source_name, size, ext)
+    with default_storage.open(source_name, 'rb') as f, Image.open(f) as image:
+        image = ImageOps.fit(ImageOps.exif_transpose(image).convert('RGB'), (size, size))
+        content = _encode(image, FORMATS[ext])
+    _replace(name, content)
+    return name
+
+
+@jobs.handler('profile_thumbnails')
+def render_all(source_name):
+    """Render every size and format of a profile picture"""
+    if not default_storage.exists(source_name):
+        return
+    for size in SIZES:
+        for ext in FORMATS:
+            render(source_name, size, ext)
+
+
+def ensure(source_name, size, ext):
+    """Return the name of a thumbnail, rendering it on the pool when missing"""
+    name = thumbnail_name(source_name, size, ext)
+    if default_storage.exists(name):
+        return name
+    with _lock:
+        future = _rendering.get(name)
+        if future is None:
+            future = _rendering[name] = _pool.submit(render, source_name, size, ext)
+            future.add_done_callback(lambda done: _rendering.pop(name, None))
+    return future.result()
+
+
+@require_GET
+def serve(request, source, size, ext):
+    """Serve a thumbnail from ``MEDIA_ROOT``, rendering it first when missing"""
+    if (size not in SIZES or ext not in FORMATS or not source.startswith(SOURCE_DIR)
+            or '..' in source.split('/') or not default_storage.exists(source)):
+        raise Http404('No such thumbnail')
+    try:
+        name = ensure(source, size, ext)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        raise Http404('No such thumbnail')
+
+    response = FileResponse(
+        default_storage.open(name, 'rb'), content_type=f'image/{FORMATS[ext].lower()}'
+    )
+    patch_cache_control(response, public=True, max_age=CACHE_MAX_AGE, immutable=True)
+    return response
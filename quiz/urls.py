@@ -6,11 +6,16 @@ app_name = 'quiz'
 urlpatterns = [
     path('', views.home, name='home'),
     path('quizzes/', views.quiz_list, name='quiz_list'),
+    path('quizzes/search/', views.quiz_search_api, name='quiz_search_api'),
     path('quiz/<int:pk>/', views.quiz_detail, name='quiz_detail'),
     
     # Quiz taking
     path('quiz/<int:pk>/start/', views.start_quiz, name='start_quiz'),
     path('quiz/<int:pk>/take/', views.take_quiz, name='take_quiz'),
+    path('quiz/<int:pk>/finish/', views.finish_quiz, name='finish_quiz'),
+    path('quiz/<int:pk>/content/', views.quiz_content, name='quiz_content'),
+    path('quiz/<int:pk>/state/', views.attempt_state, name='attempt_state'),
+    path('quiz/<int:pk>/autosave/', views.autosave_answers, name='autosave_answers'),
     path('quiz/submit/', views.submit_quiz, name='submit_quiz'),
     
     # Results and review
@@ -20,6 +25,11 @@ urlpatterns = [
     # User dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
     path('leaderboard/<int:pk>/', views.leaderboard, name='leaderboard'),
+    path('leaderboard/<int:pk>/entries/', views.leaderboard_api, name='leaderboard_api'),
+    path('leaderboard/<int:pk>/me/', views.leaderboard_rank, name='leaderboard_rank'),
+    
+    # Staff exports
+    path('export/attempts/', views.export_attempts, name='export_attempts'),
     
     # Category filtering
     path('category/<int:pk>/', views.category_quizzes, name='category_quizzes'),
@@ -0,0 +1,25 @@
+"""
+Quiz URLs for the ASGI deployment profile (``quiz_project.settings_asgi``).
+
+Same routes and names as ``quiz.urls``; the read-heavy pages are served by
+their async versions from ``quiz.async_views``.
+"""
+from django.urls import URLPattern
+
+from . import async_views, urls
+
+app_name = 'quiz'
+
+ASYNC_VIEWS = {
+    'home': async_views.home,
+    'quiz_list': async_views.quiz_list,
+    'quiz_detail': async_views.quiz_detail,
+    'leaderboard': async_views.leaderboard,
+    'dashboard': async_views.dashboard,
+}
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS.get(pattern.name, pattern.callback),
+               pattern.default_args, pattern.name)
+    for pattern in urls.urlpatterns
+]
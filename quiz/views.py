@@ -1,18 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
-from django.http import JsonResponse
-from django.utils import timezone
+from django.http import Http404, HttpResponse, JsonResponse
+from django.core import signing
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.cache import never_cache
+from django.utils.dateparse import parse_date
 from django.db.models import Count, Avg, Q
 from datetime import timedelta
 import json
 
 from .models import (
     Quiz, Question, Choice, QuizAttempt, 
-    Answer, Category, UserProfile
+    Answer, Category, UserProfile, ActiveAttempt
 )
 from .forms import UserRegisterForm
+from .answer_key import get_answer_key
+from .grading import GradingError, clean_answers, finalize_attempt
+from . import leaderboard as ranking
+from . import search as quiz_search
+from . import site_stats
+from . import exports
+from . import content
+from . import replicas
 
 
 def register(request):
@@ -37,30 +50,33 @@ def register(request):
 
 def home(request):
     """Homepage with featured quizzes"""
-    categories = Category.objects.all()
-    featured_quizzes = Quiz.objects.filter(is_active=True)[:6]
+    featured_quizzes = Quiz.objects.filter(is_active=True).select_related('category')[:6]
     
-    # Get statistics
-    total_quizzes = Quiz.objects.filter(is_active=True).count()
-    total_users = QuizAttempt.objects.values('user').distinct().count()
+    # Cached counters, maintained incrementally on writes
+    stats = site_stats.get_stats()
     
     context = {
-        'categories': categories,
+        'categories': stats['categories'],
         'featured_quizzes': featured_quizzes,
-        'total_quizzes': total_quizzes,
-        'total_users': total_users,
+        'total_quizzes': stats['total_quizzes'],
+        'total_users': stats['total_users'],
+        'total_categories': stats['total_categories'],
     }
     return render(request, 'quiz/home.html', context)
 
 
-def quiz_list(request):
-    """List all available quizzes with filtering"""
-    quizzes = Quiz.objects.filter(is_active=True)
+def filter_quizzes(params):
+    """
+    Active quizzes matching the ``category``, ``difficulty`` and ``search`` filters.
+
+    Returns ``(quizzes, category_id, difficulty, search)`` with unused filters
+    as ``None``; full-text matches come back as a list in relevance order.
+    """
+    quizzes = Quiz.objects.filter(is_active=True).select_related('category')
     
-    # Filtering
-    category_id = request.GET.get('category', '')
-    difficulty = request.GET.get('difficulty', '')
-    search = request.GET.get('search', '')
+    category_id = params.get('category', '')
+    difficulty = params.get('difficulty', '')
+    search = params.get('search', '')
     
     # Convert empty strings or 'None' to None
     if category_id and category_id != 'None':
@@ -78,13 +94,31 @@ def quiz_list(request):
         difficulty = None
     
     if search and search != 'None':
-        quizzes = quizzes.filter(
-            Q(title__icontains=search) | 
-            Q(description__icontains=search)
-        )
+        hits = quiz_search.search(search, category_id=category_id, difficulty=difficulty)
+        if hits is None:
+            quizzes = quizzes.filter(
+                Q(title__icontains=search) | 
+                Q(description__icontains=search)
+            )
+        else:
+            # Keep the relevance order and attach highlighted fragments
+            matches = quizzes.in_bulk([quiz_id for quiz_id, _, _ in hits])
+            quizzes = []
+            for quiz_id, title, snippet in hits:
+                if quiz_id in matches:
+                    quiz = matches[quiz_id]
+                    quiz.search_title = title
+                    quiz.search_snippet = snippet
+                    quizzes.append(quiz)
     else:
         search = None
     
+    return quizzes, category_id, difficulty, search
+
+
+def quiz_list(request):
+    """List all available quizzes with filtering"""
+    quizzes, category_id, difficulty, search = filter_quizzes(request.GET)
     categories = Category.objects.all()
     
     context = {
@@ -97,22 +131,56 @@ def quiz_list(request):
     return render(request, 'quiz/quiz_list.html', context)
 
 
+def quiz_search_api(request):
+    """Typeahead suggestions for the quiz search box"""
+    text = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    hits = quiz_search.search(text, limit=limit)
+    if hits is None:
+        quizzes = Quiz.objects.filter(is_active=True, title__icontains=text)[:limit] if text else []
+        results = [
+            {'id': quiz.id, 'title': quiz.title, 'title_html': '', 'snippet_html': ''}
+            for quiz in quizzes
+        ]
+    else:
+        active = Quiz.objects.filter(is_active=True).only('id', 'title').in_bulk(
+            [quiz_id for quiz_id, _, _ in hits]
+        )
+        results = [
+            {
+                'id': quiz_id,
+                'title': active[quiz_id].title,
+                'title_html': title or '',
+                'snippet_html': snippet or '',
+            }
+            for quiz_id, title, snippet in hits if quiz_id in active
+        ]
+    
+    for result in results:
+        result['url'] = reverse('quiz:quiz_detail', args=[result['id']])
+    return JsonResponse({'results': results})
+
+
 def quiz_detail(request, pk):
     """Quiz details and preview"""
-    quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
-    questions_count = quiz.questions.count()
-    total_marks = quiz.total_marks()
+    quiz = get_object_or_404(Quiz.objects.select_related('category'), pk=pk, is_active=True)
+    questions_count = quiz.question_count
+    total_marks = quiz.total_marks
     
     # Check user's previous attempts
     user_attempts = None
     attempts_left = quiz.max_attempts
     
     if request.user.is_authenticated:
-        user_attempts = QuizAttempt.objects.filter(
+        user_attempts = list(QuizAttempt.objects.filter(
             user=request.user, 
             quiz=quiz
-        ).order_by('-completed_at')
-        attempts_taken = user_attempts.count()
+        ).order_by('-completed_at'))
+        attempts_taken = len(user_attempts)
         attempts_left = quiz.max_attempts - attempts_taken
     
     context = {
@@ -140,17 +208,11 @@ def start_quiz(request, pk):
         messages.error(request, 'You have reached the maximum number of attempts for this quiz.')
         return redirect('quiz:quiz_detail', pk=pk)
     
-    # Check if there's an ongoing attempt
-    ongoing_attempt = request.session.get(f'quiz_attempt_{pk}')
-    if ongoing_attempt:
+    # Resume an ongoing attempt instead of starting another one
+    active, created = ActiveAttempt.start(request.user, quiz)
+    if not created:
         return redirect('quiz:take_quiz', pk=pk)
     
-    # Create session data for quiz
-    request.session[f'quiz_attempt_{pk}'] = {
-        'started_at': timezone.now().isoformat(),
-        'answers': {}
-    }
-    
     messages.success(request, f'Quiz started! You have {quiz.time_limit} minutes.')
     return redirect('quiz:take_quiz', pk=pk)
 
@@ -160,36 +222,87 @@ def take_quiz(request, pk):
     """Quiz taking page"""
     quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
     
-    # Check if quiz session exists
-    session_key = f'quiz_attempt_{pk}'
-    if session_key not in request.session:
+    active = ActiveAttempt.current(request.user, quiz)
+    if active is None:
         return redirect('quiz:start_quiz', pk=pk)
     
-    questions = quiz.questions.prefetch_related('choices').all()
-    
-    # Calculate remaining time
-    started_at = timezone.datetime.fromisoformat(
-        request.session[session_key]['started_at']
-    )
-    if timezone.is_naive(started_at):
-        started_at = timezone.make_aware(started_at)
-    
-    elapsed_time = (timezone.now() - started_at).total_seconds()
-    time_limit_seconds = quiz.time_limit * 60
-    remaining_time = max(0, time_limit_seconds - elapsed_time)
-    
-    # If time is up, auto-submit
+    # If time is up, grading happens on finish_quiz, which has its own budget
+    remaining_time = active.remaining_seconds()
     if remaining_time <= 0:
-        return redirect('quiz:submit_quiz')
+        return redirect('quiz:finish_quiz', pk=pk)
     
+    # Questions come from quiz_content and the timer from attempt_state
     context = {
         'quiz': quiz,
-        'questions': questions,
-        'remaining_time': int(remaining_time),
     }
     return render(request, 'quiz/quiz_take.html', context)
 
 
+@login_required
+def finish_quiz(request, pk):
+    """Grade an attempt whose time ran out with the answers saved so far"""
+    active = ActiveAttempt.objects.select_related('quiz').filter(user=request.user, quiz_id=pk).first()
+    if active is None:
+        return redirect('quiz:dashboard')
+    active.user = request.user
+    if active.remaining_seconds() > 0:
+        return redirect('quiz:take_quiz', pk=pk)
+    
+    attempt = finalize_attempt(active, finished_at=active.deadline)
+    if attempt is None:
+        return redirect('quiz:dashboard')
+    messages.info(request, 'Time is up! Your quiz has been submitted.')
+    return redirect('quiz:quiz_result', pk=attempt.pk)
+
+
+@login_required
+def quiz_content(request, pk):
+    """Questions and choices of a quiz in progress as cacheable JSON"""
+    if not ActiveAttempt.objects.filter(user=request.user, quiz_id=pk).exists():
+        return JsonResponse({'error': 'No active quiz session'}, status=400)
+    
+    payload = content.get_payload(pk)
+    if payload is None:
+        raise Http404('No Quiz matches the given query.')
+    
+    # Same body for every candidate: browsers revalidate and mostly get a 304
+    response = HttpResponse(payload.body, content_type='application/json')
+    response['ETag'] = payload.etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=payload.etag, response=response)
+
+
+@never_cache
+@login_required
+def attempt_state(request, pk):
+    """Remaining time and saved answers of the attempt in progress"""
+    active = ActiveAttempt.objects.filter(user=request.user, quiz_id=pk).first()
+    if active is None:
+        return JsonResponse({'error': 'No active quiz session'}, status=400)
+    return JsonResponse({
+        'remaining_time': active.remaining_seconds(),
+        'answers': active.answers,
+    })
+
+
+@login_required
+def autosave_answers(request, pk):
+    """Save a batch of changed answers to the attempt in progress"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        answers = clean_answers(get_answer_key(pk), data.get('answers', {}))
+    except (ValueError, AttributeError, GradingError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # One UPDATE merges the batch, so resending it is harmless
+    if not ActiveAttempt.save_answers(request.user, pk, answers):
+        return JsonResponse({'error': 'No active quiz session'}, status=400)
+    return JsonResponse({'success': True, 'saved': len(answers)})
+
+
 @login_required
 def submit_quiz(request):
     """Process quiz submission"""
@@ -203,59 +316,14 @@ def submit_quiz(request):
         
         quiz = get_object_or_404(Quiz, pk=quiz_id, is_active=True)
         
-        # Get session data
-        session_key = f'quiz_attempt_{quiz_id}'
-        if session_key not in request.session:
+        active = ActiveAttempt.current(request.user, quiz)
+        if active is None:
             return JsonResponse({'error': 'No active quiz session'}, status=400)
         
-        session_data = request.session[session_key]
-        started_at = timezone.datetime.fromisoformat(session_data['started_at'])
-        if timezone.is_naive(started_at):
-            started_at = timezone.make_aware(started_at)
-        
-        # Calculate time taken
-        time_taken = int((timezone.now() - started_at).total_seconds())
-        
-        # Create quiz attempt
-        total_marks = quiz.total_marks()
-        attempt = QuizAttempt.objects.create(
-            user=request.user,
-            quiz=quiz,
-            total_marks=total_marks,
-            time_taken=time_taken,
-            started_at=started_at
-        )
-        
-        # Process answers
-        score = 0
-        for question_id, choice_id in answers.items():
-            question = Question.objects.get(id=question_id, quiz=quiz)
-            selected_choice = Choice.objects.get(id=choice_id, question=question)
-            
-            is_correct = selected_choice.is_correct
-            marks_obtained = question.marks if is_correct else 0
-            score += marks_obtained
-            
-            Answer.objects.create(
-                attempt=attempt,
-                question=question,
-                selected_choice=selected_choice,
-                is_correct=is_correct,
-                marks_obtained=marks_obtained
-            )
-        
-        # Update attempt with score
-        attempt.score = score
-        attempt.calculate_percentage()
-        attempt.check_passed()
-        attempt.save()
-        
-        # Update user profile stats
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
-        profile.update_stats()
-        
-        # Clear session
-        del request.session[session_key]
+        # Grade all answers in memory and store the attempt in one transaction
+        attempt = finalize_attempt(active, answers)
+        if attempt is None:
+            return JsonResponse({'error': 'This attempt was already submitted'}, status=400)
         
         return JsonResponse({
             'success': True,
@@ -270,11 +338,16 @@ def submit_quiz(request):
 @login_required
 def quiz_result(request, pk):
     """Display quiz results"""
-    attempt = get_object_or_404(QuizAttempt, pk=pk, user=request.user)
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related('quiz__category'), pk=pk, user=request.user
+    )
     
-    # Calculate correct and incorrect answers
-    correct_answers = attempt.answers.filter(is_correct=True).count()
-    total_answers = attempt.answers.count()
+    # Calculate correct and incorrect answers in one query
+    counts = attempt.answers.aggregate(
+        total=Count('id'), correct=Count('id', filter=Q(is_correct=True))
+    )
+    correct_answers = counts['correct']
+    total_answers = counts['total']
     incorrect_answers = total_answers - correct_answers
     
     context = {
@@ -289,14 +362,16 @@ def quiz_result(request, pk):
 @login_required
 def quiz_review(request, pk):
     """Review answers after completing quiz"""
-    attempt = get_object_or_404(QuizAttempt, pk=pk, user=request.user)
-    answers = attempt.answers.select_related(
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_related('quiz'), pk=pk, user=request.user
+    )
+    answers = list(attempt.answers.select_related(
         'question', 'selected_choice'
-    ).prefetch_related('question__choices')
+    ).prefetch_related('question__choices'))
     
-    # Calculate statistics
-    correct_answers = answers.filter(is_correct=True).count()
-    total_questions = answers.count()
+    # Calculate statistics from the rows already loaded
+    correct_answers = sum(1 for answer in answers if answer.is_correct)
+    total_questions = len(answers)
     incorrect_answers = total_questions - correct_answers
     
     context = {
@@ -316,19 +391,13 @@ def dashboard(request):
     
     recent_attempts = QuizAttempt.objects.filter(
         user=request.user
-    ).select_related('quiz').order_by('-completed_at')[:10]
+    ).select_related('quiz__category').order_by('-completed_at')[:10]
     
-    # Statistics
-    total_attempts = QuizAttempt.objects.filter(user=request.user).count()
-    passed_attempts = QuizAttempt.objects.filter(
-        user=request.user, 
-        is_passed=True
-    ).count()
+    # Statistics are kept up to date on every submission
+    total_attempts = profile.total_quizzes_taken
+    passed_attempts = profile.total_quizzes_passed
     failed_attempts = total_attempts - passed_attempts
-    
-    avg_score = QuizAttempt.objects.filter(
-        user=request.user
-    ).aggregate(Avg('percentage'))['percentage__avg'] or 0
+    avg_score = profile.average_percentage
     
     context = {
         'profile': profile,
@@ -343,20 +412,113 @@ def dashboard(request):
 
 def leaderboard(request, pk):
     """Quiz leaderboard"""
-    quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
+    quiz = get_object_or_404(Quiz.objects.select_related('category'), pk=pk, is_active=True)
     
-    # Get top attempts for this quiz
-    top_attempts = QuizAttempt.objects.filter(
-        quiz=quiz
-    ).select_related('user').order_by('-score', 'time_taken')[:20]
+    # Best attempt of each user, read straight off the ranking index
+    try:
+        top_entries, next_cursor = ranking.page(quiz.pk, request.GET.get('cursor'))
+    except signing.BadSignature:
+        return redirect('quiz:leaderboard', pk=pk)
+    
+    # Show where the user stands when they are not on this page
+    my_standing = None
+    if request.user.is_authenticated and not any(
+        entry.user_id == request.user.id for entry in top_entries
+    ):
+        my_standing = ranking.standing(quiz.pk, request.user)
     
     context = {
         'quiz': quiz,
-        'top_attempts': top_attempts,
+        'top_entries': top_entries,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'my_standing': my_standing,
     }
     return render(request, 'quiz/leaderboard.html', context)
 
 
+def _entry_json(entry):
+    return {
+        'rank': entry.rank,
+        'username': entry.user.username,
+        'score': entry.score,
+        'total_marks': entry.total_marks,
+        'percentage': round(entry.percentage, 2),
+        'time_taken': entry.time_taken,
+        'completed_at': entry.completed_at.isoformat(),
+    }
+
+
+def leaderboard_api(request, pk):
+    """Keyset-paginated leaderboard as JSON"""
+    quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
+    try:
+        size = int(request.GET.get('limit', ranking.PAGE_SIZE))
+        entries, next_cursor = ranking.page(quiz.pk, request.GET.get('cursor'), size)
+    except (ValueError, signing.BadSignature):
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
+    
+    return JsonResponse({
+        'results': [_entry_json(entry) for entry in entries],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def leaderboard_rank(request, pk):
+    """The current user's rank and neighbours as JSON"""
+    quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
+    try:
+        neighbours = min(max(int(request.GET.get('neighbours', 2)), 0), 10)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid neighbours'}, status=400)
+    
+    standing = ranking.standing(quiz.pk, request.user, neighbours)
+    if standing is None:
+        return JsonResponse({'error': 'No attempts on this quiz yet'}, status=404)
+    
+    return JsonResponse({
+        'rank': standing['entry'].rank,
+        'total': standing['total'],
+        'entry': _entry_json(standing['entry']),
+        'above': [_entry_json(entry) for entry in standing['above']],
+        'below': [_entry_json(entry) for entry in standing['below']],
+    })
+
+
+@staff_member_required
+def export_attempts(request):
+    """Stream quiz attempts, optionally with their answers, as CSV"""
+    # Bound to a database now: the rows are read while streaming, after the view returns
+    attempts = QuizAttempt.objects.using(replicas.read_db())
+    try:
+        quiz_ids = [int(pk) for pk in request.GET.getlist('quiz')]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid quiz id'}, status=400)
+    if quiz_ids:
+        attempts = attempts.filter(quiz_id__in=quiz_ids)
+    if request.GET.get('user'):
+        attempts = attempts.filter(user__username=request.GET['user'])
+    if request.GET.get('passed') in ('0', '1'):
+        attempts = attempts.filter(is_passed=request.GET['passed'] == '1')
+    
+    for param, lookup in (('since', 'completed_at__date__gte'), ('until', 'completed_at__date__lte')):
+        if request.GET.get(param):
+            try:
+                day = parse_date(request.GET[param])
+            except ValueError:
+                day = None
+            if day is None:
+                return JsonResponse({'error': f'Invalid {param} date, use YYYY-MM-DD'}, status=400)
+            attempts = attempts.filter(**{lookup: day})
+    
+    with_answers = request.GET.get('answers') == '1'
+    return exports.csv_response(
+        exports.rows_for(attempts, with_answers=with_answers),
+        'answers' if with_answers else 'attempts'
+    )
+
+
 def category_quizzes(request, pk):
     """Quizzes filtered by category"""
     category = get_object_or_404(Category, pk=pk)
@@ -46,10 +46,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "quiz.middleware.QueryBudgetMiddleware",
+    "quiz.middleware.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "quiz.middleware.SessionRefreshMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -81,9 +84,66 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # Keep connections open between requests; checked before reuse
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "timeout": 20,  # seconds a writer waits for the lock
+        },
+        # A file, not the in-memory default, so tests see WAL and real locking
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+    },
 }
 
+# Read replicas (quiz.replicas): GET requests to QUIZ_REPLICA_VIEWS read from
+# a healthy replica in QUIZ_READ_REPLICAS; a client that has just written
+# reads from the primary for QUIZ_REPLICA_PIN_SECONDS
+DATABASE_ROUTERS = ["quiz.replicas.ReplicaRouter"]
+QUIZ_READ_REPLICAS = []  # e.g. ["replica"]
+QUIZ_REPLICA_VIEWS = [
+    "quiz:home",
+    "quiz:dashboard",
+    "quiz:leaderboard",
+    "quiz:leaderboard_api",
+    "quiz:leaderboard_rank",
+    "admin:quiz_quizattempt_changelist",
+    "admin:quiz_answer_changelist",
+    "admin:quiz_leaderboardentry_changelist",
+]
+QUIZ_REPLICA_PIN_SECONDS = 10
+QUIZ_REPLICA_HEALTH_CHECK_INTERVAL = 10  # seconds between checks of each replica
+
+# A copy of db.sqlite3 that `manage.py sync_replica` refreshes. It is only
+# added to DATABASES while listed above, so commands that touch every database
+# do not create an empty db_replica.sqlite3 (settings_test adds it for the
+# replica tests). With a database server, point it at the server's replica.
+SQLITE_REPLICA = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": BASE_DIR / "db_replica.sqlite3",
+    "CONN_MAX_AGE": 600,
+    "CONN_HEALTH_CHECKS": True,
+    "OPTIONS": {
+        "timeout": 20,
+    },
+    "TEST": {"NAME": BASE_DIR / "test_db_replica.sqlite3"},
+}
+if "replica" in QUIZ_READ_REPLICAS:
+    DATABASES["replica"] = SQLITE_REPLICA
+
+# Applied to every new SQLite connection by quiz.sqlite.configure
+QUIZ_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # readers do not block the writer and vice versa
+    "synchronous": "NORMAL",  # safe with WAL; fsync at checkpoints only
+    "busy_timeout": 20000,  # ms
+    "cache_size": -32000,  # KiB per connection
+    "mmap_size": 134217728,  # 128 MiB
+    "temp_store": "MEMORY",
+}
+# Serialize grading transactions in each process and retry them on a lock
+QUIZ_WRITE_LANE = True
+QUIZ_WRITE_LANE_RETRIES = 5
+QUIZ_WRITE_LANE_RETRY_DELAY = 0.05  # seconds, doubled on every retry
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -123,6 +183,17 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# `manage.py build_static` writes hashed, minified and precompressed files to
+# STATIC_ROOT (quiz.staticfiles); with DEBUG off they are served from there
+# with far-future caching unless QUIZ_SERVE_STATIC is off because the web
+# server serves STATIC_ROOT itself.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "quiz.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+QUIZ_SERVE_STATIC = True
+QUIZ_STATIC_MAX_AGE = 60  # seconds, for files requested by their unhashed name
+
 #Media Files
 MEDIA_URL  = "media/"
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -144,4 +215,76 @@ LOGOUT_REDIRECT_URL = 'quiz:home'
 
 # Session settings
 SESSION_COOKIE_AGE = 3600  # 1 hour
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are saved only when they change; quiz.middleware.SessionRefreshMiddleware
+# extends the expiry of active sessions at most once per interval instead.
+# In-progress quiz state lives in the ActiveAttempt table, not the session.
+SESSION_SAVE_EVERY_REQUEST = False
+QUIZ_SESSION_REFRESH_INTERVAL = 300  # seconds
+
+
+# Shared cache. Answer key versions, quiz content, site statistics and the
+# cached quiz cards are invalidated through it, so runserver, run_jobs and
+# every other manage.py process must see the same cache: Django's default
+# per-process LocMemCache would leave the others serving a stale answer key.
+# The file cache is shared by all processes on this host; use Redis or
+# Memcached when the site runs on more than one.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Answer key cache (quiz.answer_key)
+QUIZ_ANSWER_KEY_CACHE_SIZE = 256  # quizzes kept in the in-process LRU
+QUIZ_ANSWER_KEY_TIMEOUT = 60 * 60 * 24  # seconds in the shared cache
+
+# Home page statistics cache (quiz.site_stats)
+QUIZ_SITE_STATS_TIMEOUT = 60  # seconds
+
+# Profile pictures (quiz.thumbnails): uploads are downscaled to MAX_SIZE and
+# rendered as square WebP/JPEG thumbnails of these sizes
+QUIZ_PROFILE_PICTURE_MAX_SIZE = 1024  # pixels
+QUIZ_THUMBNAIL_SIZES = (40, 96, 192)  # pixels
+QUIZ_THUMBNAIL_WORKERS = 2  # threads rendering missing thumbnails on request
+
+# Background job queue (quiz.jobs, run by `manage.py run_jobs`)
+QUIZ_JOB_MAX_ATTEMPTS = 5  # then the job is dead-lettered
+QUIZ_JOB_VISIBILITY_TIMEOUT = 60  # seconds before a stalled job is run again
+QUIZ_JOB_RETRY_DELAY = 5  # seconds, doubled after every failed attempt
+# Also run each job in the request that queued it, right after its commit.
+# Without this, profile stats, leaderboards and home page counters only change
+# while a `run_jobs` worker is running; turn it on to develop without one
+QUIZ_JOBS_EAGER = False
+
+# Async views (quiz.async_views, enabled by quiz_project.settings_asgi): run
+# independent queries of a view concurrently, each on its own connection
+QUIZ_ASYNC_PARALLEL_QUERIES = False
+QUIZ_ASYNC_QUERY_WORKERS = 20  # threads, each holding at most one connection
+
+# Per-view query budgets (quiz.middleware.QueryBudgetMiddleware), keyed by URL
+# name. quiz/tests.py fails when a view goes over its budget; at runtime an
+# exceeded budget is logged to the "quiz.queries" logger.
+QUIZ_QUERY_BUDGETS = {
+    'quiz:home': 5,
+    'quiz:quiz_list': 6,
+    'quiz:quiz_search_api': 5,
+    'quiz:quiz_detail': 4,
+    'quiz:start_quiz': 8,
+    'quiz:take_quiz': 4,
+    'quiz:finish_quiz': 11,
+    'quiz:quiz_content': 5,
+    'quiz:attempt_state': 3,
+    'quiz:autosave_answers': 4,
+    'quiz:submit_quiz': 11,
+    'quiz:quiz_result': 4,
+    'quiz:quiz_review': 5,
+    'quiz:dashboard': 4,
+    'quiz:leaderboard': 10,
+    'quiz:leaderboard_api': 4,
+    'quiz:leaderboard_rank': 9,
+    'quiz:category_quizzes': 4,
+    'quiz:export_attempts': 3,
+}
+QUIZ_QUERY_HEADERS = DEBUG  # add X-Query-Count/-Time-Ms/-Duplicates headers
+QUIZ_QUERY_BUDGET_STRICT = False  # raise instead of logging when over budget
@@ -0,0 +1,15 @@
+"""
+ASGI deployment profile: serve the read-heavy quiz pages from their async views.
+
+Run with an ASGI server, e.g. ``uvicorn quiz_project.asgi:application``.
+"""
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'quiz_project.urls_asgi'
+
+# Every ASGI request runs its sync code on a thread of its own, so persistent
+# connections would pile up instead of being reused
+DATABASES = {alias: {**database, 'CONN_MAX_AGE': 0} for alias, database in DATABASES.items()}  # noqa: F405
+
+# Send independent queries of an async view from separate threads and connections
+QUIZ_ASYNC_PARALLEL_QUERIES = True
@@ -0,0 +1,10 @@
+"""
+Test profile: the default settings plus the read replica database.
+
+Run with ``python manage.py test --settings=quiz_project.settings_test``. The
+replica stays out of ``QUIZ_READ_REPLICAS``; the replica tests enable it
+themselves. Under the default settings those tests are skipped.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {**DATABASES, 'replica': SQLITE_REPLICA}  # noqa: F405
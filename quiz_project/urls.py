@@ -16,12 +16,14 @@ Including another URLconf
 """
 
 
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
-from quiz import views as quiz_views
+from quiz import staticfiles, thumbnails, views as quiz_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -33,10 +35,24 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 ]
 
+# Profile picture thumbnails, rendered on first request when missing; goes
+# before the media files so a missing thumbnail is not a 404
+urlpatterns += [
+    path(
+        f'{settings.MEDIA_URL.lstrip("/")}{thumbnails.THUMBNAIL_DIR}/<path:source>/<int:size>.<slug:ext>',
+        thumbnails.serve, name='profile_thumbnail'
+    ),
+]
+
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+elif settings.QUIZ_SERVE_STATIC:
+    # Built assets from `manage.py build_static`, precompressed and cached for good
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.*)$', staticfiles.serve),
+    ]
 
 # Custom error handlers
 handler404 = 'quiz.views.handler404'
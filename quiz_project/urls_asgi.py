@@ -0,0 +1,14 @@
+"""
+URL configuration for the ASGI deployment profile (``quiz_project.settings_asgi``).
+
+Same routes as ``quiz_project.urls``, with the quiz app served from
+``quiz.urls_async``.
+"""
+from django.urls import include, path
+
+from .urls import handler404, handler500, urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', include('quiz.urls_async')),
+    *(pattern for pattern in sync_urlpatterns if getattr(pattern, 'app_name', None) != 'quiz'),
+]
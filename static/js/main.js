@@ -74,6 +74,47 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
 
+    // Search typeahead
+    if (searchInput && searchInput.dataset.suggestUrl) {
+        const suggestions = searchInput.parentElement.querySelector('.search-suggestions');
+        let suggestTimer;
+        let suggestController;
+
+        searchInput.addEventListener('input', function () {
+            clearTimeout(suggestTimer);
+            const query = this.value.trim();
+            if (query.length < 2) {
+                suggestions.innerHTML = '';
+                return;
+            }
+            suggestTimer = setTimeout(() => {
+                if (suggestController) {
+                    suggestController.abort();
+                }
+                suggestController = new AbortController();
+                fetch(`${searchInput.dataset.suggestUrl}?q=${encodeURIComponent(query)}`, {
+                    signal: suggestController.signal
+                })
+                    .then(response => response.json())
+                    .then(data => {
+                        // title_html is escaped server-side and only adds <mark> tags
+                        suggestions.innerHTML = (data.results || []).map(result => `
+                            <a href="${result.url}" class="list-group-item list-group-item-action">
+                                ${result.title_html || result.title.replace(/[&<>"']/g, c => `&#${c.charCodeAt(0)};`)}
+                            </a>
+                        `).join('');
+                    })
+                    .catch(() => {});
+            }, 200);
+        });
+
+        document.addEventListener('click', function (e) {
+            if (!searchInput.parentElement.contains(e.target)) {
+                suggestions.innerHTML = '';
+            }
+        });
+    }
+
     // Category card hover effect
     const categoryCards = document.querySelectorAll('.category-card');
     categoryCards.forEach(card => {
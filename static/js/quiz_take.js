@@ -0,0 +1,294 @@
+// Quiz taking page: renders the quiz content payload, runs the timer,
+// autosaves answers and submits the attempt. Loaded as a module by quiz_take.html.
+
+const quizForm = document.getElementById('quiz-form');
+const quizId = Number(quizForm.dataset.quizId);
+const contentUrl = quizForm.dataset.contentUrl;
+const stateUrl = quizForm.dataset.stateUrl;
+const autosaveUrl = quizForm.dataset.autosaveUrl;
+const submitUrl = quizForm.dataset.submitUrl;
+const autosaveDelay = 1500;  // ms to wait for more changes before saving
+const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+let totalQuestions = Number(quizForm.dataset.questionCount);
+let remainingTime = 0;
+let currentQuestion = 1;
+let timerInterval;
+let pendingAnswers = {};
+let autosaveTimer = null;
+let autosaveRequest = null;
+
+// The content is shared by all candidates and revalidated with its ETag;
+// the timer and saved answers are per attempt and never cached
+function loadJson(url) {
+    return fetch(url, {credentials: 'same-origin'}).then(response => {
+        if (!response.ok) {
+            throw new Error(`${url} returned HTTP ${response.status}`);
+        }
+        return response.json();
+    });
+}
+
+function renderQuestions(questions) {
+    const nav = document.getElementById('question-nav');
+    const template = document.getElementById('question-template');
+    totalQuestions = questions.length;
+    document.getElementById('quiz-loading').remove();
+
+    questions.forEach((question, index) => {
+        const number = index + 1;
+        const section = template.content.firstElementChild.cloneNode(true);
+        section.dataset.question = number;
+        section.querySelector('.question-title').textContent =
+            `Question ${number} of ${questions.length}`;
+        section.querySelector('.question-marks').textContent = `${question.marks} marks`;
+        section.querySelector('.question-text').textContent = question.text;
+
+        const choices = section.querySelector('.question-choices');
+        question.choices.forEach((choice, choiceIndex) => {
+            const label = document.createElement('label');
+            label.className = 'choice-label d-block';
+            const radio = document.createElement('input');
+            radio.type = 'radio';
+            radio.name = `question_${question.id}`;
+            radio.value = choice.id;
+            radio.className = 'me-2';
+            radio.required = true;
+            const text = document.createElement('span');
+            text.textContent = `${choiceIndex + 1}. ${choice.text}`;
+            label.append(radio, text);
+            choices.append(label);
+        });
+
+        section.querySelector('.prev-btn').disabled = number === 1;
+        section.querySelector(number === questions.length ? '.next-btn' : '.submit-btn').remove();
+        quizForm.append(section);
+
+        const navButton = document.createElement('button');
+        navButton.type = 'button';
+        navButton.className = 'btn btn-outline-primary question-nav-btn';
+        navButton.dataset.question = number;
+        navButton.textContent = number;
+        nav.append(navButton);
+    });
+}
+
+// Restore answers saved before a reload or dropped connection
+function restoreAnswers(savedAnswers) {
+    Object.entries(savedAnswers).forEach(([questionId, choiceId]) => {
+        const radio = document.querySelector(
+            `input[name="question_${questionId}"][value="${choiceId}"]`
+        );
+        if (radio) {
+            radio.checked = true;
+        }
+    });
+}
+
+// Initialize timer
+function startTimer() {
+    updateTimerDisplay();
+    timerInterval = setInterval(() => {
+        remainingTime--;
+        updateTimerDisplay();
+
+        if (remainingTime <= 0) {
+            clearInterval(timerInterval);
+            alert('Time is up! Submitting quiz...');
+            submitQuiz();
+        }
+    }, 1000);
+}
+
+function updateTimerDisplay() {
+    const minutes = Math.floor(remainingTime / 60);
+    const seconds = remainingTime % 60;
+    document.getElementById('time-remaining').textContent =
+        `${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
+
+    // Change color when time is running out
+    if (remainingTime <= 60) {
+        document.getElementById('time-remaining').classList.add('text-danger');
+    }
+}
+
+// Navigation
+function showQuestion(questionNum) {
+    document.querySelectorAll('.question-section').forEach(section => {
+        section.style.display = 'none';
+    });
+    document.querySelector(`.question-section[data-question="${questionNum}"]`).style.display = 'block';
+    currentQuestion = questionNum;
+    updateProgress();
+}
+
+function bindControls() {
+    // Next/Previous buttons
+    document.querySelectorAll('.next-btn').forEach(btn => {
+        btn.addEventListener('click', () => {
+            if (currentQuestion < totalQuestions) {
+                showQuestion(currentQuestion + 1);
+            }
+        });
+    });
+
+    document.querySelectorAll('.prev-btn').forEach(btn => {
+        btn.addEventListener('click', () => {
+            if (currentQuestion > 1) {
+                showQuestion(currentQuestion - 1);
+            }
+        });
+    });
+
+    // Question navigation buttons
+    document.querySelectorAll('.question-nav-btn').forEach(btn => {
+        btn.addEventListener('click', () => {
+            const questionNum = parseInt(btn.dataset.question);
+            showQuestion(questionNum);
+        });
+    });
+
+    // Mark answered questions and queue them for autosave
+    document.querySelectorAll('input[type="radio"]').forEach(radio => {
+        radio.addEventListener('change', () => {
+            updateAnsweredQuestions();
+            queueAutosave(radio.name.replace('question_', ''), radio.value);
+        });
+    });
+}
+
+// Autosave: changed answers are collected for a moment and sent as one batch
+function queueAutosave(questionId, choiceId) {
+    pendingAnswers[questionId] = choiceId;
+    clearTimeout(autosaveTimer);
+    autosaveTimer = setTimeout(flushAutosave, autosaveDelay);
+}
+
+function flushAutosave() {
+    clearTimeout(autosaveTimer);
+    if (autosaveRequest) {
+        // Send the next batch once the one in flight has finished
+        return autosaveRequest.then(flushAutosave);
+    }
+    if (Object.keys(pendingAnswers).length === 0) {
+        return Promise.resolve();
+    }
+    const batch = pendingAnswers;
+    pendingAnswers = {};
+    autosaveRequest = fetch(autosaveUrl, {
+        method: 'POST',
+        keepalive: true,
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken
+        },
+        body: JSON.stringify({answers: batch})
+    })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`Autosave returned HTTP ${response.status}`);
+        }
+    })
+    .catch(() => {
+        // Offline or rejected: keep the batch, newer changes win, and retry later
+        pendingAnswers = Object.assign(batch, pendingAnswers);
+        autosaveTimer = setTimeout(flushAutosave, autosaveDelay * 4);
+    })
+    .finally(() => {
+        autosaveRequest = null;
+    });
+    return autosaveRequest;
+}
+
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        flushAutosave();
+    }
+});
+
+function updateAnsweredQuestions() {
+    const answeredQuestions = new Set();
+    document.querySelectorAll('input[type="radio"]:checked').forEach(radio => {
+        const questionNum = parseInt(radio.closest('.question-section').dataset.question);
+        answeredQuestions.add(questionNum);
+    });
+
+    document.querySelectorAll('.question-nav-btn').forEach((btn, index) => {
+        if (answeredQuestions.has(index + 1)) {
+            btn.classList.add('answered');
+            btn.classList.remove('btn-outline-primary');
+        }
+    });
+
+    // Update submission summary
+    document.getElementById('answered-count').textContent = answeredQuestions.size;
+    document.getElementById('unanswered-count').textContent = totalQuestions - answeredQuestions.size;
+
+    updateProgress();
+}
+
+function updateProgress() {
+    const answeredCount = document.querySelectorAll('input[type="radio"]:checked').length;
+    const percentage = Math.round((answeredCount / totalQuestions) * 100);
+    const progressBar = document.getElementById('progress-bar');
+    progressBar.style.width = percentage + '%';
+    progressBar.textContent = percentage + '%';
+}
+
+// Submit quiz
+document.getElementById('final-submit-btn').addEventListener('click', () => {
+    submitQuiz();
+});
+
+function checkedAnswers() {
+    const answers = {};
+    quizForm.querySelectorAll('input[type="radio"]:checked').forEach(radio => {
+        answers[radio.name.replace('question_', '')] = radio.value;
+    });
+    return answers;
+}
+
+function submitQuiz() {
+    clearTimeout(autosaveTimer);
+    // Send every answer on the page, so none depends on an autosave having succeeded
+    Promise.resolve(autosaveRequest).then(() => fetch(submitUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken
+        },
+        body: JSON.stringify({
+            quiz_id: quizId,
+            answers: checkedAnswers()
+        })
+    }))
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            clearInterval(timerInterval);
+            window.location.href = data.redirect_url;
+        } else {
+            alert('Error submitting quiz: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while submitting the quiz.');
+    });
+}
+
+// Load the questions and the attempt's state, then start the timer
+Promise.all([loadJson(contentUrl), loadJson(stateUrl)])
+.then(([content, state]) => {
+    renderQuestions(content.questions);
+    bindControls();
+    restoreAnswers(state.answers);
+    remainingTime = state.remaining_time;
+    showQuestion(1);
+    startTimer();
+    updateAnsweredQuestions();
+})
+.catch(error => {
+    console.error('Error:', error);
+    document.getElementById('quiz-loading').textContent =
+        'Could not load the quiz. Please reload the page.';
+});